@@ -0,0 +1,31 @@
+"""add (owner_id, cancelled, date) index to trades
+
+Revision ID: a5b6c7d8e9f0
+Revises: f4a5b6c7d8e9
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5b6c7d8e9f0'
+down_revision: Union[str, Sequence[str], None] = 'f4a5b6c7d8e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_trades_owner_cancelled_date',
+        'trades',
+        ['owner_id', 'cancelled', 'date'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trades_owner_cancelled_date', table_name='trades')
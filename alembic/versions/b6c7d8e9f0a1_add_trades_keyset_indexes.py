@@ -0,0 +1,30 @@
+"""add keyset pagination indexes to trades
+
+Revision ID: b6c7d8e9f0a1
+Revises: a5b6c7d8e9f0
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6c7d8e9f0a1'
+down_revision: Union[str, Sequence[str], None] = 'a5b6c7d8e9f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_trades_owner_date_id', 'trades', ['owner_id', 'date', 'id'], unique=False)
+    op.create_index('ix_trades_owner_pair_date_id', 'trades', ['owner_id', 'pair', 'date', 'id'], unique=False)
+    op.create_index('ix_trades_owner_system_date_id', 'trades', ['owner_id', 'system', 'date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trades_owner_system_date_id', table_name='trades')
+    op.drop_index('ix_trades_owner_pair_date_id', table_name='trades')
+    op.drop_index('ix_trades_owner_date_id', table_name='trades')
@@ -0,0 +1,31 @@
+"""add aggregates_materialized to users
+
+Revision ID: c7d8e9f0a1b2
+Revises: b6c7d8e9f0a1
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d8e9f0a1b2'
+down_revision: Union[str, Sequence[str], None] = 'b6c7d8e9f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('aggregates_materialized', sa.Boolean(), nullable=True, server_default=sa.false()))
+    # Users whose report aggregates were already built keep being maintained
+    op.execute(
+        "UPDATE users SET aggregates_materialized = TRUE "
+        "WHERE id IN (SELECT DISTINCT user_id FROM report_aggregates)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'aggregates_materialized')
@@ -0,0 +1,39 @@
+"""add exchange_rate_history table
+
+Revision ID: d2e3f4a5b6c7
+Revises: b114759b03e8
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2e3f4a5b6c7'
+down_revision: Union[str, Sequence[str], None] = 'b114759b03e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'exchange_rate_history',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('rate', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('date', 'currency'),
+    )
+    op.create_index(
+        'ix_exchange_rate_history_currency_date',
+        'exchange_rate_history',
+        ['currency', 'date'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_exchange_rate_history_currency_date', table_name='exchange_rate_history')
+    op.drop_table('exchange_rate_history')
@@ -0,0 +1,702 @@
+"""
+Analytics Engine
+Vectorized trade analytics: the report metrics plus drawdown, profit factor,
+Sharpe/Sortino, streaks and R-multiples, computed over NumPy arrays, the
+downsampled equity curve, grouped breakdowns and rolling-window series.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import monte_carlo
+from exchange_rate_service import FALLBACK_RATES
+from models import Trade, User
+from position_calculator import PositionCalculator
+from rate_history_service import RateHistoryService
+from report_aggregates import (
+    FIELDS, active_trade_filters, quoted_pair_column, resolve_pnl_currency, sum_columns
+)
+
+# Standard lot, and pip size by quote currency (JPY pairs quote to 2 decimals)
+CONTRACT_SIZE = 100_000
+PIP_SIZE = 0.0001
+JPY_PIP_SIZE = 0.01
+
+# Trade columns /report/breakdown can group by
+BREAKDOWN_DIMENSIONS = {
+    "system": Trade.system,
+    "pair": Trade.pair,
+    "action": Trade.action,
+}
+
+# Trailing windows (in days) of /report/rolling when none are requested
+DEFAULT_ROLLING_WINDOWS = (7, 30, 90)
+
+# Longest span of days /report/rolling returns series for (about 20 years)
+MAX_ROLLING_DAYS = 20 * 366
+
+# Period label formats: (SQLite strftime, PostgreSQL to_char)
+BREAKDOWN_PERIODS = {
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%Y-%m", "YYYY-MM"),
+    "year": ("%Y", "YYYY"),
+}
+
+
+class AnalyticsEngine:
+    """Loads a user's trades as arrays once and computes all metrics over them."""
+
+    @staticmethod
+    def load_trades(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        system: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Read the columns the analytics need for the user's active trades,
+        optionally only those dated within [date_from, date_to] and/or of
+        one trading system.
+
+        Trades are ordered by date (then id) so cumulative metrics follow
+        the equity curve, undated trades last as in the trade listing; the
+        NULL order is explicit because SQLite and PostgreSQL default to
+        opposite ends. Returns P&L and risk amounts with the currency each
+        is denominated in, still unconverted.
+        """
+        account_currency = current_user.account_currency or "USD"
+        query = db.query(
+            Trade.date,
+            Trade.profit_or_loss,
+            Trade.currency,
+            Trade.pair,
+            Trade.exchange_rate,
+            Trade.sl1_pips,
+            Trade.lots,
+            Trade.risk_percent,
+        ).filter(
+            *active_trade_filters(current_user.id, date_from, date_to)
+        )
+        if system is not None:
+            query = query.filter(Trade.system == system)
+        rows = query.order_by(Trade.date.is_(None), Trade.date, Trade.id).all()
+
+        frame = pd.DataFrame(
+            rows,
+            columns=["date", "pnl", "currency", "pair", "exchange_rate", "sl1_pips", "lots", "risk_percent"],
+        )
+        pnl_currency = AnalyticsEngine._pnl_currencies(frame, account_currency)
+        risk, quote = AnalyticsEngine._risk_amounts(
+            frame["pair"], frame["sl1_pips"], frame["lots"]
+        )
+        return {
+            "date": frame["date"].to_numpy(dtype=object),
+            "pnl": pd.to_numeric(frame["pnl"], errors="coerce").fillna(0.0).to_numpy(dtype=float),
+            "pnl_currency": pnl_currency,
+            "risk": risk,
+            "risk_currency": quote,
+            "risk_percent": pd.to_numeric(frame["risk_percent"], errors="coerce").to_numpy(dtype=float),
+        }
+
+    @staticmethod
+    def _pnl_currencies(frame: pd.DataFrame, account_currency: str) -> np.ndarray:
+        """
+        resolve_pnl_currency over whole columns.
+
+        Rows are reduced to integer (currency, pair, has exchange rate) keys
+        and each distinct key is resolved once.
+        """
+        currency_codes, currencies = pd.factorize(frame["currency"].to_numpy(dtype=object))
+        pair_codes, pairs = pd.factorize(frame["pair"].to_numpy(dtype=object))
+        has_rate = pd.to_numeric(frame["exchange_rate"], errors="coerce").fillna(0).to_numpy() != 0
+
+        # Codes are -1 for missing values, hence the +1 shifts
+        keys = ((currency_codes + 1) * (len(pairs) + 1) + (pair_codes + 1)) * 2 + has_rate
+        key_codes, unique_keys = pd.factorize(keys)
+
+        resolved = []
+        for key in unique_keys:
+            rest, rate_flag = divmod(int(key), 2)
+            currency_code, pair_code = divmod(rest, len(pairs) + 1)
+            resolved.append(resolve_pnl_currency(
+                currencies[currency_code - 1] if currency_code else None,
+                pairs[pair_code - 1] if pair_code else None,
+                bool(rate_flag),
+                account_currency,
+            ))
+        return np.array(resolved, dtype=object)[key_codes]
+
+    @staticmethod
+    def _risk_amounts(pairs: pd.Series, sl1_pips: pd.Series, lots: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Money at risk to the first stop loss, in the pair's quote currency.
+
+        risk = sl1_pips * pip value per lot * lots, with a pip value of 10
+        (1000 for JPY quotes) per standard lot. Only currency pairs between
+        supported currencies qualify; other trades get NaN.
+        """
+        codes, uniques = pd.factorize(pairs.to_numpy(dtype=object))
+        quotes = []
+        for pair in uniques:
+            letters = "".join(ch for ch in str(pair).upper() if ch.isalpha())
+            is_fx = len(letters) == 6 and letters[:3] in FALLBACK_RATES and letters[3:] in FALLBACK_RATES
+            quotes.append(letters[3:] if is_fx else None)
+        # Code -1 (missing pair) maps to the trailing None
+        quote = np.array(quotes + [None], dtype=object)[codes]
+
+        pip_value = np.where(quote == "JPY", JPY_PIP_SIZE, PIP_SIZE) * CONTRACT_SIZE
+        sl = pd.to_numeric(sl1_pips, errors="coerce").to_numpy(dtype=float)
+        size = pd.to_numeric(lots, errors="coerce").to_numpy(dtype=float)
+        risk = np.abs(sl) * pip_value * np.abs(size)
+
+        valid = (quote != None) & (risk > 0)
+        return np.where(valid, risk, np.nan), np.where(valid, quote, None)
+
+    @staticmethod
+    def _opening_date(date_from: Optional[date]) -> Optional[date]:
+        """Last day whose trades make up the capital a date range starts with."""
+        return date_from - timedelta(days=1) if date_from is not None else None
+
+    @staticmethod
+    async def opening_capital_async(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date]
+    ) -> float:
+        """Equity before the first trade of a range starting at date_from."""
+        initial_capital = current_user.initial_capital or 0.0
+        # Nothing can be dated before date.min (and the day before would overflow)
+        if date_from is None or date_from == date.min:
+            return initial_capital
+        return initial_capital + await PositionCalculator.pnl_through_async(
+            db, current_user, account_currency, AnalyticsEngine._opening_date(date_from)
+        )
+
+    @staticmethod
+    async def report_async(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """
+        Advanced report for the user, all amounts in the account currency.
+
+        With a date range, equity-based metrics start from the capital
+        accumulated before date_from. Loading and computing run in the
+        threadpool; only the rate lookups are awaited on the event loop
+        (the same split for every *_async report below).
+        """
+        account_currency = current_user.account_currency or "USD"
+        data = await run_in_threadpool(AnalyticsEngine.load_trades, db, current_user, date_from, date_to)
+        pnl = await RateHistoryService.convert_many_on_dates_async(
+            db, data["pnl"], data["pnl_currency"], data["date"], account_currency
+        )
+        risk = AnalyticsEngine._convert_risk(
+            data, await RateHistoryService.convert_many_on_dates_async(
+                db, np.nan_to_num(data["risk"]), data["risk_currency"], data["date"], account_currency
+            )
+        )
+        opening = await AnalyticsEngine.opening_capital_async(db, current_user, account_currency, date_from)
+        return await run_in_threadpool(AnalyticsEngine._finish, account_currency, pnl, risk, opening)
+
+    @staticmethod
+    async def equity_curve_async(
+        db: Session,
+        current_user: User,
+        points: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """
+        Capital after each trade, starting from initial_capital, downsampled
+        with LTTB to at most `points` points (first and last always kept).
+
+        With a date range the curve covers the trades in it and starts from
+        opening_capital, the capital accumulated before date_from.
+        """
+        account_currency = current_user.account_currency or "USD"
+        initial_capital = current_user.initial_capital or 0.0
+        data = await run_in_threadpool(AnalyticsEngine.load_trades, db, current_user, date_from, date_to)
+        pnl = await RateHistoryService.convert_many_on_dates_async(
+            db, data["pnl"], data["pnl_currency"], data["date"], account_currency
+        )
+        opening = await AnalyticsEngine.opening_capital_async(db, current_user, account_currency, date_from)
+        return await run_in_threadpool(
+            AnalyticsEngine._equity_curve, account_currency, initial_capital, opening, pnl, data["date"], points
+        )
+
+    @staticmethod
+    def _equity_curve(
+        account_currency: str,
+        initial_capital: float,
+        opening: float,
+        pnl: np.ndarray,
+        trade_dates: np.ndarray,
+        points: int
+    ) -> Dict:
+        # Point 0 is the starting capital, point i the capital after trade i
+        capital = np.concatenate(([opening], opening + np.cumsum(pnl)))
+        dates = np.concatenate(([None], trade_dates))
+        keep = lttb_indices(capital, points)
+
+        return {
+            "account_currency": account_currency,
+            "initial_capital": initial_capital,
+            "opening_capital": opening,
+            "total_points": int(capital.size),
+            "points": [
+                {
+                    "trade_index": int(i),
+                    "date": dates[i].isoformat() if dates[i] is not None else None,
+                    "capital": float(capital[i]),
+                }
+                for i in keep
+            ],
+        }
+
+    @staticmethod
+    async def rolling_async(
+        db: Session,
+        current_user: User,
+        windows: Sequence[int] = DEFAULT_ROLLING_WINDOWS,
+        system: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """
+        Trailing win rate, expectancy and P&L for every day, one series per
+        window length (in days), optionally for a single trading system.
+
+        Days run from date_from (default: first trade) to date_to (default:
+        last trade); each value covers the trades dated in the `window` days
+        ending that day, so trades before date_from still fill the first
+        windows. Undated trades are left out. Built from prefix sums by
+        rolling_window_sums, so the whole response costs O(trades + days).
+
+        Raises ValueError if the days span more than MAX_ROLLING_DAYS.
+        """
+        account_currency = current_user.account_currency or "USD"
+        lookback_from = None
+        if date_from is not None:
+            if date_to is not None:
+                _check_rolling_span(date_from.toordinal(), date_to.toordinal())
+            # Clamped to date.min rather than overflowing for very early dates
+            lookback_from = date.fromordinal(max(date_from.toordinal() - (max(windows) - 1), 1))
+        pnl, currencies, dates, days = await run_in_threadpool(
+            AnalyticsEngine._load_dated_pnl, db, current_user, lookback_from, date_to, system
+        )
+        pnl = await RateHistoryService.convert_many_on_dates_async(db, pnl, currencies, dates, account_currency)
+        return await run_in_threadpool(
+            AnalyticsEngine._rolling_series, account_currency, system, windows, days, pnl, date_from, date_to
+        )
+
+    @staticmethod
+    def _load_dated_pnl(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date],
+        date_to: Optional[date],
+        system: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Unconverted P&L, its currencies, the dates and the date ordinals of the dated trades."""
+        data = AnalyticsEngine.load_trades(db, current_user, date_from, date_to, system)
+        dated = np.array([value is not None for value in data["date"]], dtype=bool)
+        dates = data["date"][dated]
+        days = np.array([value.toordinal() for value in dates], dtype=np.int64)
+        return data["pnl"][dated], data["pnl_currency"][dated], dates, days
+
+    @staticmethod
+    def _rolling_series(
+        account_currency: str,
+        system: Optional[str],
+        windows: Sequence[int],
+        days: np.ndarray,
+        pnl: np.ndarray,
+        date_from: Optional[date],
+        date_to: Optional[date]
+    ) -> Dict:
+        result = {
+            'account_currency': account_currency,
+            'system': system,
+            'windows': list(windows),
+            'dates': [],
+            'series': {str(window): {} for window in windows},
+        }
+        start = date_from.toordinal() if date_from is not None else (int(days.min()) if days.size else None)
+        end = date_to.toordinal() if date_to is not None else (int(days.max()) if days.size else None)
+        if start is None or end is None or end < start:
+            return result
+
+        _check_rolling_span(start, end)
+        sums = rolling_window_sums(days, pnl, windows, start, end)
+        result['dates'] = [date.fromordinal(day).isoformat() for day in range(start, end + 1)]
+        for window in windows:
+            profit, loss, wins, count = sums[window]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                win_rate = np.where(count > 0, wins / count * 100, np.nan)
+                expectancy = np.where(count > 0, (profit + loss) / count, np.nan)
+            result['series'][str(window)] = {
+                'num_trades': count.astype(int).tolist(),
+                'win_rate': _nan_to_none(win_rate),
+                'expectancy': _nan_to_none(expectancy),
+                'pnl': (profit + loss).tolist(),
+            }
+        return result
+
+    @staticmethod
+    async def monte_carlo_async(
+        db: Session,
+        current_user: User,
+        paths: int,
+        trades_per_path: Optional[int] = None,
+        seed: int = 0,
+        ruin_percent: float = 50.0,
+        risk_percent: Optional[float] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Optional[Dict]:
+        """
+        Monte Carlo equity paths from initial_capital, bootstrapped from the
+        returns of the user's trades (those in [date_from, date_to] if given).
+
+        trades_per_path defaults to the number of historical trades;
+        risk_percent re-sizes trades as if each had risked that percentage.
+        Returns None when no trade has a usable return.
+        """
+        account_currency = current_user.account_currency or "USD"
+        initial_capital = current_user.initial_capital or 0.0
+        data = await run_in_threadpool(AnalyticsEngine.load_trades, db, current_user, date_from, date_to)
+        pnl = await RateHistoryService.convert_many_on_dates_async(
+            db, data["pnl"], data["pnl_currency"], data["date"], account_currency
+        )
+        opening = await AnalyticsEngine.opening_capital_async(db, current_user, account_currency, date_from)
+        returns = await run_in_threadpool(
+            monte_carlo.trade_returns, pnl, data["risk_percent"], opening, risk_percent
+        )
+        if returns.size == 0:
+            return None
+
+        result = await monte_carlo.simulate_async(
+            returns,
+            initial_capital,
+            paths,
+            trades_per_path or returns.size,
+            seed,
+            ruin_percent,
+        )
+        result["account_currency"] = account_currency
+        result["sample_trades"] = int(returns.size)
+        result["risk_percent"] = risk_percent
+        return result
+
+    @staticmethod
+    async def breakdown_async(
+        db: Session,
+        current_user: User,
+        group_by: Sequence[str],
+        period: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """
+        Win rate, expectancy and P&L per group of trades.
+
+        Grouping happens in SQL on the requested dimensions (see
+        BREAKDOWN_DIMENSIONS) and period, plus whatever determines the P&L
+        currency (and, once rate history is loaded, the trade date); each
+        SQL group is converted once and the sub-groups are then merged.
+        Only trades dated within [date_from, date_to] are included when a
+        range is given.
+        """
+        account_currency = current_user.account_currency or "USD"
+        keys = list(group_by) + (["period"] if period else [])
+        rows, currencies, days = await run_in_threadpool(
+            AnalyticsEngine._load_groups, db, current_user, account_currency, group_by, period, date_from, date_to
+        )
+        factors = await RateHistoryService.convert_many_on_dates_async(
+            db, np.ones(len(rows)), currencies, days, account_currency
+        )
+        groups = await run_in_threadpool(AnalyticsEngine._merge_groups, rows, keys, factors)
+        return {
+            'account_currency': account_currency,
+            'group_by': list(group_by),
+            'period': period,
+            'groups': groups,
+        }
+
+    @staticmethod
+    def _load_groups(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        group_by: Sequence[str],
+        period: Optional[str],
+        date_from: Optional[date],
+        date_to: Optional[date]
+    ) -> Tuple[List[tuple], List[str], List[Optional[date]]]:
+        """
+        Grouped SQL sums per (dimensions, P&L currency), with the currency of
+        each row and the trade date it is converted at (None: current rate).
+        Rows are split by trade date only once rate history is loaded.
+        """
+        dimensions = [BREAKDOWN_DIMENSIONS[name] for name in group_by]
+        if period:
+            dimensions.append(AnalyticsEngine._period_column(db, period))
+
+        quoted_pair = quoted_pair_column()
+        by_date = [Trade.date] if RateHistoryService.latest_day(db) is not None else []
+        rows = db.query(
+            *dimensions, Trade.currency, quoted_pair, *sum_columns(), *by_date
+        ).filter(
+            *active_trade_filters(current_user.id, date_from, date_to)
+        ).group_by(*dimensions, Trade.currency, quoted_pair, *by_date).all()
+
+        days = [row[-1] for row in rows] if by_date else [None] * len(rows)
+        rows = [tuple(row[:-1]) for row in rows] if by_date else rows
+        k = len(dimensions)
+        currencies = [
+            resolve_pnl_currency(row[k], row[k + 1], row[k + 1] is not None, account_currency)
+            for row in rows
+        ]
+        return rows, currencies, days
+
+    @staticmethod
+    def _merge_groups(rows: List[tuple], keys: List[str], factors: np.ndarray) -> List[Dict]:
+        """Convert each SQL group and merge the currency sub-groups of each output group."""
+        k = len(keys)
+        sums = np.array([[value or 0 for value in row[k + 2:]] for row in rows], dtype=float)
+        sums = sums.reshape(len(rows), len(FIELDS))
+        sums[:, :2] *= factors[:, None]
+
+        merged: Dict[tuple, np.ndarray] = {}
+        for row, values in zip(rows, sums):
+            group = tuple(row[:k])
+            merged[group] = merged[group] + values if group in merged else values.copy()
+
+        groups = []
+        for group in sorted(merged, key=lambda g: tuple((value is None, value or "") for value in g)):
+            profit, loss, wins, losses, count = merged[group]
+            groups.append({
+                **dict(zip(keys, group)),
+                'num_trades': int(count),
+                'wins': int(wins),
+                'losses': int(losses),
+                'win_rate': wins / count * 100 if count else 0.0,
+                'loss_rate': losses / count * 100 if count else 0.0,
+                'avg_win': profit / wins if wins else 0.0,
+                'avg_loss': loss / losses if losses else 0.0,
+                'expectancy': (profit + loss) / count if count else 0.0,
+                'total_profit': float(profit),
+                'total_loss': float(loss),
+                'total_pnl': float(profit + loss),
+            })
+        return groups
+
+    @staticmethod
+    def _period_column(db: Session, period: str):
+        """SQL expression labelling Trade.date with its day, month or year."""
+        sqlite_format, postgres_format = BREAKDOWN_PERIODS[period]
+        if db.get_bind().dialect.name == "sqlite":
+            return func.strftime(sqlite_format, Trade.date)
+        return func.to_char(Trade.date, postgres_format)
+
+    @staticmethod
+    def _convert_risk(data: Dict[str, np.ndarray], converted: np.ndarray) -> np.ndarray:
+        # Keep NaN for trades without a usable stop loss
+        return np.where(np.isnan(data["risk"]), np.nan, converted)
+
+    @staticmethod
+    def _finish(account_currency: str, pnl: np.ndarray, risk: np.ndarray, opening_capital: float) -> Dict:
+        metrics = AnalyticsEngine.compute(pnl, risk, opening_capital)
+        metrics["account_currency"] = account_currency
+        return metrics
+
+    @staticmethod
+    def compute(pnl: np.ndarray, risk: Optional[np.ndarray] = None, initial_capital: float = 0.0) -> Dict:
+        """
+        All metrics for a chronological P&L array.
+
+        Args:
+            pnl: P&L per trade in one currency, oldest first
+            risk: amount risked per trade in the same currency (NaN if unknown)
+            initial_capital: equity before the first trade
+
+        Sharpe and Sortino are per trade (not annualized), on returns
+        relative to the equity before each trade.
+        """
+        pnl = np.ascontiguousarray(pnl, dtype=float)
+        n = pnl.size
+        if risk is None:
+            risk = np.full(n, np.nan)
+
+        wins_mask = pnl > 0
+        losses_mask = pnl < 0
+        num_wins = int(np.count_nonzero(wins_mask))
+        num_losses = int(np.count_nonzero(losses_mask))
+        total_profit = float(pnl[wins_mask].sum())
+        total_loss = float(pnl[losses_mask].sum())
+        total_pnl = total_profit + total_loss
+
+        win_probability = num_wins / n * 100 if n else 0.0
+        loss_probability = num_losses / n * 100 if n else 0.0
+        avg_win = total_profit / num_wins if num_wins else 0.0
+        avg_loss = total_loss / num_losses if num_losses else 0.0
+        expectancy = (avg_win * win_probability / 100) + (avg_loss * loss_probability / 100)
+
+        # Equity curve and drawdown from the running peak
+        equity = initial_capital + np.cumsum(pnl)
+        equity_before = np.concatenate(([initial_capital], equity[:-1]))
+        peaks = np.maximum.accumulate(np.concatenate(([initial_capital], equity)))[1:]
+        drawdown = peaks - equity
+        max_drawdown = float(drawdown.max()) if n else 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown_pct = np.where(peaks > 0, drawdown / peaks * 100, np.nan)
+            returns = np.where(equity_before > 0, pnl / equity_before, np.nan)
+        max_drawdown_percent = float(np.nanmax(drawdown_pct)) if np.isfinite(drawdown_pct).any() else None
+
+        returns = returns[np.isfinite(returns)]
+        sharpe_ratio = None
+        sortino_ratio = None
+        if returns.size > 1:
+            mean = returns.mean()
+            std = returns.std(ddof=1)
+            downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+            sharpe_ratio = float(mean / std) if std > 0 else None
+            sortino_ratio = float(mean / downside) if downside > 0 else None
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_multiples = pnl / risk
+        r_multiples = r_multiples[np.isfinite(r_multiples)]
+
+        return {
+            'total_profit': total_profit,
+            'total_loss': total_loss,
+            'win_probability': win_probability,
+            'loss_probability': loss_probability,
+            'avg_win': avg_win,
+            'avg_loss': avg_loss,
+            'expectancy': expectancy,
+            'capital': initial_capital + total_pnl,
+            'total_pnl': total_pnl,
+            'num_trades': n,
+            'max_drawdown': max_drawdown,
+            'max_drawdown_percent': max_drawdown_percent,
+            'profit_factor': total_profit / -total_loss if total_loss < 0 else None,
+            'sharpe_ratio': sharpe_ratio,
+            'sortino_ratio': sortino_ratio,
+            'longest_win_streak': AnalyticsEngine._longest_run(wins_mask),
+            'longest_loss_streak': AnalyticsEngine._longest_run(losses_mask),
+            'avg_r_multiple': float(r_multiples.mean()) if r_multiples.size else None,
+            'total_r': float(r_multiples.sum()) if r_multiples.size else None,
+            'r_multiple_trades': int(r_multiples.size),
+        }
+
+    @staticmethod
+    def _longest_run(mask: np.ndarray) -> int:
+        """Length of the longest run of True values."""
+        if not mask.any():
+            return 0
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        return int((ends - starts).max())
+
+
+def rolling_window_sums(
+    days: np.ndarray,
+    pnl: np.ndarray,
+    windows: Sequence[int],
+    start: int,
+    end: int
+) -> Dict[int, np.ndarray]:
+    """
+    Trailing-window totals for every day from start to end (day ordinals).
+
+    Trades are binned per day once, prefix-summed, and each window total is
+    the difference of two prefix sums, so every series costs O(trades +
+    days) whatever the window length. Returns, per window, an array of
+    rows [profit, loss, wins, count] with one column per day; the window
+    of day d covers days d - window + 1 .. d.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    pnl = np.asarray(pnl, dtype=float)
+    origin = start - max(windows) + 1
+    length = end - origin + 1
+
+    inside = (days >= origin) & (days <= end)
+    offsets = days[inside] - origin
+    values = pnl[inside]
+    per_day = np.vstack([
+        np.bincount(offsets, weights=np.where(values > 0, values, 0.0), minlength=length),
+        np.bincount(offsets, weights=np.where(values < 0, values, 0.0), minlength=length),
+        np.bincount(offsets, weights=(values > 0).astype(float), minlength=length),
+        np.bincount(offsets, minlength=length).astype(float),
+    ])
+    prefix = np.concatenate((np.zeros((per_day.shape[0], 1)), np.cumsum(per_day, axis=1)), axis=1)
+
+    # prefix[:, i] is the total of the days before origin + i
+    upper = np.arange(start - origin, length) + 1
+    sums = {}
+    for window in windows:
+        totals = prefix[:, upper] - prefix[:, upper - window]
+        # Differences of large prefix sums leave rounding residue in empty windows
+        totals[2:] = np.round(totals[2:])
+        totals[:2, totals[3] == 0] = 0.0
+        sums[window] = totals
+    return sums
+
+
+def _nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in values.tolist()]
+
+
+def _check_rolling_span(start: int, end: int):
+    """Raise ValueError if the day ordinals start..end span more than MAX_ROLLING_DAYS."""
+    if end - start + 1 > MAX_ROLLING_DAYS:
+        raise ValueError(f"rolling report spans at most {MAX_ROLLING_DAYS} days; narrow 'from'/'to'")
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling of a series sampled at x = 0..n-1.
+
+    Returns the indices of at most `threshold` points that preserve the
+    visual shape of the series. The first and last points are always kept.
+    """
+    y = np.asarray(y, dtype=float)
+    n = y.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n) if threshold >= n else np.array([0, n - 1][:n], dtype=int)
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    # Interior points are split into threshold - 2 buckets
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        if i + 2 < threshold - 1:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = (next_start + next_end - 1) / 2.0
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = float(n - 1), y[n - 1]
+
+        xs = np.arange(start, end)
+        areas = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
@@ -1,19 +1,30 @@
 import shutil
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import uuid
-from fastapi import FastAPI, Depends, File, HTTPException, UploadFile, status, APIRouter
+from fastapi import FastAPI, Body, Depends, File, HTTPException, UploadFile, status, APIRouter, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, date, timezone
 from database import Base, SessionLocal, engine, seed_sqlite_defaults
-from models import User, Trade, Analysis, FavoriteBookmark, ReadLaterBookmark, AnalysisShare
+from models import User, Trade, Analysis, FavoriteBookmark, ReadLaterBookmark, AnalysisShare, ReportAggregate
 from ai import ask_ai, import_excel_ai
 from news_service import fetch_all_news, fetch_calendar
 from position_calculator import PositionCalculator
-from schemas import UserCreate, UserResponse, TokenSchema, TradeCreate, TradeResponse, ReportResponse, UserUpdate, PasswordChange, TradeUpdate, AnalysisCreate, AnalysisResponse, AnalysisUpdate, FavoriteBookmarkCreate, FavoriteBookmarkUpdate, FavoriteBookmarkResponse, ReorderRequest, ReadLaterBookmarkCreate, ReadLaterExpiryUpdate, ReadLaterBookmarkResponse, ReadLaterReorderRequest, ShareAnalysisRequest, AnalysisResponseWithShares, UserBasicResponse, AnalysisShareResponse
+from analytics_engine import AnalyticsEngine, BREAKDOWN_DIMENSIONS, BREAKDOWN_PERIODS, DEFAULT_ROLLING_WINDOWS
+from report_aggregates import ReportAggregates
+from report_cache import bump_trade_version, report_cache
+from trade_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TradeListing, decode_cursor
+from trade_bulk import MAX_BULK_TRADES, TradeBulk
+from trade_export import COLUMNAR_FORMATS, EXPORT_FORMATS, columnar_available, stream_trades
+from exchange_rate_service import start_background_refresher, stop_background_refresher, close_async_client
+from monte_carlo import shutdown_pool
+from schemas import UserCreate, UserResponse, TokenSchema, TradeCreate, TradeResponse, ReportResponse, AdvancedReportResponse, DashboardResponse, UserUpdate, PasswordChange, TradeUpdate, TradeBulkUpdate, AnalysisCreate, AnalysisResponse, AnalysisUpdate, FavoriteBookmarkCreate, FavoriteBookmarkUpdate, FavoriteBookmarkResponse, ReorderRequest, ReadLaterBookmarkCreate, ReadLaterExpiryUpdate, ReadLaterBookmarkResponse, ReadLaterReorderRequest, ShareAnalysisRequest, AnalysisResponseWithShares, UserBasicResponse, AnalysisShareResponse
 from auth import AuthService, oauth2_scheme 
 import os
+from email.utils import format_datetime, parsedate_to_datetime
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.security import OAuth2PasswordBearer
@@ -73,12 +84,25 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+
+@app.on_event("startup")
+def start_exchange_rate_refresher():
+    start_background_refresher()
+
+
+@app.on_event("shutdown")
+async def stop_exchange_rate_refresher():
+    stop_background_refresher()
+    await close_async_client()
+    shutdown_pool()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=get_cors_origins(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["Authorization", "Content-Type"],
+    expose_headers=["Link", "X-Next-Cursor", "X-Total-Count"],
 )
 
 # --- Dependencies ---
@@ -112,6 +136,70 @@ def require_admin(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return current_user
 
+# --- HTTP caching ---
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate conditional request headers against the current validators.
+
+    If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    last_modified is a naive UTC datetime.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(
+            tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).replace(tzinfo=None)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Validator headers telling clients to revalidate before reusing a response."""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+async def cached_report(request: Request, kind: str, current_user: User, compute, *params):
+    """
+    Serve a report from the report cache, with ETag revalidation.
+
+    A matching If-None-Match is answered with 304 before anything is
+    computed; otherwise the payload comes from the cache or from awaiting
+    compute(). params are extra inputs that distinguish cache entries.
+    """
+    # Read up front: compute() may commit, which expires current_user
+    user_inputs = report_cache.user_inputs(current_user)
+    etag = report_cache.etag(kind, user_inputs, *params)
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+
+    payload = report_cache.get(etag)
+    if payload is None:
+        payload = jsonable_encoder(await compute())
+        # Computing may have installed a newer rate snapshot
+        etag = report_cache.etag(kind, user_inputs, *params)
+        report_cache.put(etag, payload)
+
+    return JSONResponse(content=payload, headers=cache_headers(etag))
+
+def report_date_range(
+    date_from: Optional[date] = Query(None, alias="from", description="Only trades dated on or after this day (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, alias="to", description="Only trades dated on or before this day (YYYY-MM-DD)"),
+) -> Tuple[Optional[date], Optional[date]]:
+    """Optional from/to trade date filter shared by the report and trade listing endpoints."""
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return date_from, date_to
+
 # === CREATE ROUTER ===
 router = APIRouter(prefix="/api")
 
@@ -137,6 +225,8 @@ async def import_trades(
     os.remove(file_location)
 
     db.add_all(trades)
+    ReportAggregates.add(db, trades)
+    bump_trade_version(db, current_user.id)
     db.commit()
 
     return {
@@ -421,6 +511,7 @@ def delete_user(
     if user.id == current_admin.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
     
+    db.query(ReportAggregate).filter(ReportAggregate.user_id == user.id).delete(synchronize_session=False)
     db.delete(user)
     db.commit()
     return {"message": "User deleted successfully"}
@@ -497,17 +588,150 @@ def create_trade(
 ):
     db_trade = Trade(**trade.dict(), owner_id=current_user.id)
     db.add(db_trade)
+    ReportAggregates.add(db, [db_trade])
+    bump_trade_version(db, current_user.id)
     db.commit()
     db.refresh(db_trade)
     return db_trade
 
+# --- Create many trades ---
+@router.post("/trades/bulk")
+def create_trades_bulk(
+    rows: List[Dict[str, Any]] = Body(..., description="TradeCreate objects"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create many trades in one request (e.g. a broker sync).
+
+    Each row is validated as a TradeCreate; valid rows are inserted with a
+    single statement in one transaction, invalid ones are skipped and
+    reported by their index in `errors`. `ids` lists the created trades in
+    request order and `indexes` the row each of them came from.
+    """
+    if len(rows) > MAX_BULK_TRADES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_TRADES} trades per request")
+    return TradeBulk.create(db, current_user.id, rows)
+
+# --- Edit many trades ---
+@router.patch("/trades/bulk")
+def update_trades_bulk(
+    bulk_update: TradeBulkUpdate,
+    pair: Optional[str] = None,
+    system: Optional[str] = None,
+    action: Optional[str] = None,
+    cancelled: Optional[bool] = None,
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Apply the fields set in `changes` to a set of the user's trades with a
+    single UPDATE, e.g. {"changes": {"system": "breakout-v2"}} with
+    ?system=breakout to re-tag a system.
+
+    The set is `ids` and/or the same filters as GET /api/trades/; at least
+    one of them is required.
+    """
+    changes = bulk_update.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+
+    filters = TradeListing.filters(current_user.id, pair, system, action, cancelled, *date_range)
+    if bulk_update.ids is not None:
+        if len(bulk_update.ids) > MAX_BULK_TRADES:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_TRADES} trades per request")
+        filters.append(Trade.id.in_(bulk_update.ids))
+    elif len(filters) == 1:
+        raise HTTPException(status_code=400, detail="Select trades with ids or at least one filter")
+
+    return {"updated": TradeBulk.patch(db, current_user.id, filters, changes)}
+
+# --- Cancel many trades (soft delete) ---
+@router.post("/trades/bulk/cancel")
+def cancel_trades_bulk(
+    trade_ids: List[int],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if len(trade_ids) > MAX_BULK_TRADES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_TRADES} trades per request")
+    return {
+        "requested": len(trade_ids),
+        "cancelled": TradeBulk.cancel(db, current_user.id, trade_ids)
+    }
+
 # --- List trades for current user ---
 @router.get("/trades/", response_model=List[TradeResponse])
 def list_trades(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to get every matching trade"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="Sort by (date, id) ascending or descending"),
+    pair: Optional[str] = None,
+    system: Optional[str] = None,
+    action: Optional[str] = None,
+    cancelled: Optional[bool] = None,
+    include_total: bool = Query(False, description="Return the number of matching trades in X-Total-Count"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Trade).filter(Trade.owner_id == current_user.id).all()
+    """
+    List the user's trades sorted by (date, id), undated trades last.
+
+    Filters: pair, system, action, cancelled, from/to. With `limit` the
+    result is one page and, unless it is the last, X-Next-Cursor (and a
+    Link rel="next" header) points at the next one. Pages use keyset
+    pagination, so deep pages cost the same as the first.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if after is not None and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    filters = TradeListing.filters(current_user.id, pair, system, action, cancelled, *date_range)
+    trades, next_cursor = TradeListing.page(db, filters, limit, after, descending=order == "desc")
+
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    if include_total:
+        response.headers["X-Total-Count"] = str(TradeListing.count(db, filters))
+    return trades
+
+# --- Export trades (declared before /trades/{trade_id}) ---
+@router.get("/trades/export")
+def export_trades(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet|arrow)$", description="csv, ndjson, parquet or arrow (Arrow IPC stream)"),
+    pair: Optional[str] = None,
+    system: Optional[str] = None,
+    action: Optional[str] = None,
+    cancelled: Optional[bool] = None,
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download the user's trades (same filters and order as /api/trades/)
+    as CSV, NDJSON, Parquet or Arrow IPC. The file is streamed from a
+    server-side cursor, so memory use does not grow with the number of
+    trades. The columnar formats keep typed columns (date32, float64,
+    bool) and need pyarrow installed.
+    """
+    if format in COLUMNAR_FORMATS and not columnar_available():
+        raise HTTPException(status_code=501, detail=f"{format} export requires pyarrow on the server")
+
+    filters = TradeListing.filters(current_user.id, pair, system, action, cancelled, *date_range)
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"trades-{datetime.utcnow():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        stream_trades(SessionLocal, filters, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 # --- Get specific trade ---
 @router.get("/trades/{trade_id}", response_model=TradeResponse)
@@ -533,11 +757,15 @@ def update_trade(
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
+    before = ReportAggregates.contribution(trade)
+    
     # Update fields
     update_data = trade_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(trade, field, value)
     
+    ReportAggregates.replace(db, current_user.id, before, ReportAggregates.contribution(trade))
+    bump_trade_version(db, current_user.id)
     db.commit()
     db.refresh(trade)
     return trade
@@ -553,6 +781,8 @@ def delete_trade(
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
+    ReportAggregates.remove(db, [trade])
+    bump_trade_version(db, current_user.id)
     db.delete(trade)
     db.commit()
     return {"message": "Trade deleted successfully"}
@@ -564,6 +794,8 @@ def delete_trades(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    ReportAggregates.remove_ids(db, current_user.id, trade_ids)
+    bump_trade_version(db, current_user.id)
     deleted = (
         db.query(Trade)
         .filter(
@@ -591,6 +823,8 @@ def cancel_trade(
     if not trade:
         raise HTTPException(status_code=404, detail="Trade not found")
     
+    ReportAggregates.remove(db, [trade])
+    bump_trade_version(db, current_user.id)
     trade.cancelled = True
     db.commit()
     return {"message": "Trade cancelled successfully"}
@@ -599,41 +833,239 @@ def cancel_trade(
 
 # --- Report per user with multi-currency support ---
 @router.get("/report/", response_model=ReportResponse)
-def get_report(
+async def get_report(
+    request: Request,
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get trading report with multi-currency support.
     All P&L values are converted to the user's account currency.
+    With from/to only trades dated in that range are reported, and capital
+    is the capital at the end of the range.
+    Cached per trade version and rate snapshot; supports If-None-Match.
+    """
+    async def compute():
+        report_data = await PositionCalculator.calculate_report_async(db, current_user, *date_range)
+        
+        return ReportResponse(
+            total_profit=report_data['total_profit'],
+            total_loss=report_data['total_loss'],
+            win_probability=report_data['win_probability'],
+            loss_probability=report_data['loss_probability'],
+            avg_win=report_data['avg_win'],
+            avg_loss=report_data['avg_loss'],
+            expectancy=report_data['expectancy'],
+            capital=report_data['capital'],
+            account_currency=report_data['account_currency'],
+            total_pnl=report_data['total_pnl'],
+            num_trades=report_data['num_trades'],
+        )
+    
+    return await cached_report(request, "report", current_user, compute, date_range)
+
+@router.get("/report/dashboard", response_model=DashboardResponse)
+async def get_dashboard(
+    request: Request,
+    recent: int = Query(10, ge=0, le=100, description="Number of most recent trades to include"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Everything the overview needs in one call: the /report/ metrics, the
+    positions-by-currency breakdown and the most recent trades, computed
+    from a single trade query and conversion pass.
+    """
+    async def compute():
+        dashboard = await PositionCalculator.get_dashboard_async(db, current_user, recent, *date_range)
+        return DashboardResponse(
+            report=ReportResponse(**dashboard['report']),
+            positions=dashboard['positions'],
+            recent_trades=[TradeResponse.model_validate(trade) for trade in dashboard['recent_trades']],
+        )
+    
+    return await cached_report(request, "dashboard", current_user, compute, recent, date_range)
+
+@router.get("/report/breakdown")
+async def get_report_breakdown(
+    request: Request,
+    group_by: str = Query("", description="Comma-separated dimensions: system, pair, action"),
+    period: Optional[str] = Query(None, description="Also group by trade date: day, month or year"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
-    report_data = PositionCalculator.calculate_report(db, current_user)
+    Win rate, expectancy and P&L per group, e.g. ?group_by=system,pair&period=month.
+    Grouped in SQL; P&L converted to the account currency once per group.
+    """
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in BREAKDOWN_DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown group_by {unknown}; allowed: {', '.join(BREAKDOWN_DIMENSIONS)}",
+        )
+    if period is not None and period not in BREAKDOWN_PERIODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown period '{period}'; allowed: {', '.join(BREAKDOWN_PERIODS)}",
+        )
+    dimensions = list(dict.fromkeys(dimensions))
+
+    return await cached_report(
+        request, "breakdown", current_user,
+        lambda: AnalyticsEngine.breakdown_async(db, current_user, dimensions, period, *date_range),
+        tuple(dimensions), period, date_range,
+    )
+
+@router.get("/report/advanced", response_model=AdvancedReportResponse)
+async def get_advanced_report(
+    request: Request,
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Extended trading report: the /report/ metrics plus max drawdown, profit
+    factor, Sharpe/Sortino (per trade), win/loss streaks and R-multiples
+    (risk taken from sl1_pips). Values are in the user's account currency.
+    With from/to, drawdown and returns start from the capital before 'from'.
+    """
+    async def compute():
+        return AdvancedReportResponse(**await AnalyticsEngine.report_async(db, current_user, *date_range))
     
-    return ReportResponse(
-        total_profit=report_data['total_profit'],
-        total_loss=report_data['total_loss'],
-        win_probability=report_data['win_probability'],
-        loss_probability=report_data['loss_probability'],
-        avg_win=report_data['avg_win'],
-        avg_loss=report_data['avg_loss'],
-        expectancy=report_data['expectancy'],
-        capital=report_data['capital'],
-        account_currency=report_data['account_currency'],
-        total_pnl=report_data['total_pnl'],
-        num_trades=report_data['num_trades'],
+    return await cached_report(request, "advanced", current_user, compute, date_range)
+
+@router.get("/report/equity-curve")
+async def get_equity_curve(
+    request: Request,
+    points: int = Query(500, ge=3, le=5000, description="Maximum number of points returned"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Capital over time, starting from initial_capital, in trade date order.
+
+    Long histories are downsampled with LTTB, so the payload never exceeds
+    `points` points; `total_points` is the full series length. With
+    from/to the curve starts from the capital accumulated before 'from'.
+    """
+    return await cached_report(
+        request, "equity-curve", current_user,
+        lambda: AnalyticsEngine.equity_curve_async(db, current_user, points, *date_range),
+        points, date_range,
+    )
+
+@router.get("/report/rolling")
+async def get_rolling_report(
+    request: Request,
+    windows: str = Query(
+        ",".join(str(window) for window in DEFAULT_ROLLING_WINDOWS),
+        description="Comma-separated trailing window lengths in days (1-365, at most 5)",
+    ),
+    system: Optional[str] = Query(None, description="Only trades of this trading system"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rolling win rate, expectancy and P&L per day for each window, e.g.
+    ?windows=7,30,90&system=breakout, to watch a system drift over time.
+    Series are built from prefix sums: O(trades + days) whatever the windows,
+    over at most MAX_ROLLING_DAYS days.
+    """
+    try:
+        lengths = sorted({int(value) for value in windows.split(",") if value.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="windows must be comma-separated integers")
+    if not lengths or len(lengths) > 5 or lengths[0] < 1 or lengths[-1] > 365:
+        raise HTTPException(status_code=400, detail="windows must be 1 to 5 lengths between 1 and 365 days")
+
+    try:
+        return await cached_report(
+            request, "rolling", current_user,
+            lambda: AnalyticsEngine.rolling_async(db, current_user, lengths, system, *date_range),
+            tuple(lengths), system, date_range,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/report/monte-carlo")
+async def get_monte_carlo_report(
+    request: Request,
+    paths: int = Query(10000, ge=100, le=200000, description="Number of simulated equity paths"),
+    trades: Optional[int] = Query(None, ge=1, le=10000, description="Trades per path (default: number of historical trades)"),
+    seed: int = Query(0, ge=0, description="Random seed; the same seed gives the same result"),
+    ruin_percent: float = Query(50.0, gt=0, le=100, description="Loss of initial capital (%) that counts as ruin"),
+    risk_percent: Optional[float] = Query(None, gt=0, le=100, description="Re-size trades as if each risked this % of equity"),
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Monte Carlo risk of ruin: bootstrap-resamples the returns of the user's
+    trades into `paths` equity paths from initial_capital and returns the
+    probability of ruin, the max drawdown distribution and percentile bands.
+
+    Simulations run vectorized on a process pool (MONTE_CARLO_WORKERS), so
+    the API worker stays responsive.
+    """
+    async def compute():
+        result = await AnalyticsEngine.monte_carlo_async(
+            db, current_user, paths, trades, seed, ruin_percent, risk_percent, *date_range
+        )
+        if result is None:
+            raise HTTPException(status_code=400, detail="No trades with P&L to simulate from")
+        return result
+
+    return await cached_report(
+        request, "monte-carlo", current_user, compute,
+        paths, trades, seed, ruin_percent, risk_percent, date_range,
     )
 
 @router.get("/report/positions-by-currency")
-def get_positions_by_currency(
+async def get_positions_by_currency(
+    request: Request,
+    date_range: Tuple[Optional[date], Optional[date]] = Depends(report_date_range),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get position summary grouped by currency.
     All values converted to account currency.
+    Cached per trade version and rate snapshot; supports If-None-Match.
     """
-    summary = PositionCalculator.get_position_summary(db, current_user)
-    return summary
+    return await cached_report(
+        request, "positions-by-currency", current_user,
+        lambda: PositionCalculator.get_position_summary_async(db, current_user, *date_range),
+        date_range,
+    )
+
+@router.post("/report/aggregates/rebuild")
+def rebuild_report_aggregates(
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(require_admin),
+):
+    """
+    Recompute the materialized report aggregates from the trades table (admin only).
+
+    Repairs drift for one user, or for every user when user_id is omitted.
+    """
+    if user_id is None:
+        rebuilt = ReportAggregates.rebuild_all(db)
+    else:
+        ReportAggregates.rebuild(db, user_id)
+        rebuilt = 1
+
+    # Cached reports may have been built from drifted aggregates
+    bump_trade_version(db, user_id)
+    db.commit()
+    return {"rebuilt_users": rebuilt}
 
 # --- Exchange Rates (Live) ---
 @router.get("/exchange-rates")
@@ -669,38 +1101,106 @@ def get_exchange_rates(
     }
 
 @router.get("/exchange-rates/all")
-def get_all_exchange_rates(base_currency: str = "USD"):
+def get_all_exchange_rates(request: Request, base_currency: str = "USD"):
     """
     Get all supported currency rates relative to a base currency.
     
     Query Parameters:
     - base_currency: Base currency (default: USD)
     
-    Returns dictionary of all supported rates relative to base.
+    Returns dictionary of all supported rates relative to base (400 for an
+    unsupported base). Served from the shared rate snapshot; responses carry
+    ETag and Last-Modified so clients can revalidate with a 304.
     """
     from exchange_rate_service import ExchangeRateService
-    from datetime import datetime
-    
-    # Get all rates (fetches from ECB)
-    all_rates = ExchangeRateService.get_all_rates_usd()
     
-    # Convert to requested base currency if not USD
     base = base_currency.upper()
-    if base != "USD":
-        base_rate = all_rates.get(base, 1.0)
-        converted_rates = {}
-        for curr, rate in all_rates.items():
-            converted_rates[curr] = round(rate / base_rate, 6)
-        all_rates = converted_rates
+    try:
+        all_rates, snapshot = ExchangeRateService.get_all_rates(base)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if snapshot is not None:
+        etag = f'"{snapshot["id"]}-{base}"'
+        last_modified = snapshot["modified_at"]
+        timestamp = snapshot["fetched_at"]
     else:
-        all_rates = {k: round(v, 6) for k, v in all_rates.items()}
+        etag = f'"fallback-{base}"'
+        last_modified = None
+        timestamp = datetime.utcnow()
+    
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
     
+    return JSONResponse(
+        content={
+            "base": base,
+            "rates": all_rates,
+            "timestamp": timestamp.isoformat() + "Z"
+        },
+        headers=headers,
+    )
+
+@router.get("/exchange-rates/history")
+def get_historical_exchange_rate(
+    rate_date: date = Query(..., alias="date"),
+    from_currency: str = "EUR",
+    to_currency: str = "USD",
+    db: Session = Depends(get_db),
+):
+    """
+    Get the ECB reference rate between two currencies on a given date.
+
+    Weekends and holidays use the previous publication. Requires the rate
+    history to have been loaded (POST /exchange-rates/history/load).
+    """
+    from rate_history_service import RateHistoryService
+
+    rate = RateHistoryService.get_rate_on(db, rate_date, from_currency.upper(), to_currency.upper())
+    if rate is None:
+        raise HTTPException(status_code=404, detail=f"No historical rate stored for {rate_date}")
+
     return {
-        "base": base,
-        "rates": all_rates,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
+        "from": from_currency.upper(),
+        "to": to_currency.upper(),
+        "date": rate_date.isoformat(),
+        "rate": round(rate, 6),
     }
 
+@router.post("/exchange-rates/history/load")
+def load_exchange_rate_history(
+    full: bool = False,
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(require_admin),
+):
+    """
+    Load the ECB historical rates file into the database (admin only).
+
+    Only days newer than the latest stored one are added unless full=true.
+    """
+    import requests
+    from rate_history_service import RateHistoryService
+
+    try:
+        inserted = RateHistoryService.load_from_ecb(db, full=full)
+    except requests.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Failed to download ECB history: {e}")
+
+    return {"inserted": inserted}
+
+@router.get("/exchange-rates/status")
+def get_exchange_rates_status():
+    """
+    Get the state of the exchange rate provider for monitoring.
+
+    Returns the circuit breaker state (closed / open / half_open), failure
+    counters and the age of the last good ECB snapshot.
+    """
+    from exchange_rate_service import ExchangeRateService
+
+    return ExchangeRateService.get_status()
+
 # --- Health check ---
 @router.get("/health")
 def health_check():
@@ -0,0 +1,102 @@
+"""
+Benchmark for the analytics engine.
+Times AnalyticsEngine on synthetic trade histories of 10k, 100k and 1M
+trades against a plain-Python pass over the same data.
+
+Usage:
+    python bench_analytics.py [sizes...]
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import AnalyticsEngine
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+PAIRS = ["EUR/USD", "GBP/USD", "USD/JPY", "EURJPY", "XAUUSD", None]
+
+
+def synthetic_trades(n: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "pnl": rng.normal(5, 100, n),
+        "currency": rng.choice(np.array([None, "", "USD", "EUR"], dtype=object), n),
+        "pair": rng.choice(np.array(PAIRS, dtype=object), n),
+        "exchange_rate": rng.choice([np.nan, 0.0, 1.1], n),
+        "sl1_pips": rng.uniform(5, 50, n),
+        "lots": rng.choice([0.1, 0.5, 1.0], n),
+    })
+
+
+def python_baseline(pnl: list, risk: list, initial_capital: float) -> dict:
+    """The same core metrics the way calculate_report used to do it: lists and loops."""
+    wins = [p for p in pnl if p > 0]
+    losses = [p for p in pnl if p < 0]
+    equity = peak = initial_capital
+    max_drawdown = 0.0
+    streak = longest = 0
+    r_multiples = []
+    for p, r in zip(pnl, risk):
+        equity += p
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, peak - equity)
+        streak = streak + 1 if p > 0 else 0
+        longest = max(longest, streak)
+        if r == r and r > 0:
+            r_multiples.append(p / r)
+    return {
+        "total_profit": sum(wins),
+        "total_loss": sum(losses),
+        "max_drawdown": max_drawdown,
+        "longest_win_streak": longest,
+        "avg_r_multiple": sum(r_multiples) / len(r_multiples) if r_multiples else None,
+    }
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(sizes=DEFAULT_SIZES):
+    print(f"{'trades':>10} {'prepare':>10} {'compute':>10} {'python':>10} {'speedup':>8}")
+    for n in sizes:
+        frame = synthetic_trades(n)
+
+        def prepare():
+            AnalyticsEngine._pnl_currencies(frame, "USD")
+            return AnalyticsEngine._risk_amounts(frame["pair"], frame["sl1_pips"], frame["lots"])
+
+        risk, _ = prepare()
+        pnl = frame["pnl"].to_numpy()
+
+        prepare_time = timed(prepare)
+        compute_time = timed(AnalyticsEngine.compute, pnl, risk, 10_000.0)
+        python_time = timed(python_baseline, pnl.tolist(), risk.tolist(), 10_000.0, repeat=1)
+
+        # Both paths must agree before their timings mean anything
+        engine = AnalyticsEngine.compute(pnl, risk, 10_000.0)
+        baseline = python_baseline(pnl.tolist(), risk.tolist(), 10_000.0)
+        for key, value in baseline.items():
+            assert np.isclose(engine[key], value), f"{key}: engine {engine[key]} != python {value}"
+
+        print(
+            f"{n:>10,} {prepare_time * 1000:>8.1f}ms {compute_time * 1000:>8.1f}ms "
+            f"{python_time * 1000:>8.1f}ms {python_time / compute_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
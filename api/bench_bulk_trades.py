@@ -0,0 +1,103 @@
+"""
+Benchmark for bulk trade creation.
+Creates the same synthetic trades through N calls to POST /api/trades/ and
+through POST /api/trades/bulk (in requests of up to MAX_BULK_TRADES rows),
+in-process with the TestClient against a scratch SQLite file (or
+DATABASE_URL, if set, pointing at a scratch database).
+
+Usage:
+    python bench_bulk_trades.py [sizes...]
+"""
+
+import sys
+import os
+import random
+import tempfile
+import time
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+# Before the app is imported: scratch database, no ECB refresher
+_scratch = None
+if not os.getenv("DATABASE_URL"):
+    _scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    os.environ["DATABASE_URL"] = f"sqlite:///{_scratch}"
+os.environ["EXCHANGE_RATE_REFRESHER"] = "false"
+
+from fastapi.testclient import TestClient
+
+import api
+from database import SessionLocal
+from models import Trade, User
+from trade_bulk import MAX_BULK_TRADES
+
+DEFAULT_SIZES = (100, 1000, 5000)
+
+
+def synthetic_rows(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "pair": rng.choice(["EUR/USD", "GBP/USD", "USD/JPY", "XAUUSD"]),
+            "system": rng.choice(["breakout", "trend"]),
+            "action": rng.choice(["buy", "sell"]),
+            "lots": rng.choice([0.1, 0.5, 1.0]),
+            "profit_or_loss": rng.uniform(-100, 100),
+        }
+        for _ in range(n)
+    ]
+
+
+def _bench_user(db, name: str) -> int:
+    user = User(username=name, email=f"{name}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def run(sizes=DEFAULT_SIZES):
+    db = SessionLocal()
+    current = {}
+    api.app.dependency_overrides[api.get_current_user] = lambda: db.get(User, current["id"])
+
+    print(f"{'trades':>8} {'per-row':>10} {'bulk':>10} {'speedup':>8}")
+    with TestClient(api.app) as client:
+        for n in sizes:
+            rows = synthetic_rows(n)
+
+            current["id"] = _bench_user(db, f"bench_single_{n}_{time.time_ns()}")
+            started = time.perf_counter()
+            for row in rows:
+                assert client.post("/api/trades/", json=row).status_code == 200
+            single_time = time.perf_counter() - started
+            single_id = current["id"]
+
+            current["id"] = _bench_user(db, f"bench_bulk_{n}_{time.time_ns()}")
+            started = time.perf_counter()
+            for offset in range(0, n, MAX_BULK_TRADES):
+                response = client.post("/api/trades/bulk", json=rows[offset:offset + MAX_BULK_TRADES])
+                assert response.status_code == 200 and not response.json()["errors"]
+            bulk_time = time.perf_counter() - started
+
+            # Both paths must have written the same trades
+            for user_id in (single_id, current["id"]):
+                assert db.query(Trade).filter(Trade.owner_id == user_id).count() == n
+
+            print(
+                f"{n:>8,} {single_time * 1000:>8.0f}ms {bulk_time * 1000:>8.0f}ms "
+                f"{single_time / bulk_time:>7.1f}x"
+            )
+
+    api.app.dependency_overrides.clear()
+    db.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    try:
+        run(sizes)
+    finally:
+        if _scratch:
+            os.remove(_scratch)
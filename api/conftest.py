@@ -0,0 +1,59 @@
+"""
+Shared setup for the database tests: a fresh in-memory SQLite database with
+every table, seeded users and the report aggregates consistency check.
+The plain functions are also imported by the tests' __main__ blocks.
+"""
+
+import sys
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from database import Base
+from models import User
+from report_aggregates import ReportAggregates
+
+
+def memory_sessionmaker() -> sessionmaker:
+    """Session factory bound to a new in-memory SQLite database with the full schema."""
+    # One shared connection, so every session (and thread) sees the same database
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def seed_user(db, username: str = "trader", **fields) -> User:
+    """Create and commit a user named username."""
+    user = User(username=username, email=f"{username}@example.com", hashed_password="x", **fields)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def assert_aggregates_in_sync(db, user_id: int):
+    """Check a user's stored report aggregates against a fresh aggregation of the trades table."""
+    keys, sums = ReportAggregates.buckets(db, user_id)
+    stored = dict(zip(keys, sums))
+    live = ReportAggregates.compute(db, user_id)
+    assert set(stored) == set(live), f"Buckets differ: {sorted(stored)} vs {sorted(live)}"
+    for key, row in live.items():
+        assert np.allclose(stored[key], row), f"Bucket {key!r}: stored {stored[key]}, live {row}"
+
+
+@pytest.fixture
+def session_factory() -> sessionmaker:
+    return memory_sessionmaker()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
@@ -3,12 +3,28 @@ Exchange Rate Service
 Fetches live currency exchange rates from multiple sources with caching.
 """
 
+import numpy as np
+import pandas as pd
 import requests
+import httpx
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
-from typing import Optional, Dict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Iterable, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
 
+from fastapi.concurrency import run_in_threadpool
+
+from shared_rate_cache import SharedRateStore
+
 logger = logging.getLogger(__name__)
 
 # Fallback rates (if API is down)
@@ -25,10 +41,344 @@ FALLBACK_RATES = {
     "INR": 0.012,
 }
 
-# Cache with TTL
-_rate_cache: Dict[str, Dict] = {}
+# Snapshot TTL; an expired snapshot is still served (as stale) until replaced
 _cache_ttl = 3600  # 1 hour in seconds
 
+# Refresh bookkeeping (exposed through get_status)
+_last_refresh_at: Optional[datetime] = None
+_last_refresh_duration: Optional[float] = None
+
+# Last good snapshot persisted on disk so that a restarted worker serves real
+# rates immediately. Set EXCHANGE_RATE_SNAPSHOT_PATH to an empty string to disable.
+SNAPSHOT_PATH = os.getenv(
+    "EXCHANGE_RATE_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ecb_rates_snapshot.json"),
+)
+
+# Optional cross-worker snapshot store (EXCHANGE_RATE_SHARED_CACHE=<sqlite file>).
+# Workers on the same host then share one snapshot and one upstream fetch.
+_shared_store: Optional[SharedRateStore] = SharedRateStore.from_env()
+SHARED_FETCH_LEASE_SECONDS = 10
+
+# Pooled HTTP clients: one keep-alive connection to ECB instead of a new
+# TCP/TLS handshake per fetch. The async client is bound to the event loop
+# that created it and is rebuilt if a different loop asks for it.
+_http_session = requests.Session()
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_refresh: Optional[asyncio.Task] = None
+
+# ECB publishes reference rates on TARGET working days at ~16:00 CET
+ECB_PUBLICATION_TZ = "Europe/Berlin"
+ECB_PUBLICATION_HOUR = 16
+ECB_PUBLICATION_DELAY_MINUTES = 5
+
+
+class CrossRateMatrix:
+    """
+    A rates snapshot compiled into a dense cross-rate matrix.
+
+    ``matrix[i, j]`` is the rate converting currency ``currencies[i]`` into
+    ``currencies[j]``, i.e. ``rates[j] / rates[i]`` for a common-base rates
+    dict. Built once per snapshot so lookups are an index, not a division.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        self.currencies = sorted(rates)
+        self.index = {currency: i for i, currency in enumerate(self.currencies)}
+        values = np.array([rates[c] for c in self.currencies], dtype=float)
+        self.matrix = values[np.newaxis, :] / values[:, np.newaxis]
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        i = self.index.get(from_currency)
+        j = self.index.get(to_currency)
+        if i is None or j is None:
+            return None
+        return float(self.matrix[i, j])
+
+    def rates_to(self, to_currency: str, from_currencies: Iterable[str]) -> np.ndarray:
+        """Rates from each of from_currencies into to_currency; NaN where unknown."""
+        from_currencies = list(from_currencies)
+        result = np.full(len(from_currencies), np.nan)
+        j = self.index.get(to_currency)
+        if j is None:
+            return result
+        idx = np.array([self.index.get(c, -1) for c in from_currencies], dtype=np.intp)
+        known = idx >= 0
+        result[known] = self.matrix[idx[known], j]
+        return result
+
+
+_fallback_matrix = CrossRateMatrix(FALLBACK_RATES)
+
+
+def _rates_id(rates: Dict[str, float]) -> str:
+    """Content hash identifying a set of rates (used as snapshot id / ETag)."""
+    payload = json.dumps(rates, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _make_snapshot(rates: Dict[str, float], fetched_at: datetime, previous: Optional[Dict] = None) -> Dict:
+    """
+    Build a cache snapshot (rates plus compiled cross-rate matrix).
+    
+    modified_at only moves when the rates actually change, so re-fetching
+    an unchanged ECB file does not invalidate HTTP caches.
+    """
+    snapshot_id = _rates_id(rates)
+    modified_at = fetched_at
+    if previous is not None and previous["id"] == snapshot_id:
+        modified_at = previous["modified_at"]
+    
+    return {
+        "id": snapshot_id,
+        "rates": rates,
+        "matrix": CrossRateMatrix(rates),
+        "fetched_at": fetched_at,
+        "modified_at": modified_at,
+        "expires_at": fetched_at + timedelta(seconds=_cache_ttl),
+        "rebased": {},  # base currency -> rounded rates, filled lazily
+    }
+
+
+class RateCache:
+    """
+    The current rate snapshot, plus lookup counters.
+
+    ``current`` is replaced by each refresh and never dropped, so an
+    upstream outage degrades to the last good rates rather than to
+    FALLBACK_RATES. Rates of past days come from the stored ECB history
+    (RateHistoryService), not from here.
+
+    Lookup outcomes are counted for TTL tuning:
+    hits (fresh snapshot), stale (expired snapshot served), misses (no
+    snapshot available) and fallbacks (static FALLBACK_RATES used).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current: Optional[Dict] = None
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.fallbacks = 0
+
+    def put(self, snapshot: Dict):
+        """Make snapshot the current snapshot."""
+        with self._lock:
+            self.current = snapshot
+
+    def record(self, outcome: str):
+        """Count a lookup outcome: 'hits', 'misses', 'stale' or 'fallbacks'."""
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def clear(self):
+        with self._lock:
+            self.current = None
+            self._reset_stats()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.stale + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "fallbacks": self.fallbacks,
+                "hit_ratio": (self.hits / lookups) if lookups else None,
+            }
+
+
+_rate_cache = RateCache()
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker guarding the upstream rate provider.
+
+    - closed: requests go through. After a failure, further requests are
+      suppressed for ``negative_ttl`` seconds (negative cache).
+    - open: ``failure_threshold`` consecutive failures were seen; no requests
+      go through until ``reset_timeout`` seconds have elapsed.
+    - half_open: a single probe request is let through. Success closes the
+      breaker, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0, negative_ttl: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_short_circuits = 0
+        self.last_failure_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Return True if a call to the upstream provider may be attempted now."""
+        with self._lock:
+            now = time.monotonic()
+
+            if self.state == self.OPEN:
+                if now - self.opened_at >= self.reset_timeout:
+                    self.state = self.HALF_OPEN
+                    self._probe_in_flight = True
+                    logger.info("Exchange rate circuit half-open, probing upstream")
+                    return True
+                self.total_short_circuits += 1
+                return False
+
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    self.total_short_circuits += 1
+                    return False
+                self._probe_in_flight = True
+                return True
+
+            # Closed: honour the negative cache left by the last failure
+            if self.last_failure_at is not None and now - self.last_failure_at < self.negative_ttl:
+                self.total_short_circuits += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Exchange rate circuit closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.last_failure_at = None
+            self.last_success_at = time.monotonic()
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            now = time.monotonic()
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_failure_at = now
+            self.last_error = str(error)
+            self._probe_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"Exchange rate circuit opened after {self.consecutive_failures} "
+                        f"consecutive failures: {error}"
+                    )
+                self.state = self.OPEN
+                self.opened_at = now
+
+    def reset(self):
+        with self._lock:
+            self._reset_state()
+
+    def get_state(self) -> Dict:
+        """Return a snapshot of the breaker state for monitoring."""
+        with self._lock:
+            now = time.monotonic()
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, self.reset_timeout - (now - self.opened_at))
+            elif self.state == self.CLOSED and self.last_failure_at is not None:
+                remaining = self.negative_ttl - (now - self.last_failure_at)
+                retry_in = remaining if remaining > 0 else None
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "total_short_circuits": self.total_short_circuits,
+                "last_error": self.last_error,
+                "seconds_since_last_failure": (now - self.last_failure_at) if self.last_failure_at is not None else None,
+                "seconds_since_last_success": (now - self.last_success_at) if self.last_success_at is not None else None,
+                "retry_in_seconds": retry_in,
+            }
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block until it finishes and receive the same result (or
+    exception). Scope is a single process.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error: Optional[BaseException] = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, "SingleFlight._Call"] = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = SingleFlight._Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def completion(self, key: str) -> Optional[threading.Event]:
+        """Event set when the call in flight for key finishes, or None if there is none."""
+        with self._lock:
+            call = self._calls.get(key)
+            return call.done if call is not None else None
+
+
+_ecb_breaker = CircuitBreaker()
+_ecb_flight = SingleFlight()
+ECB_FLIGHT_KEY = "ecb_daily"
+
+# Set while a request-triggered revalidation thread is running
+_revalidate_lock = threading.Lock()
+_revalidating = False
+
 
 class ExchangeRateService:
     """Service for fetching live exchange rates from multiple sources."""
@@ -75,6 +425,39 @@ class ExchangeRateService:
         # Fall back to static rates
         return ExchangeRateService._get_fallback_rate(from_currency, to_currency)
     
+    @staticmethod
+    async def get_rate_async(from_currency: str, to_currency: str) -> float:
+        """
+        Async variant of get_rate, for use from async endpoints.
+        
+        Same ECB → cache → static fallback chain, but an ECB fetch is awaited
+        on the pooled httpx client instead of blocking a worker thread.
+        """
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        
+        if from_currency == to_currency:
+            return 1.0
+        
+        try:
+            snapshot = await ExchangeRateService._get_ecb_snapshot_async()
+            if snapshot is not None:
+                rate = snapshot["matrix"].rate(from_currency, to_currency)
+                if rate:
+                    return rate
+        except Exception as e:
+            logger.warning(f"ECB API failed: {e}. Falling back to cached rates.")
+        
+        return ExchangeRateService._get_offline_rate(from_currency, to_currency)
+    
+    @staticmethod
+    def _get_offline_rate(from_currency: str, to_currency: str) -> float:
+        """Rate from the in-memory snapshot, else the static table. Never touches the network."""
+        cached_rate = ExchangeRateService._get_from_cache(from_currency, to_currency)
+        if cached_rate:
+            return cached_rate
+        return ExchangeRateService._get_fallback_rate(from_currency, to_currency)
+    
     @staticmethod
     def _get_from_ecb(from_currency: str, to_currency: str) -> Optional[float]:
         """
@@ -83,49 +466,370 @@ class ExchangeRateService:
         
         Returns rate to convert from_currency to to_currency.
         """
-        from_currency = from_currency.upper()
-        to_currency = to_currency.upper()
+        snapshot = ExchangeRateService._get_ecb_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot["matrix"].rate(from_currency.upper(), to_currency.upper())
+    
+    @staticmethod
+    def _get_ecb_snapshot() -> Optional[Dict]:
+        """
+        Return the current ECB snapshot (EUR base) from memory.
+        
+        An expired snapshot is served as-is while a refresh runs in the
+        background (stale-while-revalidate): the background refresher if it
+        is running, else at most one revalidation thread. Only a cold start
+        with no background refresher running fetches synchronously.
+        
+        Returns None without touching the network while the circuit breaker
+        is open or a recent failure is still negatively cached.
+        """
+        snapshot = _rate_cache.current
+        if snapshot is not None:
+            if datetime.utcnow() >= snapshot["expires_at"]:
+                _rate_cache.record("stale")
+                ExchangeRateService.refresh_in_background()
+            else:
+                _rate_cache.record("hits")
+            return snapshot
+        
+        _rate_cache.record("misses")
+        if _refresher.is_running():
+            # The refresher owns the network: never make a request wait on ECB
+            return None
+        
+        ExchangeRateService.refresh_rates()
+        return _rate_cache.current
+    
+    @staticmethod
+    def refresh_rates(force: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Fetch ECB rates into the cache, unless a fresh snapshot already exists.
         
-        # Check cache first
-        cache_key = f"ecb_rates_{datetime.utcnow().strftime('%Y-%m-%d')}"
-        if cache_key in _rate_cache:
-            rates = _rate_cache[cache_key]["rates"]
-            return ExchangeRateService._convert_from_rates(rates, from_currency, to_currency)
+        Only one thread per process downloads the rates; concurrent callers
+        wait for its result instead of hitting ECB themselves.
+        """
+        return _ecb_flight.do(ECB_FLIGHT_KEY, lambda: ExchangeRateService._refresh_ecb_rates(force))
+    
+    @staticmethod
+    def _should_revalidate() -> bool:
+        """
+        True if a request that found a stale snapshot should start a refresh.
         
+        Not while the background refresher runs (it wakes at expiry and
+        retries on its own), nor while the circuit breaker is open or a
+        failure is negatively cached.
+        """
+        if _refresher.is_running():
+            return False
+        return not _ecb_breaker.get_state()["retry_in_seconds"]
+    
+    @staticmethod
+    def refresh_in_background():
+        """Start a refresh on a daemon thread unless one is already running or due to fail."""
+        global _revalidating
+        if _ecb_flight.in_flight() or not ExchangeRateService._should_revalidate():
+            return
+        with _revalidate_lock:
+            if _revalidating:
+                return
+            _revalidating = True
+        threading.Thread(
+            target=ExchangeRateService._revalidate,
+            name="ecb-rate-revalidate",
+            daemon=True,
+        ).start()
+    
+    @staticmethod
+    def _revalidate():
+        global _revalidating
         try:
-            response = requests.get(ExchangeRateService.ECB_URL, timeout=5)
-            response.raise_for_status()
-            
-            # Parse XML
-            root = ET.fromstring(response.content)
-            
-            # ECB XML namespace
-            ns = {'ecb': 'http://www.ecb.int/vocabulary/2002-08-01/eurofxref'}
-            
-            rates = {"EUR": 1.0}  # Base currency
-            
-            # Extract all currency rates (relative to EUR)
-            for cube in root.findall('.//ecb:Cube[@currency]', ns):
-                currency = cube.get('currency')
-                rate = float(cube.get('rate'))
-                rates[currency] = rate
-            
-            # Cache the rates
-            _rate_cache[cache_key] = {
-                "rates": rates,
-                "expires_at": datetime.utcnow() + timedelta(seconds=_cache_ttl)
-            }
-            
-            logger.info(f"ECB rates fetched successfully. {len(rates)} currencies cached.")
-            
-            return ExchangeRateService._convert_from_rates(rates, from_currency, to_currency)
+            ExchangeRateService.refresh_rates()
+        except Exception as e:
+            logger.error(f"Exchange rate revalidation failed: {e}")
+        finally:
+            with _revalidate_lock:
+                _revalidating = False
+    
+    @staticmethod
+    async def refresh_rates_async(force: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Async variant of refresh_rates.
+        
+        Concurrent awaiters on the same event loop share one fetch task. The
+        task is shielded, so a cancelled request does not abort the fetch
+        the other awaiters are waiting on.
+        """
+        return await asyncio.shield(ExchangeRateService._start_async_refresh(force))
+    
+    @staticmethod
+    def _start_async_refresh(force: bool = False) -> asyncio.Task:
+        """Return the in-flight async refresh task, starting one if there is none."""
+        global _async_refresh
+        task = _async_refresh
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(ExchangeRateService._refresh_ecb_rates_async(force))
+            _async_refresh = task
+        return task
+    
+    @staticmethod
+    async def _get_ecb_snapshot_async() -> Optional[Dict]:
+        """
+        Async variant of _get_ecb_snapshot.
+        
+        Stale snapshots are revalidated by a task on the event loop rather
+        than a thread; a cold start awaits the fetch without blocking.
+        """
+        snapshot = _rate_cache.current
+        if snapshot is not None:
+            if datetime.utcnow() >= snapshot["expires_at"]:
+                _rate_cache.record("stale")
+                if ExchangeRateService._should_revalidate():
+                    ExchangeRateService._start_async_refresh()
+            else:
+                _rate_cache.record("hits")
+            return snapshot
+        
+        _rate_cache.record("misses")
+        if _refresher.is_running():
+            return None
+        
+        await ExchangeRateService.refresh_rates_async()
+        return _rate_cache.current
+    
+    @staticmethod
+    async def _refresh_ecb_rates_async(force: bool = False) -> Optional[Dict[str, float]]:
+        """Async counterpart of _refresh_ecb_rates. Runs inside the async refresh task."""
+        # A threaded refresh (background refresher, sync caller) may already be fetching
+        done = _ecb_flight.completion(ECB_FLIGHT_KEY)
+        if done is not None:
+            await run_in_threadpool(done.wait, SHARED_FETCH_LEASE_SECONDS)
+        
+        snapshot = _rate_cache.current
+        if not force and snapshot is not None and datetime.utcnow() < snapshot["expires_at"]:
+            return snapshot["rates"]
+        
+        if _shared_store is not None:
+            return await ExchangeRateService._refresh_via_shared_store_async(force)
+        
+        return await ExchangeRateService._fetch_and_install_async()
+    
+    @staticmethod
+    def _refresh_ecb_rates(force: bool = False) -> Optional[Dict[str, float]]:
+        """Fetch ECB rates and install them as the current snapshot. Runs inside the single-flight."""
+        # Another flight may have refreshed the snapshot while we were queued
+        snapshot = _rate_cache.current
+        if not force and snapshot is not None and datetime.utcnow() < snapshot["expires_at"]:
+            return snapshot["rates"]
+        
+        if _shared_store is not None:
+            return ExchangeRateService._refresh_via_shared_store(force)
+        
+        return ExchangeRateService._fetch_and_install()
+    
+    @staticmethod
+    def _refresh_via_shared_store(force: bool) -> Optional[Dict[str, float]]:
+        """
+        Refresh through the cross-worker store.
+        
+        A snapshot another worker already published is adopted as-is.
+        Otherwise the worker holding the fetch lease downloads from ECB and
+        publishes; the rest keep serving what they have (a cold worker waits
+        briefly for the publication).
+        """
+        adopted = ExchangeRateService._adopt_shared_snapshot(force)
+        if adopted is not None:
+            return adopted["rates"]
+        
+        if _shared_store.acquire_lease(SHARED_FETCH_LEASE_SECONDS):
+            try:
+                # The previous lease holder may have published since the check above
+                adopted = ExchangeRateService._adopt_shared_snapshot(force)
+                if adopted is not None:
+                    return adopted["rates"]
+                return ExchangeRateService._fetch_and_install()
+            finally:
+                _shared_store.release_lease()
+        
+        if _rate_cache.current is None:
+            deadline = time.monotonic() + SHARED_FETCH_LEASE_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.1)
+                adopted = ExchangeRateService._adopt_shared_snapshot(force=False)
+                if adopted is not None:
+                    return adopted["rates"]
         
-        except requests.RequestException as e:
+        current = _rate_cache.current
+        return current["rates"] if current is not None else None
+    
+    @staticmethod
+    async def _refresh_via_shared_store_async(force: bool) -> Optional[Dict[str, float]]:
+        """
+        Async counterpart of _refresh_via_shared_store.
+        
+        The store is SQLite (reads, and a lease taken with BEGIN IMMEDIATE
+        and a busy timeout), so every store call runs in the threadpool.
+        """
+        adopted = await run_in_threadpool(ExchangeRateService._adopt_shared_snapshot, force)
+        if adopted is not None:
+            return adopted["rates"]
+        
+        if await run_in_threadpool(_shared_store.acquire_lease, SHARED_FETCH_LEASE_SECONDS):
+            try:
+                adopted = await run_in_threadpool(ExchangeRateService._adopt_shared_snapshot, force)
+                if adopted is not None:
+                    return adopted["rates"]
+                return await ExchangeRateService._fetch_and_install_async()
+            finally:
+                await run_in_threadpool(_shared_store.release_lease)
+        
+        if _rate_cache.current is None:
+            deadline = time.monotonic() + SHARED_FETCH_LEASE_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+                adopted = await run_in_threadpool(ExchangeRateService._adopt_shared_snapshot, False)
+                if adopted is not None:
+                    return adopted["rates"]
+        
+        current = _rate_cache.current
+        return current["rates"] if current is not None else None
+    
+    @staticmethod
+    def _adopt_shared_snapshot(force: bool) -> Optional[Dict]:
+        """
+        Install the snapshot published in the shared store if it is usable.
+        
+        Usable means unexpired and, when force is set, fetched after the
+        latest ECB publication. Returns the installed snapshot or None.
+        """
+        try:
+            shared = _shared_store.read()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read shared exchange rate cache: {e}")
+            return None
+        
+        if shared is None:
+            return None
+        
+        now = datetime.utcnow()
+        if now >= shared["fetched_at"] + timedelta(seconds=_cache_ttl):
+            return None
+        if force and next_ecb_publication(shared["fetched_at"]) <= now:
+            return None
+        
+        current = _rate_cache.current
+        if current is not None and current["fetched_at"] >= shared["fetched_at"]:
+            return current
+        
+        snapshot = _make_snapshot(shared["rates"], shared["fetched_at"])
+        snapshot["modified_at"] = shared["modified_at"]
+        _rate_cache.put(snapshot)
+        logger.info(f"Adopted exchange rate snapshot {shared['id']} from shared cache")
+        return snapshot
+    
+    @staticmethod
+    def _fetch_and_install() -> Optional[Dict[str, float]]:
+        """Download ECB rates, install them as the current snapshot and publish them."""
+        global _last_refresh_at, _last_refresh_duration
+        
+        if not _ecb_breaker.allow_request():
+            logger.debug("ECB fetch skipped: circuit breaker is not accepting requests")
+            return None
+        
+        started = time.monotonic()
+        try:
+            rates = ExchangeRateService._fetch_ecb_rates()
+        except Exception as e:
+            _ecb_breaker.record_failure(e)
             logger.error(f"Failed to fetch ECB rates: {e}")
             return None
+        finally:
+            _last_refresh_duration = time.monotonic() - started
+            _last_refresh_at = datetime.utcnow()
+        
+        return ExchangeRateService._install_rates(rates)
+    
+    @staticmethod
+    async def _fetch_and_install_async() -> Optional[Dict[str, float]]:
+        """Async variant of _fetch_and_install: the download does not occupy a thread."""
+        global _last_refresh_at, _last_refresh_duration
+        
+        if not _ecb_breaker.allow_request():
+            logger.debug("ECB fetch skipped: circuit breaker is not accepting requests")
+            return None
+        
+        started = time.monotonic()
+        try:
+            rates = await ExchangeRateService._fetch_ecb_rates_async()
         except Exception as e:
-            logger.error(f"Error parsing ECB rates: {e}")
+            _ecb_breaker.record_failure(e)
+            logger.error(f"Failed to fetch ECB rates: {e}")
             return None
+        finally:
+            _last_refresh_duration = time.monotonic() - started
+            _last_refresh_at = datetime.utcnow()
+        
+        # Installing writes the snapshot file and publishes to the shared store
+        return await run_in_threadpool(ExchangeRateService._install_rates, rates)
+    
+    @staticmethod
+    def _install_rates(rates: Dict[str, float]) -> Dict[str, float]:
+        """Record a successful fetch, install the rates as the current snapshot and publish them."""
+        _ecb_breaker.record_success()
+        
+        # Cache the rates
+        snapshot = _make_snapshot(rates, datetime.utcnow(), previous=_rate_cache.current)
+        _rate_cache.put(snapshot)
+        
+        logger.info(f"ECB rates fetched successfully. {len(rates)} currencies cached.")
+        
+        try:
+            save_snapshot(snapshot)
+        except OSError as e:
+            logger.warning(f"Failed to persist exchange rate snapshot: {e}")
+        
+        if _shared_store is not None:
+            try:
+                _shared_store.publish(snapshot)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to publish to shared exchange rate cache: {e}")
+        
+        return rates
+    
+    @staticmethod
+    def _fetch_ecb_rates() -> Dict[str, float]:
+        """Download and parse the ECB daily XML. Raises on any network or parse error."""
+        response = _http_session.get(ExchangeRateService.ECB_URL, timeout=5)
+        response.raise_for_status()
+        return ExchangeRateService._parse_ecb_xml(response.content)
+    
+    @staticmethod
+    async def _fetch_ecb_rates_async() -> Dict[str, float]:
+        """Async variant of _fetch_ecb_rates on the pooled httpx client."""
+        response = await _get_async_client().get(ExchangeRateService.ECB_URL)
+        response.raise_for_status()
+        return ExchangeRateService._parse_ecb_xml(response.content)
+    
+    @staticmethod
+    def _parse_ecb_xml(content: bytes) -> Dict[str, float]:
+        """Parse the ECB daily XML into {currency: rate per EUR}. Raises if it holds no rates."""
+        root = ET.fromstring(content)
+        
+        # ECB XML namespace
+        ns = {'ecb': 'http://www.ecb.int/vocabulary/2002-08-01/eurofxref'}
+        
+        rates = {"EUR": 1.0}  # Base currency
+        
+        # Extract all currency rates (relative to EUR)
+        for cube in root.findall('.//ecb:Cube[@currency]', ns):
+            currency = cube.get('currency')
+            rate = float(cube.get('rate'))
+            rates[currency] = rate
+        
+        if len(rates) == 1:
+            raise ValueError("ECB response contained no rates")
+        
+        return rates
     
     @staticmethod
     def _convert_from_rates(rates: Dict[str, float], from_curr: str, to_curr: str) -> Optional[float]:
@@ -147,17 +851,24 @@ class ExchangeRateService:
     
     @staticmethod
     def _get_from_cache(from_currency: str, to_currency: str) -> Optional[float]:
-        """Get rate from in-memory cache if available and not expired."""
+        """
+        Get rate from the current in-memory snapshot if available.
+        
+        The snapshot is used regardless of age, since stale ECB rates beat
+        the static table. Older cache entries are never consulted: they carry
+        the same currencies with older rates.
+        """
+        snapshot = _rate_cache.current
+        if snapshot is None:
+            return None
+        
         from_currency = from_currency.upper()
         to_currency = to_currency.upper()
         
-        for cache_key, cache_data in _rate_cache.items():
-            if datetime.utcnow() < cache_data.get("expires_at", datetime.utcnow()):
-                rates = cache_data.get("rates", {})
-                result = ExchangeRateService._convert_from_rates(rates, from_currency, to_currency)
-                if result:
-                    logger.debug(f"Using cached rate: {from_currency}/{to_currency} = {result}")
-                    return result
+        result = snapshot["matrix"].rate(from_currency, to_currency)
+        if result:
+            logger.debug(f"Using cached rate: {from_currency}/{to_currency} = {result}")
+            return result
         
         return None
     
@@ -166,19 +877,104 @@ class ExchangeRateService:
         """Get rate from static fallback rates."""
         from_currency = from_currency.upper()
         to_currency = to_currency.upper()
+        _rate_cache.record("fallbacks")
         
-        from_rate = FALLBACK_RATES.get(from_currency)
-        to_rate = FALLBACK_RATES.get(to_currency)
+        # All rates are relative to USD, so convert properly
+        rate = _fallback_matrix.rate(from_currency, to_currency)
         
-        if from_rate is None or to_rate is None:
+        if rate is None:
             logger.warning(f"Currency not in fallback rates: {from_currency} or {to_currency}")
             return 1.0
         
-        # All rates are relative to USD, so convert properly
-        rate = to_rate / from_rate
         logger.info(f"Using fallback rate: {from_currency}/{to_currency} = {rate}")
         return rate
     
+    @staticmethod
+    def convert_many(
+        amounts: Sequence[float],
+        from_currencies: Sequence[Optional[str]],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Convert an array of amounts, each in its own currency, to to_currency.
+        
+        Currencies are factorized once, each distinct currency is resolved
+        against the current snapshot's cross-rate matrix (then the same
+        cache/fallback chain as get_rate), and the conversion itself is a
+        single vectorized multiply. Missing currencies (None) are treated as
+        already being in to_currency.
+        
+        Returns:
+            float64 array of converted amounts, same length as amounts.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        if amounts.size == 0:
+            return amounts.copy()
+        
+        try:
+            snapshot = ExchangeRateService._get_ecb_snapshot()
+        except Exception as e:
+            logger.warning(f"ECB API failed: {e}. Falling back to cached rates.")
+            snapshot = None
+        
+        return ExchangeRateService._convert_many_with(
+            snapshot, amounts, from_currencies, to_currency, ExchangeRateService.get_rate
+        )
+    
+    @staticmethod
+    async def convert_many_async(
+        amounts: Sequence[float],
+        from_currencies: Sequence[Optional[str]],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Async variant of convert_many: awaits the ECB snapshot instead of
+        blocking on it, then factorizes and multiplies in the threadpool so
+        large arrays do not hold up the event loop.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        if amounts.size == 0:
+            return amounts.copy()
+        
+        try:
+            snapshot = await ExchangeRateService._get_ecb_snapshot_async()
+        except Exception as e:
+            logger.warning(f"ECB API failed: {e}. Falling back to cached rates.")
+            snapshot = None
+        
+        return await run_in_threadpool(
+            ExchangeRateService._convert_many_with,
+            snapshot, amounts, from_currencies, to_currency, ExchangeRateService._get_offline_rate
+        )
+    
+    @staticmethod
+    def _convert_many_with(
+        snapshot: Optional[Dict],
+        amounts: np.ndarray,
+        from_currencies: Sequence[Optional[str]],
+        to_currency: str,
+        resolve_rate,
+    ) -> np.ndarray:
+        """Shared body of convert_many: resolve_rate handles currencies the snapshot lacks."""
+        to_currency = to_currency.upper()
+        codes, uniques = pd.factorize(np.asarray(from_currencies, dtype=object))
+        uniques = [str(currency).upper() for currency in uniques]
+        
+        if snapshot is not None:
+            factors = snapshot["matrix"].rates_to(to_currency, uniques)
+        else:
+            factors = np.full(len(uniques), np.nan)
+        
+        for k, currency in enumerate(uniques):
+            if currency == to_currency:
+                factors[k] = 1.0
+            elif np.isnan(factors[k]) or factors[k] == 0:
+                factors[k] = resolve_rate(currency, to_currency)
+        
+        # Code -1 marks a missing currency: no conversion
+        factors = np.append(factors, 1.0)
+        return amounts * factors[codes]
+    
     @staticmethod
     def get_all_rates_usd() -> Dict[str, float]:
         """
@@ -186,49 +982,340 @@ class ExchangeRateService:
         Useful for frontend or bulk conversions.
         """
         try:
-            # Get ECB rates (relative to EUR)
-            response = requests.get(ExchangeRateService.ECB_URL, timeout=5)
-            response.raise_for_status()
-            
-            root = ET.fromstring(response.content)
-            ns = {'ecb': 'http://www.ecb.int/vocabulary/2002-08-01/eurofxref'}
-            
-            rates_to_eur = {"EUR": 1.0}
-            
-            for cube in root.findall('.//ecb:Cube[@currency]', ns):
-                currency = cube.get('currency')
-                rate = float(cube.get('rate'))
-                rates_to_eur[currency] = rate
-            
-            # Convert to USD base
-            usd_rate = rates_to_eur.get("USD")
-            if usd_rate is None:
-                return FALLBACK_RATES
-            
-            rates_to_usd = {}
-            for curr, rate_to_eur in rates_to_eur.items():
-                rates_to_usd[curr] = rate_to_eur / usd_rate
-            
-            return rates_to_usd
+            snapshot = ExchangeRateService._get_ecb_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to get all rates: {e}")
+            snapshot = None
+        
+        if snapshot is None:
+            _rate_cache.record("fallbacks")
+            return FALLBACK_RATES
+        return ExchangeRateService._rebase_to_usd(snapshot["rates"])
+    
+    @staticmethod
+    def get_all_rates(base_currency: str = "USD") -> Tuple[Dict[str, float], Optional[Dict]]:
+        """
+        Get all supported rates relative to base_currency, rounded to 6 places.
+        
+        The rebased table is computed once per snapshot and base currency and
+        then reused. Returns (rates, snapshot); snapshot is None when serving
+        the static fallback table.
         
+        Raises ValueError if base_currency is not in the table being served,
+        so unknown codes are neither cached nor answered with the USD table.
+        """
+        base = base_currency.upper()
+        try:
+            snapshot = ExchangeRateService._get_ecb_snapshot()
         except Exception as e:
             logger.error(f"Failed to get all rates: {e}")
+            snapshot = None
+        
+        if snapshot is not None:
+            rebased = snapshot["rebased"].get(base)
+            if rebased is None:
+                rebased = ExchangeRateService._rebase(ExchangeRateService._rebase_to_usd(snapshot["rates"]), base)
+                snapshot["rebased"][base] = rebased
+            return rebased, snapshot
+        
+        _rate_cache.record("fallbacks")
+        return ExchangeRateService._rebase(FALLBACK_RATES, base), None
+    
+    @staticmethod
+    def _rebase(rates_to_usd: Dict[str, float], base: str) -> Dict[str, float]:
+        """Re-express a USD-based rates dict relative to base, rounded to 6 places."""
+        if base not in rates_to_usd:
+            raise ValueError(f"Unsupported base currency: {base}")
+        if base == "USD":
+            return {k: round(v, 6) for k, v in rates_to_usd.items()}
+        
+        base_rate = rates_to_usd[base]
+        return {curr: round(rate / base_rate, 6) for curr, rate in rates_to_usd.items()}
+    
+    @staticmethod
+    def _rebase_to_usd(rates_to_eur: Dict[str, float]) -> Dict[str, float]:
+        """Convert an EUR-based rates dict to USD base."""
+        usd_rate = rates_to_eur.get("USD")
+        if usd_rate is None:
             return FALLBACK_RATES
+        
+        rates_to_usd = {}
+        for curr, rate_to_eur in rates_to_eur.items():
+            rates_to_usd[curr] = rate_to_eur / usd_rate
+        
+        return rates_to_usd
+    
+    @staticmethod
+    def current_snapshot_id() -> Optional[str]:
+        """Id of the snapshot conversions currently use, or None on static fallback rates."""
+        snapshot = _rate_cache.current
+        return snapshot["id"] if snapshot is not None else None
+    
+    @staticmethod
+    def get_status() -> Dict:
+        """Return circuit breaker and cache state for monitoring."""
+        snapshot = _rate_cache.current
+        snapshot_age = None
+        snapshot_stale = None
+        if snapshot is not None:
+            snapshot_age = (datetime.utcnow() - snapshot["fetched_at"]).total_seconds()
+            snapshot_stale = datetime.utcnow() >= snapshot["expires_at"]
+        
+        return {
+            "circuit_breaker": _ecb_breaker.get_state(),
+            "cache": _rate_cache.get_stats(),
+            "fetches_in_flight": _ecb_flight.in_flight(),
+            "snapshot_id": snapshot["id"] if snapshot is not None else None,
+            "snapshot_age_seconds": snapshot_age,
+            "snapshot_stale": snapshot_stale,
+            "last_refresh_at": _last_refresh_at.isoformat() + "Z" if _last_refresh_at else None,
+            "last_refresh_duration_seconds": _last_refresh_duration,
+            "refresher": _refresher.get_state(),
+            "shared_cache": _shared_store.get_state() if _shared_store is not None else None,
+        }
     
     @staticmethod
     def clear_cache():
         """Clear the rate cache (useful for testing or manual refresh)."""
-        global _rate_cache
+        global _last_refresh_at, _last_refresh_duration
         _rate_cache.clear()
+        _last_refresh_at = None
+        _last_refresh_duration = None
+        _ecb_breaker.reset()
         logger.info("Exchange rate cache cleared")
 
 
+def next_ecb_publication(now: Optional[datetime] = None) -> datetime:
+    """
+    Return the next expected ECB publication time as a naive UTC datetime.
+    
+    ECB reference rates appear around 16:00 CET on weekdays; a small delay is
+    added so the refresh lands after the file has been updated.
+    """
+    now = now or datetime.utcnow()
+    try:
+        tz = ZoneInfo(ECB_PUBLICATION_TZ)
+    except ZoneInfoNotFoundError:
+        tz = timezone(timedelta(hours=1))  # CET without DST
+    
+    local_now = now.replace(tzinfo=timezone.utc).astimezone(tz)
+    candidate = local_now.replace(
+        hour=ECB_PUBLICATION_HOUR, minute=ECB_PUBLICATION_DELAY_MINUTES, second=0, microsecond=0
+    )
+    if candidate <= local_now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    
+    return candidate.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class RateRefresher:
+    """
+    Background thread that keeps the ECB snapshot warm.
+    
+    It wakes when the current snapshot expires or right after the next ECB
+    publication, whichever comes first, so request handlers only ever read
+    rates from memory. After a failed refresh it retries once the circuit
+    breaker allows it.
+    """
+    
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.next_run_at: Optional[datetime] = None
+        self.runs = 0
+    
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ecb-rate-refresher", daemon=True)
+        self._thread.start()
+        logger.info("Exchange rate background refresher started")
+    
+    def stop(self, timeout: float = 5.0):
+        if not self.is_running():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.next_run_at = None
+        logger.info("Exchange rate background refresher stopped")
+    
+    def _seconds_until_next_run(self) -> float:
+        now = datetime.utcnow()
+        next_run = next_ecb_publication(now)
+        
+        snapshot = _rate_cache.current
+        if snapshot is not None and now < snapshot["expires_at"]:
+            next_run = min(next_run, snapshot["expires_at"])
+        else:
+            # Missing or expired rates: retry as soon as the breaker lets us through
+            retry_in = _ecb_breaker.get_state()["retry_in_seconds"] or 0.0
+            next_run = min(next_run, now + timedelta(seconds=max(retry_in, 1.0)))
+        
+        self.next_run_at = next_run
+        return max((next_run - now).total_seconds(), 1.0)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                ExchangeRateService.refresh_rates(force=self._is_publication_due())
+                self.runs += 1
+            except Exception as e:
+                logger.error(f"Background exchange rate refresh failed: {e}")
+            self._stop.wait(self._seconds_until_next_run())
+    
+    def _is_publication_due(self) -> bool:
+        """True if an ECB publication happened after the current snapshot was fetched."""
+        snapshot = _rate_cache.current
+        if snapshot is None:
+            return False
+        fetched_at = snapshot["fetched_at"]
+        return next_ecb_publication(fetched_at) <= datetime.utcnow()
+    
+    def get_state(self) -> Dict:
+        return {
+            "running": self.is_running(),
+            "runs": self.runs,
+            "next_run_at": self.next_run_at.isoformat() + "Z" if self.next_run_at else None,
+        }
+
+
+_refresher = RateRefresher()
+
+
+def start_background_refresher():
+    """Start the background rate refresher (idempotent)."""
+    if os.getenv("EXCHANGE_RATE_REFRESHER", "true").lower() == "false":
+        logger.info("Exchange rate background refresher disabled by EXCHANGE_RATE_REFRESHER")
+        return
+    _refresher.start()
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the running event loop, creating it on first use."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(5.0),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_async_client():
+    """Close the pooled async client (call from the app's shutdown hook)."""
+    global _async_client, _async_client_loop
+    if _async_client is not None and _async_client_loop is asyncio.get_running_loop():
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+def stop_background_refresher():
+    """Stop the background rate refresher."""
+    _refresher.stop()
+
+
+def _snapshot_checksum(rates: Dict[str, float], fetched_at: str) -> str:
+    payload = json.dumps({"rates": rates, "fetched_at": fetched_at}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def save_snapshot(snapshot: Dict, path: Optional[str] = None):
+    """
+    Atomically persist a snapshot to disk.
+    
+    The file is written to a temporary sibling, fsynced and renamed over the
+    target, so readers never observe a partial file. A SHA-256 checksum of
+    the payload is stored alongside it.
+    """
+    path = SNAPSHOT_PATH if path is None else path
+    if not path:
+        return
+    
+    fetched_at = snapshot["fetched_at"].isoformat()
+    document = {
+        "version": 1,
+        "source": "ecb",
+        "fetched_at": fetched_at,
+        "rates": snapshot["rates"],
+        "checksum": _snapshot_checksum(snapshot["rates"], fetched_at),
+    }
+    
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".ecb_rates_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(document, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_snapshot(path: Optional[str] = None) -> Optional[Dict]:
+    """
+    Read a persisted snapshot, returning None if it is missing or corrupt.
+    
+    The loaded snapshot keeps its original fetch time, so it is usually
+    already expired and gets served as stale until the next refresh.
+    """
+    path = SNAPSHOT_PATH if path is None else path
+    if not path or not os.path.exists(path):
+        return None
+    
+    try:
+        with open(path) as f:
+            document = json.load(f)
+        rates = {str(k): float(v) for k, v in document["rates"].items()}
+        fetched_at = document["fetched_at"]
+        if document.get("checksum") != _snapshot_checksum(document["rates"], fetched_at):
+            logger.warning(f"Ignoring exchange rate snapshot with bad checksum: {path}")
+            return None
+        return _make_snapshot(rates, datetime.fromisoformat(fetched_at))
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable exchange rate snapshot {path}: {e}")
+        return None
+
+
+def _restore_persisted_snapshot():
+    """Seed the in-memory cache from disk at import time."""
+    snapshot = load_snapshot()
+    if snapshot is None:
+        return
+    _rate_cache.put(snapshot)
+    logger.info(
+        f"Loaded persisted exchange rate snapshot from {snapshot['fetched_at'].isoformat()}Z "
+        f"({len(snapshot['rates'])} currencies)"
+    )
+
+
+_restore_persisted_snapshot()
+
+
 # Convenience functions
 def get_exchange_rate(from_currency: str, to_currency: str) -> float:
     """Get exchange rate between two currencies."""
     return ExchangeRateService.get_rate(from_currency, to_currency)
 
 
+async def get_exchange_rate_async(from_currency: str, to_currency: str) -> float:
+    """Async variant of get_exchange_rate."""
+    return await ExchangeRateService.get_rate_async(from_currency, to_currency)
+
+
 def convert_amount(amount: float, from_currency: str, to_currency: str) -> float:
     """Convert an amount from one currency to another."""
     if amount == 0:
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Enum, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -20,6 +20,8 @@ class User(Base):
     initial_capital = Column(Float, default=1000.0)
     account_currency = Column(String, default="USD")
     avatar = Column(String, default="default_avatar.png")
+    trade_version = Column(Integer, default=0)  # bumped on every trade mutation (report cache key)
+    aggregates_materialized = Column(Boolean, default=False)  # report_aggregates rows are maintained
 
     trades = relationship("Trade", back_populates="owner")
     analyses = relationship("Analysis", back_populates="owner")
@@ -73,6 +75,15 @@ class Trade(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="trades")
 
+    __table_args__ = (
+        # Report queries: a user's active trades, optionally within a date range
+        Index("ix_trades_owner_cancelled_date", "owner_id", "cancelled", "date"),
+        # Keyset pages of /api/trades/, optionally filtered by pair or system
+        Index("ix_trades_owner_date_id", "owner_id", "date", "id"),
+        Index("ix_trades_owner_pair_date_id", "owner_id", "pair", "date", "id"),
+        Index("ix_trades_owner_system_date_id", "owner_id", "system", "date", "id"),
+    )
+
 
 class FavoriteBookmark(Base):
     __tablename__ = "favorite_bookmarks"
@@ -144,3 +155,30 @@ class AnalysisShare(Base):
     shared_by_user = relationship("User", foreign_keys=[shared_by_user_id], back_populates="analyses_shared_by_me")
 
 
+
+
+class ExchangeRateHistory(Base):
+    """Daily ECB reference rate of one currency against EUR."""
+    __tablename__ = "exchange_rate_history"
+
+    date = Column(Date, primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    rate = Column(Float, nullable=False)  # units of currency per 1 EUR
+
+    __table_args__ = (
+        # Forward-fill lookups: latest rate of a currency on or before a date
+        Index("ix_exchange_rate_history_currency_date", "currency", "date"),
+    )
+
+
+class ReportAggregate(Base):
+    """Per-currency totals of a user's active trades, maintained by report_aggregates.py."""
+    __tablename__ = "report_aggregates"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    currency = Column(String, primary_key=True)  # "" = already in the account currency
+    profit = Column(Float, nullable=False, default=0.0)
+    loss = Column(Float, nullable=False, default=0.0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,192 @@
+"""
+Monte Carlo Simulator
+Bootstrap simulation of equity paths from a user's trade history, run in
+chunks on a process pool so large simulations do not block the API worker.
+
+Each simulated trade draws a historical trade at random (with replacement)
+and applies its return on equity, so paths compound like the real account.
+Chunks are seeded from one SeedSequence, so a given seed gives the same
+result whatever the number of workers.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for simulations; 0 runs them on a thread of the API process
+MONTE_CARLO_WORKERS = int(os.getenv("MONTE_CARLO_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Upper bound on paths x trades per chunk: keeps each chunk's arrays ~16 MB
+CHUNK_CELLS = 2_000_000
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Number of equity band points returned, whatever the path length
+BAND_POINTS = 50
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def trade_returns(
+    pnl: np.ndarray,
+    risk_percent: np.ndarray,
+    opening_capital: float,
+    target_risk_percent: Optional[float] = None
+) -> np.ndarray:
+    """
+    Return on equity of each historical trade, the sample the paths draw from.
+
+    A trade's return is its P&L over the equity before it (opening_capital
+    plus the P&L of the earlier trades). With target_risk_percent, trades
+    that recorded a risk_percent are rescaled as if they had risked that
+    percentage instead. Trades taken with non-positive equity are dropped.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    risk_percent = np.asarray(risk_percent, dtype=float)
+    equity_before = opening_capital + np.concatenate(([0.0], np.cumsum(pnl)[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(equity_before > 0, pnl / equity_before, np.nan)
+        if target_risk_percent is not None:
+            scale = np.where(risk_percent > 0, target_risk_percent / risk_percent, 1.0)
+            returns = returns * scale
+    return returns[np.isfinite(returns)]
+
+
+def simulate_chunk(
+    returns: np.ndarray,
+    paths: int,
+    horizon: int,
+    seed: np.random.SeedSequence,
+    ruin_level: float,
+    band_steps: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Simulate `paths` equity paths of `horizon` trades, as multiples of the
+    starting capital. Runs in a pool worker, so it only needs NumPy.
+
+    Returns per path the maximum drawdown (fraction of the running peak),
+    the final equity, whether equity ever fell to ruin_level, and equity
+    at band_steps (float32 to keep the transfer back small).
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, returns.size, size=(paths, horizon))
+
+    # A loss of more than 100% leaves the account at zero, not negative
+    equity = np.maximum(1.0 + returns[picks], 0.0)
+    np.cumprod(equity, axis=1, out=equity)
+
+    peaks = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    max_drawdown = (1.0 - equity / peaks).max(axis=1)
+    return {
+        "max_drawdown": max_drawdown,
+        "final": equity[:, -1].copy(),
+        "ruined": equity.min(axis=1) <= ruin_level,
+        "bands": equity[:, band_steps].astype(np.float32),
+    }
+
+
+def get_pool() -> Optional[ProcessPoolExecutor]:
+    """The shared simulation pool, started on first use (None when MONTE_CARLO_WORKERS=0)."""
+    global _pool
+    if MONTE_CARLO_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process runs threads (rate refresher, event loop)
+            _pool = ProcessPoolExecutor(
+                max_workers=MONTE_CARLO_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started Monte Carlo pool with {MONTE_CARLO_WORKERS} workers")
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def simulate_async(
+    returns: np.ndarray,
+    initial_capital: float,
+    paths: int,
+    horizon: int,
+    seed: int,
+    ruin_percent: float
+) -> Dict:
+    """
+    Run the simulation in chunks on the pool and summarize it.
+
+    Ruin is equity falling to or below initial_capital minus ruin_percent
+    of it at any point of a path. Amounts are in the currency of
+    initial_capital.
+    """
+    chunk_paths = max(1, min(paths, CHUNK_CELLS // horizon))
+    sizes = [chunk_paths] * (paths // chunk_paths)
+    if paths % chunk_paths:
+        sizes.append(paths % chunk_paths)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    ruin_level = 1.0 - ruin_percent / 100
+    band_steps = np.unique(np.linspace(0, horizon - 1, min(horizon, BAND_POINTS)).astype(int))
+
+    loop = asyncio.get_running_loop()
+    pool = get_pool()
+    try:
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, simulate_chunk, returns, size, horizon, chunk_seed, ruin_level, band_steps)
+            for size, chunk_seed in zip(sizes, seeds)
+        ))
+    except BrokenProcessPool:
+        # A dead worker breaks the pool for good; the next simulation starts a new one
+        logger.error("Monte Carlo pool broke (worker died); it will be restarted")
+        shutdown_pool()
+        raise
+
+    max_drawdown = np.concatenate([chunk["max_drawdown"] for chunk in chunks]) * 100
+    final = np.concatenate([chunk["final"] for chunk in chunks]) * initial_capital
+    ruined = np.concatenate([chunk["ruined"] for chunk in chunks])
+    bands = np.percentile(
+        np.vstack([chunk["bands"] for chunk in chunks]), PERCENTILES, axis=0
+    ) * initial_capital
+
+    histogram, edges = np.histogram(max_drawdown, bins=20, range=(0.0, 100.0))
+    return {
+        "initial_capital": initial_capital,
+        "paths": paths,
+        "trades_per_path": horizon,
+        "seed": seed,
+        "ruin_capital": initial_capital * ruin_level,
+        "probability_of_ruin": float(ruined.mean()),
+        "max_drawdown_percent": _summary(max_drawdown),
+        "final_capital": _summary(final),
+        "drawdown_histogram": [
+            {"from_percent": float(low), "to_percent": float(high), "paths": int(count)}
+            for low, high, count in zip(edges[:-1], edges[1:], histogram)
+        ],
+        "equity_bands": [
+            {"trade": int(step) + 1, **{f"p{q}": float(value) for q, value in zip(PERCENTILES, column)}}
+            for step, column in zip(band_steps, bands.T)
+        ],
+    }
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        "mean": float(values.mean()),
+        **{f"p{q}": float(value) for q, value in zip(PERCENTILES, percentiles)},
+    }
@@ -3,10 +3,18 @@ Position calculation service with multi-currency support.
 Takes into account the trader's account currency and converts positions accordingly.
 """
 
-from typing import Optional, Dict, Tuple
+import heapq
+from datetime import date
+from typing import Optional, Dict, List, Tuple
+import numpy as np
 from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 from models import Trade, User
 from exchange_rate_service import ExchangeRateService
+from rate_history_service import RateHistoryService
+from report_aggregates import (
+    ACCOUNT_CURRENCY, FIELDS, ReportAggregates, active_trade_filters, resolve_pnl_currency
+)
 
 
 class PositionCalculator:
@@ -23,6 +31,18 @@ class PositionCalculator:
         rate = PositionCalculator.get_exchange_rate(from_currency, to_currency)
         return amount * rate
     
+    @staticmethod
+    def resolve_currency(trade: Trade, account_currency: str) -> str:
+        """
+        Return the currency a trade's profit_or_loss is denominated in.
+        
+        Explicit trade currency wins; forex trades with an exchange rate use
+        the quote currency of the pair; otherwise the account currency.
+        """
+        return resolve_pnl_currency(
+            trade.currency, trade.pair, bool(trade.exchange_rate), account_currency
+        )
+    
     @staticmethod
     def calculate_position_value(
         trade: Trade,
@@ -37,74 +57,295 @@ class PositionCalculator:
         if trade.profit_or_loss is None:
             return 0.0, account_currency
         
-        # If trade has explicit currency, use it
-        if trade.currency:
-            converted = PositionCalculator.convert_amount(
-                trade.profit_or_loss,
-                trade.currency,
-                account_currency
+        currency = PositionCalculator.resolve_currency(trade, account_currency)
+        if currency == account_currency:
+            return trade.profit_or_loss, account_currency
+        
+        converted = PositionCalculator.convert_amount(
+            trade.profit_or_loss,
+            currency,
+            account_currency
+        )
+        return converted, currency
+    
+    @staticmethod
+    def _trade_amounts(
+        trades: List[Trade],
+        account_currency: str
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        P&L of many trades as an array, with the currency each is in.
+        Trades without profit_or_loss count as 0.0.
+        """
+        currencies = [
+            PositionCalculator.resolve_currency(trade, account_currency)
+            for trade in trades
+        ]
+        pnl = np.array(
+            [trade.profit_or_loss if trade.profit_or_loss is not None else 0.0 for trade in trades],
+            dtype=float,
+        )
+        return pnl, currencies
+    
+    @staticmethod
+    def convert_trades(
+        trades: List[Trade],
+        account_currency: str
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        Convert the P&L of many trades to account currency in one pass, at current rates.
+        
+        Returns:
+            Tuple of (converted P&L array, original currency per trade).
+            Trades without profit_or_loss convert to 0.0.
+        """
+        pnl, currencies = PositionCalculator._trade_amounts(trades, account_currency)
+        return ExchangeRateService.convert_many(pnl, currencies, account_currency), currencies
+    
+    @staticmethod
+    def currency_buckets(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """
+        Per-currency P&L totals of the user's active trades.
+        
+        Read from the materialized report_aggregates rows (one per
+        currency), so the cost does not depend on the number of trades.
+        With date_from / date_to the totals of that range are aggregated
+        in SQL instead, over an index range scan.
+        
+        Returns:
+            Tuple of (currencies, sums) where sums[i] holds
+            [profit, loss, wins, losses, count] for currencies[i], with
+            profit/loss still in that currency.
+        """
+        if date_from is None and date_to is None:
+            keys, sums = ReportAggregates.buckets(db, current_user.id)
+        else:
+            computed = ReportAggregates.compute(
+                db, current_user.id, date_from=date_from, date_to=date_to
             )
-            return converted, trade.currency
+            keys = list(computed)
+            sums = np.array([computed[key] for key in keys], dtype=float).reshape(len(keys), len(FIELDS))
         
-        # If trade has exchange_rate and is forex (pair-based), use it
-        if trade.exchange_rate and trade.pair:
-            # Try to extract currency from pair (e.g., EUR/USD -> USD for profit)
-            pair_parts = trade.pair.split('/')
-            if len(pair_parts) == 2:
-                quote_currency = pair_parts[1]
-                converted = PositionCalculator.convert_amount(
-                    trade.profit_or_loss,
-                    quote_currency,
-                    account_currency
-                )
-                return converted, quote_currency
+        # The account-currency bucket may coincide with an explicit currency
+        buckets: Dict[str, np.ndarray] = {}
+        for key, values in zip(keys, sums):
+            currency = account_currency if key == ACCOUNT_CURRENCY else key
+            buckets[currency] = buckets[currency] + values if currency in buckets else values
         
-        # Default: assume profit_or_loss is already in account_currency
-        return trade.profit_or_loss, account_currency
+        currencies = list(buckets)
+        sums = np.array([buckets[c] for c in currencies], dtype=float).reshape(len(currencies), sums.shape[1])
+        return currencies, sums
+    
+    @staticmethod
+    def _bucket_rows(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Tuple[List[str], np.ndarray, List[Optional[date]]]:
+        """
+        currency_buckets rows with the trade date each is converted at.
+
+        Per-currency totals cannot be converted at trade-date rates, so once
+        rate history is loaded a user with P&L in other currencies gets one
+        row per (currency, trade date) from a grouped query instead; the
+        dates are all None (current rates) otherwise.
+        """
+        currencies, sums = PositionCalculator.currency_buckets(
+            db, current_user, account_currency, date_from, date_to
+        )
+        if all(currency == account_currency for currency in currencies) \
+                or RateHistoryService.latest_day(db) is None:
+            return currencies, sums, [None] * len(currencies)
+        
+        buckets, days, sums = ReportAggregates.compute_daily(db, current_user.id, date_from, date_to)
+        currencies = [account_currency if key == ACCOUNT_CURRENCY else key for key in buckets]
+        return currencies, sums, days
+    
+    @staticmethod
+    def _scale_buckets(sums: np.ndarray, factors: np.ndarray) -> np.ndarray:
+        sums = sums.copy()
+        sums[:, :2] *= factors[:, None]
+        return sums
+    
+    @staticmethod
+    def converted_buckets(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> np.ndarray:
+        """Blocking variant of converted_buckets_async."""
+        currencies, sums, days = PositionCalculator._bucket_rows(
+            db, current_user, account_currency, date_from, date_to
+        )
+        factors = RateHistoryService.convert_many_on_dates(
+            db, np.ones(len(currencies)), currencies, days, account_currency
+        )
+        return PositionCalculator._scale_buckets(sums, factors)
+    
+    @staticmethod
+    async def converted_buckets_async(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> np.ndarray:
+        """
+        Bucket sums ([profit, loss, wins, losses, count] rows) with profit
+        and loss converted to account currency, each at its trade-date rate.
+        """
+        currencies, sums, days = await run_in_threadpool(
+            PositionCalculator._bucket_rows, db, current_user, account_currency, date_from, date_to
+        )
+        factors = await RateHistoryService.convert_many_on_dates_async(
+            db, np.ones(len(currencies)), currencies, days, account_currency
+        )
+        return PositionCalculator._scale_buckets(sums, factors)
+    
+    @staticmethod
+    def _active_trades(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> List[Trade]:
+        return db.query(Trade).filter(
+            *active_trade_filters(current_user.id, date_from, date_to)
+        ).all()
+    
+    @staticmethod
+    def _load_trades(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        with_pnl_only: bool = False
+    ) -> Tuple[List[Trade], np.ndarray, List[str]]:
+        """Active trades with their unconverted P&L and its currencies (blocking: run in the threadpool)."""
+        trades = PositionCalculator._active_trades(db, current_user, date_from, date_to)
+        if with_pnl_only:
+            trades = [trade for trade in trades if trade.profit_or_loss is not None]
+        return (trades, *PositionCalculator._trade_amounts(trades, account_currency))
+    
+    @staticmethod
+    def pnl_through(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_to: Optional[date] = None
+    ) -> float:
+        """Blocking variant of pnl_through_async."""
+        sums = PositionCalculator.converted_buckets(db, current_user, account_currency, None, date_to)
+        return float((sums[:, 0] + sums[:, 1]).sum())
+    
+    @staticmethod
+    async def pnl_through_async(
+        db: Session,
+        current_user: User,
+        account_currency: str,
+        date_to: Optional[date] = None
+    ) -> float:
+        """Total P&L in account currency of the active trades dated up to date_to (all if None)."""
+        sums = await PositionCalculator.converted_buckets_async(
+            db, current_user, account_currency, None, date_to
+        )
+        return float((sums[:, 0] + sums[:, 1]).sum())
     
     @staticmethod
     def calculate_report(
         db: Session,
-        current_user: User
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """Blocking variant of calculate_report_async, for scripts and sync callers."""
+        account_currency = current_user.account_currency or "USD"
+        initial_capital = current_user.initial_capital
+        sums = PositionCalculator.converted_buckets(db, current_user, account_currency, date_from, date_to)
+        capital_pnl = None
+        if date_from is not None or date_to is not None:
+            capital_pnl = PositionCalculator.pnl_through(db, current_user, account_currency, date_to)
+        return PositionCalculator._build_report(
+            initial_capital, account_currency, sums, np.ones(len(sums)), capital_pnl
+        )
+    
+    @staticmethod
+    async def calculate_report_async(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
     ) -> Dict:
         """
         Calculate trading report considering account currency.
         
+        With date_from / date_to the metrics cover the trades dated in that
+        range, and capital is the capital at the end of the range. Each
+        trade counts at the exchange rate of its date (see
+        converted_buckets_async). Queries run in the threadpool; only the
+        rate lookups are awaited here.
+        
         Returns:
             Dictionary with metrics converted to account currency
         """
-        trades = db.query(Trade).filter(
-            Trade.owner_id == current_user.id,
-            Trade.cancelled == False
-        ).all()
-        
         account_currency = current_user.account_currency or "USD"
-        
-        # Convert all profit/loss to account currency
-        converted_pnl = []
-        for trade in trades:
-            value, _ = PositionCalculator.calculate_position_value(
-                trade,
-                account_currency
+        initial_capital = current_user.initial_capital
+        # One conversion per currency bucket (and trade date), not per trade
+        sums = await PositionCalculator.converted_buckets_async(
+            db, current_user, account_currency, date_from, date_to
+        )
+        capital_pnl = None
+        if date_from is not None or date_to is not None:
+            capital_pnl = await PositionCalculator.pnl_through_async(
+                db, current_user, account_currency, date_to
             )
-            converted_pnl.append(value)
+        return PositionCalculator._build_report(
+            initial_capital, account_currency, sums, np.ones(len(sums)), capital_pnl
+        )
+    
+    @staticmethod
+    def _build_report(
+        initial_capital: float,
+        account_currency: str,
+        sums: np.ndarray,
+        factors: np.ndarray,
+        capital_pnl: Optional[float] = None
+    ) -> Dict:
+        """
+        Report metrics from currency_buckets sums and each bucket's rate to account currency.
+        
+        capital_pnl is the P&L behind capital when it differs from the
+        reported trades' (date-filtered reports); defaults to total_pnl.
+        """
+        profit, loss, wins, losses, counts = sums.T
         
         # Calculate metrics
-        total_profit = sum(v for v in converted_pnl if v > 0)
-        total_loss = sum(v for v in converted_pnl if v < 0)
-        wins = [v for v in converted_pnl if v > 0]
-        losses = [v for v in converted_pnl if v < 0]
-        
-        num_trades = len(trades)
-        win_probability = (len(wins) / num_trades * 100) if num_trades else 0.0
-        loss_probability = (len(losses) / num_trades * 100) if num_trades else 0.0
-        avg_win = (sum(wins) / len(wins)) if wins else 0.0
-        avg_loss = (sum(losses) / len(losses)) if losses else 0.0
+        total_profit = float((profit * factors).sum())
+        total_loss = float((loss * factors).sum())
+        num_wins = int(wins.sum())
+        num_losses = int(losses.sum())
+        
+        num_trades = int(counts.sum())
+        win_probability = (num_wins / num_trades * 100) if num_trades else 0.0
+        loss_probability = (num_losses / num_trades * 100) if num_trades else 0.0
+        avg_win = total_profit / num_wins if num_wins else 0.0
+        avg_loss = total_loss / num_losses if num_losses else 0.0
         expectancy = (avg_win * win_probability / 100) + (avg_loss * loss_probability / 100)
         
         # Capital calculation in account currency
-        total_pnl = sum(converted_pnl)
-        capital = current_user.initial_capital + total_pnl
+        total_pnl = total_profit + total_loss
+        capital = initial_capital + (total_pnl if capital_pnl is None else capital_pnl)
         
         return {
             'total_profit': total_profit,
@@ -123,29 +364,120 @@ class PositionCalculator:
     @staticmethod
     def get_position_summary(
         db: Session,
-        current_user: User
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """Blocking variant of get_position_summary_async."""
+        account_currency = current_user.account_currency or "USD"
+        trades, pnl, currencies = PositionCalculator._load_trades(
+            db, current_user, account_currency, date_from, date_to, True
+        )
+        converted_pnl = RateHistoryService.convert_many_on_dates(
+            db, pnl, currencies, [trade.date for trade in trades], account_currency
+        )
+        return PositionCalculator._build_position_summary(trades, currencies, converted_pnl, account_currency)
+    
+    @staticmethod
+    async def get_position_summary_async(
+        db: Session,
+        current_user: User,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
     ) -> Dict:
         """Get summary of current open positions by currency."""
-        trades = db.query(Trade).filter(
-            Trade.owner_id == current_user.id,
-            Trade.cancelled == False
-        ).all()
+        account_currency = current_user.account_currency or "USD"
+        trades, pnl, currencies = await run_in_threadpool(
+            PositionCalculator._load_trades, db, current_user, account_currency, date_from, date_to, True
+        )
+        converted_pnl = await RateHistoryService.convert_many_on_dates_async(
+            db, pnl, currencies, [trade.date for trade in trades], account_currency
+        )
+        return await run_in_threadpool(
+            PositionCalculator._build_position_summary, trades, currencies, converted_pnl, account_currency
+        )
+    
+    @staticmethod
+    async def get_dashboard_async(
+        db: Session,
+        current_user: User,
+        recent: int = 10,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict:
+        """
+        Report metrics, position summary and the most recent trades together.
         
+        Uses one trade query and one conversion pass for all three, instead
+        of the separate queries behind calculate_report_async and
+        get_position_summary_async. A date range applies to all three.
+        """
         account_currency = current_user.account_currency or "USD"
+        initial_capital = current_user.initial_capital
+        trades, pnl, currencies = await run_in_threadpool(
+            PositionCalculator._load_trades, db, current_user, account_currency, date_from, date_to
+        )
+        converted_pnl = await RateHistoryService.convert_many_on_dates_async(
+            db, pnl, currencies, [trade.date for trade in trades], account_currency
+        )
+        capital_pnl = None
+        if date_from is not None or date_to is not None:
+            capital_pnl = await PositionCalculator.pnl_through_async(
+                db, current_user, account_currency, date_to
+            )
+        return await run_in_threadpool(
+            PositionCalculator._build_dashboard,
+            trades, currencies, converted_pnl, account_currency, initial_capital, capital_pnl, recent
+        )
+    
+    @staticmethod
+    def _build_dashboard(
+        trades: List[Trade],
+        currencies: List[str],
+        converted_pnl: np.ndarray,
+        account_currency: str,
+        initial_capital: float,
+        capital_pnl: Optional[float],
+        recent: int
+    ) -> Dict:
+        # A single bucket already in account currency; trades without P&L
+        # count towards num_trades only (they convert to 0.0)
+        wins = converted_pnl[converted_pnl > 0]
+        losses = converted_pnl[converted_pnl < 0]
+        sums = np.array([[wins.sum(), losses.sum(), wins.size, losses.size, len(trades)]], dtype=float)
+        report = PositionCalculator._build_report(
+            initial_capital, account_currency, sums, np.ones(1), capital_pnl
+        )
+        
+        with_pnl = [i for i, trade in enumerate(trades) if trade.profit_or_loss is not None]
+        positions = PositionCalculator._build_position_summary(
+            [trades[i] for i in with_pnl],
+            [currencies[i] for i in with_pnl],
+            converted_pnl[with_pnl],
+            account_currency
+        )
         
+        recent_trades = heapq.nlargest(
+            recent, trades, key=lambda trade: (trade.date or date.min, trade.id)
+        )
+        return {
+            'report': report,
+            'positions': positions,
+            'recent_trades': recent_trades,
+        }
+    
+    @staticmethod
+    def _build_position_summary(
+        trades: List[Trade],
+        currencies: List[str],
+        converted_pnl: np.ndarray,
+        account_currency: str
+    ) -> Dict:
         # Group by currency
         positions_by_currency: Dict[str, list] = {}
-        total_in_account_currency = 0.0
+        total_in_account_currency = float(converted_pnl.sum())
         
-        for trade in trades:
-            if trade.profit_or_loss is None:
-                continue
-            
-            value, currency = PositionCalculator.calculate_position_value(
-                trade,
-                account_currency
-            )
-            
+        for trade, currency, value in zip(trades, currencies, converted_pnl.tolist()):
             if currency not in positions_by_currency:
                 positions_by_currency[currency] = []
             
@@ -156,8 +488,6 @@ class PositionCalculator:
                 'currency': currency,
                 'pnl_in_account': value,
             })
-            
-            total_in_account_currency += value
         
         return {
             'account_currency': account_currency,
@@ -0,0 +1,302 @@
+"""
+Historical Exchange Rate Service
+Stores daily ECB reference rates and converts amounts at the rate of a given date.
+Reports convert each trade at the rate of its own date through
+convert_many_on_dates_async; days without a stored rate (or no history at
+all) use the current rate.
+"""
+
+import logging
+import xml.etree.ElementTree as ET
+from datetime import date
+from typing import Dict, IO, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from exchange_rate_service import ExchangeRateService
+from models import ExchangeRateHistory
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT while loading the history file
+_INSERT_BATCH_SIZE = 5000
+
+# ECB skips weekends and TARGET holidays (longest gap: Easter, 4 days).
+# A rate older than this is treated as missing rather than forward-filled.
+FORWARD_FILL_DAYS = 7
+
+# Latest stored day this process has seen; part of the report cache key
+_latest_day: Optional[date] = None
+
+
+def history_version() -> Optional[str]:
+    """Latest history day known to this process, or None if none is loaded."""
+    return _latest_day.isoformat() if _latest_day is not None else None
+
+
+def iter_ecb_history(source: IO[bytes]) -> Iterator[Tuple[date, Dict[str, float]]]:
+    """
+    Stream (date, {currency: rate}) pairs out of an ECB eurofxref XML document.
+
+    Works for both eurofxref-hist.xml and eurofxref-daily.xml. Each day's
+    element is cleared and detached from its parent once read, so memory
+    does not grow with the file. Rates are units of currency per 1 EUR.
+    """
+    # Open elements, innermost last: the parent of an ending element is open[-1]
+    open_elements = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            open_elements.append(elem)
+            continue
+        open_elements.pop()
+        if not elem.tag.endswith("Cube") or elem.get("time") is None:
+            continue
+
+        day = date.fromisoformat(elem.get("time"))
+        rates = {
+            cube.get("currency"): float(cube.get("rate"))
+            for cube in elem
+            if cube.get("currency") is not None
+        }
+        elem.clear()
+        if open_elements:
+            open_elements[-1].remove(elem)
+        yield day, rates
+
+
+class RateHistoryService:
+    """Persisted daily ECB rates with forward-filled lookups by date."""
+
+    ECB_HIST_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.xml"
+
+    @staticmethod
+    def load_from_ecb(db: Session, full: bool = False) -> int:
+        """
+        Download the ECB history file and load it into exchange_rate_history.
+
+        The response body is parsed as it streams in. Returns the number of
+        rows inserted.
+        """
+        response = requests.get(RateHistoryService.ECB_HIST_URL, stream=True, timeout=30)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        try:
+            return RateHistoryService.load(db, response.raw, full=full)
+        finally:
+            response.close()
+
+    @staticmethod
+    def load(db: Session, source: IO[bytes], full: bool = False) -> int:
+        """
+        Load an ECB XML stream into exchange_rate_history in one transaction.
+
+        By default only days newer than the latest stored date are inserted.
+        With full=True the table is emptied and reloaded.
+        """
+        if full:
+            db.query(ExchangeRateHistory).delete(synchronize_session=False)
+            latest = None
+        else:
+            latest = db.query(func.max(ExchangeRateHistory.date)).scalar()
+
+        inserted = 0
+        batch = []
+        for day, rates in iter_ecb_history(source):
+            if latest is not None and day <= latest:
+                continue
+            batch.extend(
+                {"date": day, "currency": currency, "rate": rate}
+                for currency, rate in rates.items()
+            )
+            if len(batch) >= _INSERT_BATCH_SIZE:
+                db.execute(insert(ExchangeRateHistory), batch)
+                inserted += len(batch)
+                batch = []
+
+        if batch:
+            db.execute(insert(ExchangeRateHistory), batch)
+            inserted += len(batch)
+
+        db.commit()
+        RateHistoryService.latest_day(db)
+        logger.info(f"Loaded {inserted} historical exchange rates")
+        return inserted
+
+    @staticmethod
+    def latest_day(db: Session) -> Optional[date]:
+        """Most recent stored day, or None while no history is loaded."""
+        global _latest_day
+        _latest_day = db.query(func.max(ExchangeRateHistory.date)).scalar()
+        return _latest_day
+
+    @staticmethod
+    def rates_on_dates(
+        db: Session,
+        from_currencies: Sequence[Optional[str]],
+        dates: Sequence[date],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Rate from from_currencies[i] to to_currency on dates[i], for every i.
+
+        All required rates are read with a single range query; weekends and
+        holidays are forward-filled from the previous publication. Entries
+        with no stored rate within FORWARD_FILL_DAYS are NaN. A missing
+        currency (None) is treated as already being in to_currency.
+        """
+        to_currency = to_currency.upper()
+        n = len(dates)
+        result = np.full(n, np.nan)
+        if n == 0:
+            return result
+
+        # NumPy days cover any date (pandas timestamps stop at 1677/2262); None is NaT
+        days = np.array(list(dates), dtype="datetime64[D]")
+        codes, uniques = pd.factorize(np.asarray(from_currencies, dtype=object))
+        uniques = [str(currency).upper() for currency in uniques]
+        result[codes == -1] = 1.0
+        for k, currency in enumerate(uniques):
+            if currency == to_currency:
+                result[codes == k] = 1.0
+
+        known_days = days[~np.isnat(days)]
+        needed = (set(uniques) | {to_currency}) - {"EUR"}
+        if known_days.size == 0 or set(uniques) <= {to_currency}:
+            return result
+
+        earliest = known_days.min() - np.timedelta64(FORWARD_FILL_DAYS, "D")
+        lo = max(earliest, np.datetime64(date.min, "D")).astype(date)
+        hi = known_days.max().astype(date)
+        rows = (
+            db.query(ExchangeRateHistory.currency, ExchangeRateHistory.date, ExchangeRateHistory.rate)
+            .filter(
+                ExchangeRateHistory.currency.in_(needed),
+                ExchangeRateHistory.date >= lo,
+                ExchangeRateHistory.date <= hi,
+            )
+            .order_by(ExchangeRateHistory.currency, ExchangeRateHistory.date)
+            .all()
+        )
+
+        series: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        if rows:
+            frame = pd.DataFrame(rows, columns=["currency", "date", "rate"])
+            frame["date"] = pd.to_datetime(frame["date"]).to_numpy().astype("datetime64[D]")
+            for currency, group in frame.groupby("currency", sort=False):
+                series[currency] = (
+                    group["date"].to_numpy().astype("datetime64[D]"),
+                    group["rate"].to_numpy(dtype=float),
+                )
+
+        def per_eur(currency: str, at: np.ndarray) -> np.ndarray:
+            """Forward-filled rate of currency per 1 EUR at each date in at."""
+            if currency == "EUR":
+                return np.ones(len(at))
+            if currency not in series:
+                return np.full(len(at), np.nan)
+            stored_days, stored_rates = series[currency]
+            pos = np.searchsorted(stored_days, at, side="right") - 1
+            found = (pos >= 0) & ~np.isnat(at)
+            out = np.full(len(at), np.nan)
+            out[found] = stored_rates[pos[found]]
+            age = np.full(len(at), np.timedelta64(FORWARD_FILL_DAYS + 1, "D"))
+            age[found] = at[found] - stored_days[pos[found]]
+            out[age > np.timedelta64(FORWARD_FILL_DAYS, "D")] = np.nan
+            return out
+
+        to_rates = per_eur(to_currency, days)
+        for k, currency in enumerate(uniques):
+            if currency != to_currency:
+                mask = codes == k
+                result[mask] = to_rates[mask] / per_eur(currency, days[mask])
+
+        return result
+
+    @staticmethod
+    def get_rate_on(db: Session, day: date, from_currency: str, to_currency: str) -> Optional[float]:
+        """Rate from from_currency to to_currency on day, or None if not stored."""
+        rate = RateHistoryService.rates_on_dates(db, [from_currency], [day], to_currency)[0]
+        return None if np.isnan(rate) else float(rate)
+
+    @staticmethod
+    def _history_rates(
+        db: Session,
+        from_currencies: Sequence[Optional[str]],
+        dates: Sequence[Optional[date]],
+        to_currency: str,
+    ) -> np.ndarray:
+        """rates_on_dates, or all NaN without a range query while no history is loaded."""
+        if RateHistoryService.latest_day(db) is None:
+            return np.full(len(dates), np.nan)
+        return RateHistoryService.rates_on_dates(db, from_currencies, dates, to_currency)
+
+    @staticmethod
+    def convert_many_on_dates(
+        db: Session,
+        amounts: Sequence[float],
+        from_currencies: Sequence[Optional[str]],
+        dates: Sequence[Optional[date]],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Convert each amount at the historical rate of its own date.
+
+        Amounts whose date has no stored rate (e.g. history not loaded yet,
+        or a missing date) are converted at the current rate instead.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        rates = RateHistoryService._history_rates(db, from_currencies, dates, to_currency)
+
+        missing = np.isnan(rates)
+        if missing.any():
+            currencies = np.asarray(from_currencies, dtype=object)[missing]
+            rates[missing] = ExchangeRateService.convert_many(
+                np.ones(int(missing.sum())), currencies, to_currency
+            )
+
+        return amounts * rates
+
+    @staticmethod
+    async def convert_many_on_dates_async(
+        db: Session,
+        amounts: Sequence[float],
+        from_currencies: Sequence[Optional[str]],
+        dates: Sequence[Optional[date]],
+        to_currency: str,
+    ) -> np.ndarray:
+        """
+        Async variant of convert_many_on_dates: the history query runs in
+        the threadpool and the current-rate fallback is awaited.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        rates = await run_in_threadpool(
+            RateHistoryService._history_rates, db, from_currencies, dates, to_currency
+        )
+
+        missing = np.isnan(rates)
+        if missing.any():
+            currencies = np.asarray(from_currencies, dtype=object)[missing]
+            rates[missing] = await ExchangeRateService.convert_many_async(
+                np.ones(int(missing.sum())), currencies, to_currency
+            )
+
+        return amounts * rates
+
+if __name__ == "__main__":
+    import sys
+    from database import Base, SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[ExchangeRateHistory.__table__])
+
+    db = SessionLocal()
+    try:
+        count = RateHistoryService.load_from_ecb(db, full="--full" in sys.argv)
+        print(f"Loaded {count} historical exchange rates")
+    finally:
+        db.close()
@@ -0,0 +1,392 @@
+"""
+Report Aggregates
+Materialized per-user, per-currency trade totals behind /api/report/.
+
+A user is materialized (users.aggregates_materialized) on their first
+report. From then on every code path that creates, edits, cancels or
+deletes trades applies the change to report_aggregates in the same
+transaction, so a report only reads one row per currency. rebuild()
+recomputes a user's rows from the trades table to repair drift (run this
+module as a script to rebuild everyone).
+"""
+
+import logging
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, case, delete, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import ReportAggregate, Trade, User
+
+logger = logging.getLogger(__name__)
+
+# Bucket key for P&L that is already in the account currency. Stored instead
+# of the currency itself so that changing account_currency needs no rebuild.
+ACCOUNT_CURRENCY = ""
+
+# Column order of the sums arrays: [profit, loss, wins, losses, count]
+FIELDS = ("profit", "loss", "wins", "losses", "count")
+_COUNT_FIELDS = ("wins", "losses", "count")
+
+
+def resolve_pnl_currency(
+    currency: Optional[str],
+    pair: Optional[str],
+    has_exchange_rate: bool,
+    account_currency: str
+) -> str:
+    """
+    Currency a trade's profit_or_loss is denominated in.
+
+    Explicit trade currency wins; forex trades with an exchange rate use
+    the quote currency of the pair; otherwise the account currency.
+    """
+    # If trade has explicit currency, use it
+    if currency:
+        return currency
+
+    # If trade has exchange_rate and is forex (pair-based), use it
+    if has_exchange_rate and pair:
+        # Try to extract currency from pair (e.g., EUR/USD -> USD for profit)
+        pair_parts = pair.split('/')
+        if len(pair_parts) == 2:
+            return pair_parts[1]
+
+    # Default: assume profit_or_loss is already in account_currency
+    return account_currency
+
+
+def quoted_pair_column():
+    """
+    SQL expression for Trade.pair when the P&L currency has to be derived
+    from it (no explicit currency, non-zero exchange rate), else NULL.
+
+    Grouping by (Trade.currency, quoted_pair_column()) yields groups that
+    each resolve to a single currency via resolve_pnl_currency.
+    """
+    return case(
+        (
+            and_(
+                or_(Trade.currency.is_(None), Trade.currency == ""),
+                Trade.exchange_rate.isnot(None),
+                Trade.exchange_rate != 0,
+            ),
+            Trade.pair,
+        ),
+        else_=None,
+    )
+
+
+def active_trade_filters(
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> List:
+    """
+    WHERE clauses for a user's active trades, optionally dated within
+    [date_from, date_to]. The column order matches the
+    ix_trades_owner_cancelled_date index, so these are index range scans.
+    Undated trades fall outside any date range.
+    """
+    filters = [Trade.owner_id == user_id, Trade.cancelled == False]
+    if date_from is not None:
+        filters.append(Trade.date >= date_from)
+    if date_to is not None:
+        filters.append(Trade.date <= date_to)
+    return filters
+
+
+def sum_columns() -> List:
+    """SQL aggregates in FIELDS order: profit, loss, wins, losses, count."""
+    pnl = Trade.profit_or_loss
+    return [
+        func.sum(case((pnl > 0, pnl), else_=0.0)),
+        func.sum(case((pnl < 0, pnl), else_=0.0)),
+        func.sum(case((pnl > 0, 1), else_=0)),
+        func.sum(case((pnl < 0, 1), else_=0)),
+        func.count(Trade.id),
+    ]
+
+
+# Trade columns a trade's contribution depends on: edits to any other field
+# leave the aggregates unchanged
+CONTRIBUTION_FIELDS = frozenset({"cancelled", "profit_or_loss", "currency", "pair", "exchange_rate"})
+
+
+class ReportAggregates:
+    """Maintains and reads the report_aggregates table."""
+
+    @staticmethod
+    def contribution(trade: Trade) -> Optional[Tuple[str, np.ndarray]]:
+        """(bucket, [profit, loss, wins, losses, count]) a trade adds, or None if it is cancelled."""
+        # Mirrors the `cancelled == False` filter of the report queries
+        if trade.cancelled is None or trade.cancelled:
+            return None
+
+        pnl = trade.profit_or_loss or 0.0
+        bucket = resolve_pnl_currency(
+            trade.currency, trade.pair, bool(trade.exchange_rate), ACCOUNT_CURRENCY
+        )
+        return bucket, np.array(
+            [max(pnl, 0.0), min(pnl, 0.0), float(pnl > 0), float(pnl < 0), 1.0]
+        )
+
+    @staticmethod
+    def add(db: Session, trades: Iterable[Trade]):
+        """Add new trades (already added to the session) to their owners' aggregates."""
+        # Flush so column defaults (cancelled=False) are populated
+        db.flush()
+        ReportAggregates._apply_contributions(db, trades, sign=1)
+
+    @staticmethod
+    def remove(db: Session, trades: Iterable[Trade]):
+        """Take trades out of their owners' aggregates (before deleting or cancelling them)."""
+        ReportAggregates._apply_contributions(db, trades, sign=-1)
+
+    @staticmethod
+    def replace(
+        db: Session,
+        user_id: int,
+        before: Optional[Tuple[str, np.ndarray]],
+        after: Optional[Tuple[str, np.ndarray]]
+    ):
+        """Swap a trade's old contribution for its new one after an edit."""
+        if before is not None and after is not None and before[0] == after[0] \
+                and np.array_equal(before[1], after[1]):
+            return
+        if before is not None:
+            ReportAggregates._apply(db, user_id, before[0], -before[1])
+        if after is not None:
+            ReportAggregates._apply(db, user_id, after[0], after[1])
+
+    @staticmethod
+    def add_ids(db: Session, user_id: int, trade_ids: Sequence[int]):
+        """Add newly inserted trades to the aggregates by id, aggregating them in SQL first."""
+        for bucket, sums in ReportAggregates.compute(db, user_id, trade_ids).items():
+            ReportAggregates._apply(db, user_id, bucket, sums)
+
+    @staticmethod
+    def remove_ids(db: Session, user_id: int, trade_ids: Sequence[int]):
+        """Take trades out of the aggregates by id, aggregating them in SQL first."""
+        for bucket, sums in ReportAggregates.compute(db, user_id, trade_ids).items():
+            ReportAggregates._apply(db, user_id, bucket, -sums)
+
+    @staticmethod
+    def _apply_contributions(db: Session, trades: Iterable[Trade], sign: int):
+        deltas: Dict[Tuple[int, str], np.ndarray] = {}
+        for trade in trades:
+            contribution = ReportAggregates.contribution(trade)
+            if contribution is None:
+                continue
+            key = (trade.owner_id, contribution[0])
+            deltas[key] = deltas.get(key, 0) + contribution[1]
+
+        for (user_id, bucket), delta in deltas.items():
+            ReportAggregates._apply(db, user_id, bucket, sign * delta)
+
+    @staticmethod
+    def _apply(db: Session, user_id: int, bucket: str, delta: np.ndarray):
+        """
+        Add delta to one aggregate row with a single upsert, deleting the
+        row once its last trade is gone.
+        """
+        # An unmaterialized user is built from the trades table on the first
+        # report read, this change included.
+        if not ReportAggregates._is_materialized(db, user_id):
+            return
+
+        values = ReportAggregates._row_values(delta)
+        insert = sqlite.insert if db.get_bind().dialect.name == "sqlite" else postgresql.insert
+        statement = insert(ReportAggregate).values(user_id=user_id, currency=bucket, **values)
+        # INSERT ... ON CONFLICT (user_id, currency) DO UPDATE SET col = col + excluded.col,
+        # so concurrent writers creating the same bucket cannot collide on the primary key
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ReportAggregate.user_id, ReportAggregate.currency],
+                set_={
+                    field: getattr(ReportAggregate, field) + getattr(statement.excluded, field)
+                    for field in FIELDS
+                },
+            )
+        )
+        if values["count"] < 0:
+            # Whatever float residue profit/loss keep belongs to no trade
+            db.execute(
+                delete(ReportAggregate).where(
+                    ReportAggregate.user_id == user_id,
+                    ReportAggregate.currency == bucket,
+                    ReportAggregate.count <= 0,
+                )
+            )
+
+    @staticmethod
+    def _row_values(sums: np.ndarray) -> Dict[str, float]:
+        """Column values for one sums array, with counts as ints."""
+        return {
+            field: int(round(value)) if field in _COUNT_FIELDS else value
+            for field, value in zip(FIELDS, sums.tolist())
+        }
+
+    @staticmethod
+    def _is_materialized(db: Session, user_id: int) -> bool:
+        """
+        Read the user's materialization marker, locking the user row.
+
+        rebuild() takes the same lock before reading the trades table, so a
+        trade written concurrently with a user's first report is either
+        seen by the rebuild or applied after it, never lost in between.
+        """
+        return bool(
+            db.query(User.aggregates_materialized)
+            .filter(User.id == user_id)
+            .with_for_update()
+            .scalar()
+        )
+
+    @staticmethod
+    def _mark_materialized(db: Session, user_ids: Optional[Sequence[int]] = None):
+        """Set the marker for user_ids (all users if None), locking their rows."""
+        statement = update(User).values(aggregates_materialized=True)
+        if user_ids is not None:
+            statement = statement.where(User.id.in_(user_ids))
+        db.execute(statement.execution_options(synchronize_session=False))
+
+    @staticmethod
+    def compute(
+        db: Session,
+        user_id: int,
+        trade_ids: Optional[Sequence[int]] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Aggregate a user's active trades per bucket straight from the trades table.
+
+        Rows are grouped by explicit currency, or by pair where the currency
+        comes from the pair's quote side, so no Trade objects are loaded.
+        With trade_ids only those trades are aggregated; with date_from /
+        date_to only trades dated in that range.
+        """
+        quoted_pair = quoted_pair_column()
+        query = db.query(
+            Trade.currency,
+            quoted_pair,
+            *sum_columns(),
+        ).filter(*active_trade_filters(user_id, date_from, date_to))
+        if trade_ids is not None:
+            query = query.filter(Trade.id.in_(trade_ids))
+        rows = query.group_by(Trade.currency, quoted_pair).all()
+
+        # Several SQL groups can resolve to the same bucket
+        buckets: Dict[str, np.ndarray] = {}
+        for currency, pair, *sums in rows:
+            bucket = resolve_pnl_currency(currency, pair, pair is not None, ACCOUNT_CURRENCY)
+            values = np.array([value or 0 for value in sums], dtype=float)
+            buckets[bucket] = buckets[bucket] + values if bucket in buckets else values
+        return buckets
+
+    @staticmethod
+    def compute_daily(
+        db: Session,
+        user_id: int,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> Tuple[List[str], List[Optional[date]], np.ndarray]:
+        """
+        compute() split per trade date, for converting each day at its own rate.
+
+        Returns (buckets, dates, sums) with one row per (bucket, date) pair;
+        undated trades have their own rows with a None date.
+        """
+        quoted_pair = quoted_pair_column()
+        rows = db.query(
+            Trade.currency,
+            quoted_pair,
+            Trade.date,
+            *sum_columns(),
+        ).filter(
+            *active_trade_filters(user_id, date_from, date_to)
+        ).group_by(Trade.currency, quoted_pair, Trade.date).all()
+
+        buckets = [
+            resolve_pnl_currency(currency, pair, pair is not None, ACCOUNT_CURRENCY)
+            for currency, pair, *_ in rows
+        ]
+        days = [row[2] for row in rows]
+        sums = np.array([[value or 0 for value in row[3:]] for row in rows], dtype=float)
+        return buckets, days, sums.reshape(len(rows), len(FIELDS))
+
+    @staticmethod
+    def rebuild(db: Session, user_id: int) -> Dict[str, np.ndarray]:
+        """Recompute a user's rows from the trades table and mark them materialized. The caller commits."""
+        ReportAggregates._mark_materialized(db, [user_id])
+        db.query(ReportAggregate).filter(ReportAggregate.user_id == user_id).delete(
+            synchronize_session=False
+        )
+        buckets = ReportAggregates.compute(db, user_id)
+        db.add_all(
+            ReportAggregate(user_id=user_id, currency=bucket, **ReportAggregates._row_values(sums))
+            for bucket, sums in buckets.items()
+        )
+        db.flush()
+        return buckets
+
+    @staticmethod
+    def rebuild_all(db: Session) -> int:
+        """Rebuild every user that owns trades and materialize the others. Returns the number of users rebuilt."""
+        ReportAggregates._mark_materialized(db)
+        user_ids = [row[0] for row in db.query(Trade.owner_id).distinct() if row[0] is not None]
+        db.query(ReportAggregate).delete(synchronize_session=False)
+        for user_id in user_ids:
+            ReportAggregates.rebuild(db, user_id)
+        db.commit()
+        logger.info(f"Rebuilt report aggregates for {len(user_ids)} users")
+        return len(user_ids)
+
+    @staticmethod
+    def buckets(db: Session, user_id: int) -> Tuple[List[str], np.ndarray]:
+        """
+        Read a user's aggregates: (bucket keys, sums) with one row per bucket.
+
+        A user who has never been materialized is rebuilt (and committed)
+        on first read. A materialized user without active trades has no rows.
+        """
+        materialized = db.query(User.aggregates_materialized).filter(User.id == user_id).scalar()
+        if not materialized:
+            buckets = ReportAggregates.rebuild(db, user_id)
+            db.commit()
+            keys = list(buckets)
+            sums = np.array([buckets[key] for key in keys], dtype=float).reshape(len(keys), len(FIELDS))
+            return keys, sums
+
+        rows = db.query(
+            ReportAggregate.currency,
+            *(getattr(ReportAggregate, field) for field in FIELDS),
+        ).filter(ReportAggregate.user_id == user_id).all()
+        keys = [row[0] for row in rows]
+        sums = np.array([row[1:] for row in rows], dtype=float).reshape(len(rows), len(FIELDS))
+        return keys, sums
+
+
+if __name__ == "__main__":
+    import sys
+    from database import Base, SessionLocal, engine
+
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine, tables=[ReportAggregate.__table__])
+
+    db = SessionLocal()
+    try:
+        if "--user" in sys.argv:
+            user_id = int(sys.argv[sys.argv.index("--user") + 1])
+            ReportAggregates.rebuild(db, user_id)
+            db.commit()
+            print(f"Rebuilt report aggregates for user {user_id}")
+        else:
+            count = ReportAggregates.rebuild_all(db)
+            print(f"Rebuilt report aggregates for {count} users")
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+"""
+Report Cache
+In-process cache of computed reports. Entries are keyed on everything a
+report depends on (user, trade version, rate snapshot, rate history,
+account settings), so they never need explicit invalidation: a changed
+input is a new key. The rate history part is the latest stored day this
+worker has seen, which every report computation re-reads.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from exchange_rate_service import ExchangeRateService
+from models import User
+from rate_history_service import history_version
+
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "512"))
+
+
+def bump_trade_version(db: Session, user_id: Optional[int]):
+    """
+    Mark the user's trades as changed (every user's if user_id is None).
+    Call in the same transaction as the mutation.
+    """
+    statement = update(User).values(trade_version=func.coalesce(User.trade_version, 0) + 1)
+    if user_id is not None:
+        statement = statement.where(User.id == user_id)
+    db.execute(statement.execution_options(synchronize_session=False))
+
+
+class ReportCache:
+    """Bounded LRU of report payloads, keyed by their ETag."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def user_inputs(user: User) -> Tuple:
+        """
+        The user's fields a report depends on: (id, trade_version, account
+        currency, initial capital). Read them before computing the report,
+        which may commit and expire the instance.
+        """
+        return (user.id, user.trade_version or 0, user.account_currency or "USD", user.initial_capital)
+
+    @staticmethod
+    def etag(kind: str, user_inputs: Tuple, *params) -> str:
+        """
+        Strong ETag for a report of `kind`, derived without computing it.
+
+        user_inputs comes from user_inputs(). Changes whenever the user's
+        trades (trade_version), the exchange rate snapshot, the loaded rate
+        history, the account currency or initial capital change.
+        """
+        user_id, trade_version, account_currency, initial_capital = user_inputs
+        parts = [
+            kind,
+            user_id,
+            trade_version,
+            ExchangeRateService.current_snapshot_id() or "fallback",
+            history_version(),
+            account_currency,
+            initial_capital,
+            *params,
+        ]
+        digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:20]
+        return f'"{kind}-{user_id}-{digest}"'
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+report_cache = ReportCache(max_entries=REPORT_CACHE_MAX_ENTRIES)
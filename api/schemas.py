@@ -1,5 +1,5 @@
-from typing import Optional
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, create_model
 from datetime import date, datetime
 from models import RoleEnum
 
@@ -125,6 +125,17 @@ class TradeUpdate(BaseModel):
     percentage_margin: Optional[float] = None
 
 
+# TradeUpdate with `date` optional too, for bulk edits: only the fields sent
+# are applied. Built with create_model because a `date: Optional[date] = None`
+# class attribute would shadow the type in its own annotation.
+TradePatch = create_model("TradePatch", __base__=TradeUpdate, date=(Optional[date], None))
+
+
+class TradeBulkUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    changes: TradePatch
+
+
 # --- Analysis ---
 class AnalysisCreate(BaseModel):
     title: str
@@ -289,3 +300,22 @@ class ReportResponse(BaseModel):
     account_currency: str = "USD"
     total_pnl: float = 0.0
     num_trades: int = 0
+
+
+class DashboardResponse(BaseModel):
+    report: ReportResponse
+    positions: Dict[str, Any]
+    recent_trades: List[TradeResponse]
+
+
+class AdvancedReportResponse(ReportResponse):
+    max_drawdown: float = 0.0
+    max_drawdown_percent: Optional[float] = None
+    profit_factor: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    longest_win_streak: int = 0
+    longest_loss_streak: int = 0
+    avg_r_multiple: Optional[float] = None
+    total_r: Optional[float] = None
+    r_multiple_trades: int = 0
@@ -0,0 +1,156 @@
+"""
+Shared Rate Cache
+Single-host SQLite store that lets uvicorn workers share one exchange rate
+snapshot and elect a single worker to fetch from upstream.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRateStore:
+    """
+    Cross-process snapshot store backed by a SQLite file.
+
+    Holds at most one snapshot (the latest published one) plus a fetch lease.
+    A worker that wants to refresh first takes the lease; the others see it
+    is held and keep serving what they have until the new snapshot is
+    published. Leases expire on their own, so a crashed worker cannot block
+    refreshes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_snapshot (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    snapshot_id TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    modified_at TEXT NOT NULL,
+                    rates TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fetch_lease (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+
+    @staticmethod
+    def from_env() -> Optional["SharedRateStore"]:
+        """Build the store from EXCHANGE_RATE_SHARED_CACHE (a file path), if set."""
+        path = os.getenv("EXCHANGE_RATE_SHARED_CACHE", "")
+        if not path:
+            return None
+        try:
+            return SharedRateStore(path)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Shared exchange rate cache disabled, cannot open {path}: {e}")
+            return None
+
+    @property
+    def owner(self) -> str:
+        # Evaluated per call: workers forked after import must not share an owner id
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly where needed
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def read(self) -> Optional[Dict]:
+        """Return the published snapshot as {id, rates, fetched_at, modified_at}, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT snapshot_id, fetched_at, modified_at, rates FROM rate_snapshot WHERE id = 1"
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "fetched_at": datetime.fromisoformat(row[1]),
+            "modified_at": datetime.fromisoformat(row[2]),
+            "rates": json.loads(row[3]),
+        }
+
+    def publish(self, snapshot: Dict):
+        """Replace the published snapshot, unless a newer one is already there."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT INTO rate_snapshot (id, snapshot_id, fetched_at, modified_at, rates)
+                VALUES (1, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    snapshot_id = excluded.snapshot_id,
+                    fetched_at = excluded.fetched_at,
+                    modified_at = excluded.modified_at,
+                    rates = excluded.rates
+                WHERE excluded.fetched_at > rate_snapshot.fetched_at
+                """,
+                (
+                    snapshot["id"],
+                    snapshot["fetched_at"].isoformat(),
+                    snapshot["modified_at"].isoformat(),
+                    json.dumps(snapshot["rates"]),
+                ),
+            )
+
+    def acquire_lease(self, duration: float) -> bool:
+        """Try to become the worker allowed to fetch for the next `duration` seconds."""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT owner, expires_at FROM fetch_lease WHERE id = 1").fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO fetch_lease (id, owner, expires_at) VALUES (1, ?, ?)",
+                    (self.owner, now + duration),
+                )
+                conn.execute("COMMIT")
+                return True
+            except sqlite3.Error as e:
+                logger.warning(f"Could not acquire shared exchange rate fetch lease: {e}")
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                return False
+
+    def release_lease(self):
+        with closing(self._connect()) as conn:
+            try:
+                conn.execute("DELETE FROM fetch_lease WHERE id = 1 AND owner = ?", (self.owner,))
+            except sqlite3.Error as e:
+                # The lease times out on its own
+                logger.warning(f"Could not release shared exchange rate fetch lease: {e}")
+
+    def get_state(self) -> Dict:
+        try:
+            snapshot = self.read()
+        except sqlite3.Error as e:
+            return {"path": self.path, "error": str(e)}
+        return {
+            "path": self.path,
+            "snapshot_id": snapshot["id"] if snapshot else None,
+            "snapshot_fetched_at": snapshot["fetched_at"].isoformat() + "Z" if snapshot else None,
+        }
@@ -0,0 +1,128 @@
+"""
+Test for the grouped breakdown behind /api/report/breakdown.
+Checks the SQL GROUP BY sums, converted once per currency sub-group and
+merged, against grouping and converting every trade in Python, for several
+dimensions, periods and date ranges.
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import event
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from analytics_engine import AnalyticsEngine, BREAKDOWN_PERIODS
+from conftest import memory_sessionmaker, seed_user
+from exchange_rate_service import ExchangeRateService
+from models import Trade
+from position_calculator import PositionCalculator
+
+RATES = {"EUR": 1.0, "USD": 1.25, "GBP": 0.8, "JPY": 160.0}
+
+
+def _naive(trades, group_by, period, date_from, date_to):
+    groups = {}
+    for trade in trades:
+        if trade.cancelled:
+            continue
+        if (date_from or date_to) and trade.date is None:
+            continue
+        if (date_from and trade.date < date_from) or (date_to and trade.date > date_to):
+            continue
+        key = tuple(getattr(trade, name) for name in group_by)
+        if period:
+            key += (trade.date.strftime(BREAKDOWN_PERIODS[period][0]) if trade.date else None,)
+        currency = PositionCalculator.resolve_currency(trade, "USD")
+        pnl = (trade.profit_or_loss or 0.0) * RATES["USD"] / RATES[currency]
+        profit, loss, wins, losses, count = groups.get(key, (0.0, 0.0, 0, 0, 0))
+        groups[key] = (
+            profit + max(pnl, 0.0), loss + min(pnl, 0.0), wins + (pnl > 0), losses + (pnl < 0), count + 1
+        )
+    return groups
+
+
+def test_breakdown_matches_per_trade_grouping(db):
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    ExchangeRateService.ECB_URL = "http://127.0.0.1:9/eurofxref-daily.xml"
+    ExchangeRateService.clear_cache()
+    try:
+        ExchangeRateService._install_rates(RATES)
+        _check_breakdowns(db)
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+
+
+def _check_breakdowns(db):
+    user = seed_user(db, account_currency="USD")
+    other = seed_user(db, "other")
+    rng = np.random.default_rng(17)
+
+    def pick(options):
+        return options[rng.integers(len(options))]
+
+    trades = [
+        Trade(
+            owner_id=user.id,
+            date=None if rng.random() < 0.05 else date(2025, 11, 1) + timedelta(days=int(rng.integers(120))),
+            system=pick(["breakout", "trend", None]),
+            pair=pick(["EUR/USD", "GBP/JPY", "XAUUSD", None]),
+            action=pick(["buy", "sell"]),
+            currency=pick([None, "", "USD", "EUR", "GBP"]),
+            exchange_rate=pick([None, 0.0, 1.1]),
+            profit_or_loss=None if rng.random() < 0.05 else float(rng.normal(3, 40)),
+            cancelled=bool(rng.random() < 0.1),
+        )
+        for _ in range(1500)
+    ]
+    db.add_all(trades)
+    db.add(Trade(owner_id=other.id, system="breakout", pair="EUR/USD", action="buy", profit_or_loss=1e6))
+    db.commit()
+
+    cases = [
+        (["system"], None, None, None),
+        (["pair", "action"], None, None, None),
+        (["system"], "month", None, None),
+        ([], "day", date(2025, 12, 1), date(2026, 1, 15)),
+        (["system", "pair", "action"], "year", date(2026, 1, 1), None),
+    ]
+    for group_by, period, date_from, date_to in cases:
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        try:
+            breakdown = asyncio.run(
+                AnalyticsEngine.breakdown_async(db, user, group_by, period, date_from, date_to)
+            )
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+        trade_queries = [sql for sql in statements if "FROM trades" in sql]
+        assert len(trade_queries) == 1 and "GROUP BY" in trade_queries[0], trade_queries
+
+        keys = group_by + (["period"] if period else [])
+        expected = _naive(trades, group_by, period, date_from, date_to)
+        got = {tuple(group[key] for key in keys): group for group in breakdown["groups"]}
+        assert set(got) == set(expected), (group_by, period)
+        for key, (profit, loss, wins, losses, count) in expected.items():
+            group = got[key]
+            assert (group["num_trades"], group["wins"], group["losses"]) == (count, wins, losses), key
+            assert abs(group["total_profit"] - profit) < 1e-6 and abs(group["total_loss"] - loss) < 1e-6, key
+            assert abs(group["expectancy"] - (profit + loss) / count) < 1e-9, key
+
+
+if __name__ == "__main__":
+    test_breakdown_matches_per_trade_grouping(memory_sessionmaker()())
+    print("breakdown grouped in SQL")
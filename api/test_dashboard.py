@@ -0,0 +1,101 @@
+"""
+Test for the combined /api/report/dashboard computation.
+Checks that the dashboard loads the trades with one query and converts them
+with one rate lookup per currency, however many trades there are, and that
+its report and positions agree with a per-trade conversion.
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import event
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from conftest import memory_sessionmaker, seed_user
+from exchange_rate_service import CrossRateMatrix, ExchangeRateService
+from models import Trade
+from position_calculator import PositionCalculator
+
+RATES = {"EUR": 1.0, "USD": 1.25, "GBP": 0.8, "JPY": 160.0}
+TO_USD = {None: 1.0, "USD": 1.0, "EUR": 1.25, "GBP": 1.5625, "JPY": 1.25 / 160.0}
+
+
+def test_one_conversion_per_currency(db):
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    original_rates_to = CrossRateMatrix.rates_to
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    ExchangeRateService.ECB_URL = "http://127.0.0.1:9/eurofxref-daily.xml"
+    ExchangeRateService.clear_cache()
+
+    lookups = []
+
+    def rates_to(self, to_currency, from_currencies):
+        from_currencies = list(from_currencies)
+        lookups.append(from_currencies)
+        return original_rates_to(self, to_currency, from_currencies)
+
+    try:
+        ExchangeRateService._install_rates(RATES)
+        user = seed_user(db, account_currency="USD", initial_capital=1000.0)
+        rng = np.random.default_rng(2)
+        currencies = [None, "USD", "EUR", "GBP", "JPY"]
+        trades = [
+            Trade(
+                owner_id=user.id,
+                date=date(2026, 1, 1) + timedelta(days=i % 90),
+                pair="EUR/USD",
+                currency=currencies[i % len(currencies)],
+                profit_or_loss=None if i % 17 == 0 else float(rng.normal(5, 50)),
+            )
+            for i in range(500)
+        ]
+        db.add_all(trades)
+        db.commit()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.get_bind(), "before_cursor_execute", listener)
+        CrossRateMatrix.rates_to = rates_to
+        try:
+            dashboard = asyncio.run(PositionCalculator.get_dashboard_async(db, user, 5))
+        finally:
+            CrossRateMatrix.rates_to = original_rates_to
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+
+    trade_queries = [sql for sql in statements if "FROM trades" in sql]
+    assert len(trade_queries) == 1, trade_queries
+    assert len(lookups) == 1, f"Expected one conversion pass, got {len(lookups)}"
+    assert sorted(lookups[0]) == ["EUR", "GBP", "JPY", "USD"], lookups
+
+    with_pnl = [trade for trade in trades if trade.profit_or_loss is not None]
+    converted = {trade.id: trade.profit_or_loss * TO_USD[trade.currency] for trade in with_pnl}
+    expected = sum(converted.values())
+    report, positions = dashboard["report"], dashboard["positions"]
+    assert abs(report["total_pnl"] - expected) < 1e-6
+    assert abs(report["capital"] - (1000.0 + expected)) < 1e-6
+    assert report["num_trades"] == len(trades)
+    assert abs(positions["total_pnl"] - expected) < 1e-6
+    for currency, group in positions["positions_by_currency"].items():
+        for position in group["trades"]:
+            assert abs(position["pnl_in_account"] - converted[position["trade_id"]]) < 1e-9, currency
+    latest = sorted(trades, key=lambda trade: (trade.date, trade.id), reverse=True)[:5]
+    assert [trade.id for trade in dashboard["recent_trades"]] == [trade.id for trade in latest]
+
+
+if __name__ == "__main__":
+    test_one_conversion_per_currency(memory_sessionmaker()())
+    print("dashboard converted once per currency")
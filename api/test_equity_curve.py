@@ -0,0 +1,85 @@
+"""
+Test for the LTTB downsampling behind /api/report/equity-curve.
+Checks lttb_indices against a plain per-bucket search for the largest
+triangle, its edge cases, and that the downsampled curve keeps the
+endpoints and the extremes of a long series.
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import AnalyticsEngine, lttb_indices
+
+
+def _naive(y, threshold):
+    n = len(y)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = [0]
+    for i in range(threshold - 2):
+        if i + 2 < threshold - 1:
+            following = range(edges[i + 1], edges[i + 2])
+            third = (sum(following) / len(following), sum(y[j] for j in following) / len(following))
+        else:
+            third = (n - 1, y[n - 1])
+        a = selected[-1]
+        best, best_area = None, -1.0
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((a - third[0]) * (y[j] - y[a]) - (a - j) * (third[1] - y[a])) / 2
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+    return selected + [n - 1]
+
+
+def test_lttb_matches_naive_search():
+    rng = np.random.default_rng(11)
+    for n, threshold in [(10, 3), (101, 7), (5000, 500), (1234, 1000)]:
+        y = np.cumsum(rng.normal(0, 10, n))
+        keep = lttb_indices(y, threshold)
+        assert keep.tolist() == _naive(y.tolist(), threshold), (n, threshold)
+        assert keep.size == threshold
+        assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_edge_cases():
+    y = np.arange(5, dtype=float)
+    assert lttb_indices(y, 5).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(y, 500).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(y, 2).tolist() == [0, 4]
+    assert lttb_indices(np.array([7.0]), 2).tolist() == [0]
+    assert lttb_indices(np.array([]), 3).tolist() == []
+
+
+def test_equity_curve_keeps_shape():
+    rng = np.random.default_rng(5)
+    pnl = rng.normal(1, 20, 20000)
+    pnl[7000] = 5000.0  # one outsized win
+    pnl[15000] = -8000.0  # one outsized loss
+    dates = np.array([date(2020, 1, 1) + timedelta(days=i // 10) for i in range(pnl.size)], dtype=object)
+
+    curve = AnalyticsEngine._equity_curve("USD", 1000.0, 1500.0, pnl, dates, 300)
+    capital = np.concatenate(([1500.0], 1500.0 + np.cumsum(pnl)))
+    points = curve["points"]
+
+    assert curve["total_points"] == pnl.size + 1 and len(points) == 300
+    assert points[0] == {"trade_index": 0, "date": None, "capital": 1500.0}
+    assert points[-1]["trade_index"] == pnl.size and abs(points[-1]["capital"] - capital[-1]) < 1e-6
+    indices = [point["trade_index"] for point in points]
+    # The jumps survive downsampling
+    assert {7000, 7001} & set(indices) and {15000, 15001} & set(indices)
+    for point in points[1:]:
+        assert point["date"] == dates[point["trade_index"] - 1].isoformat()
+        assert abs(point["capital"] - capital[point["trade_index"]]) < 1e-6
+
+
+if __name__ == "__main__":
+    test_lttb_matches_naive_search()
+    test_lttb_edge_cases()
+    test_equity_curve_keeps_shape()
+    print("equity curve downsampled with LTTB")
@@ -0,0 +1,228 @@
+"""
+Concurrency test for the exchange rate single-flight layer.
+Fires many concurrent get_rate (threaded) and get_rate_async calls against a
+local stub of the ECB endpoint and checks that exactly one upstream request
+is made, including when a stale snapshot is served during an ECB outage.
+"""
+
+import asyncio
+import sys
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from exchange_rate_service import ExchangeRateService
+
+CONCURRENT_CALLS = 200
+
+ECB_STUB_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">
+  <gesmes:subject>Reference rates</gesmes:subject>
+  <Cube>
+    <Cube time="2026-04-13">
+      <Cube currency="USD" rate="1.0800"/>
+      <Cube currency="JPY" rate="162.50"/>
+      <Cube currency="GBP" rate="0.8500"/>
+    </Cube>
+  </Cube>
+</gesmes:Envelope>
+"""
+
+
+class _StubECBHandler(BaseHTTPRequestHandler):
+    hits = 0
+    hits_lock = threading.Lock()
+
+    def do_GET(self):
+        with _StubECBHandler.hits_lock:
+            _StubECBHandler.hits += 1
+        # Slow upstream, so that all callers pile up behind the first fetch
+        time.sleep(0.3)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(ECB_STUB_XML)))
+        self.end_headers()
+        self.wfile.write(ECB_STUB_XML)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FailingECBHandler(_StubECBHandler):
+    def do_GET(self):
+        with _StubECBHandler.hits_lock:
+            _StubECBHandler.hits += 1
+        time.sleep(0.1)
+        self.send_response(503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def test_concurrent_get_rate_single_upstream_request():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubECBHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    ExchangeRateService.ECB_URL = f"http://127.0.0.1:{server.server_address[1]}/eurofxref-daily.xml"
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    ExchangeRateService.clear_cache()
+    _StubECBHandler.hits = 0
+
+    barrier = threading.Barrier(CONCURRENT_CALLS)
+
+    def call(_):
+        barrier.wait()
+        return ExchangeRateService.get_rate("EUR", "USD")
+
+    try:
+        with ThreadPoolExecutor(max_workers=CONCURRENT_CALLS) as pool:
+            results = list(pool.map(call, range(CONCURRENT_CALLS)))
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+        server.shutdown()
+        server.server_close()
+
+    print(f"{CONCURRENT_CALLS} concurrent calls -> {_StubECBHandler.hits} upstream request(s)")
+    assert _StubECBHandler.hits == 1, f"Expected 1 upstream request, got {_StubECBHandler.hits}"
+    assert all(abs(r - 1.08) < 1e-9 for r in results), "All callers should see the fetched ECB rate"
+
+
+def test_concurrent_get_rate_async_single_upstream_request():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubECBHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    ExchangeRateService.ECB_URL = f"http://127.0.0.1:{server.server_address[1]}/eurofxref-daily.xml"
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    ExchangeRateService.clear_cache()
+    _StubECBHandler.hits = 0
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                *(ExchangeRateService.get_rate_async("EUR", "USD") for _ in range(CONCURRENT_CALLS))
+            )
+        finally:
+            await exchange_rate_service.close_async_client()
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+        server.shutdown()
+        server.server_close()
+
+    print(f"{CONCURRENT_CALLS} concurrent async calls -> {_StubECBHandler.hits} upstream request(s)")
+    assert _StubECBHandler.hits == 1, f"Expected 1 upstream request, got {_StubECBHandler.hits}"
+    assert all(abs(r - 1.08) < 1e-9 for r in results), "All callers should see the fetched ECB rate"
+
+
+def test_stale_snapshot_during_outage_single_revalidation():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FailingECBHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    ExchangeRateService.ECB_URL = f"http://127.0.0.1:{server.server_address[1]}/eurofxref-daily.xml"
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    ExchangeRateService.clear_cache()
+    _StubECBHandler.hits = 0
+
+    # A snapshot that expired an hour ago, as after a restart during an outage
+    ExchangeRateService._install_rates({"EUR": 1.0, "USD": 1.08})
+    exchange_rate_service._rate_cache.current["expires_at"] = datetime.utcnow() - timedelta(hours=1)
+
+    before = {thread.ident for thread in threading.enumerate()}
+    barrier = threading.Barrier(CONCURRENT_CALLS)
+
+    def call(_):
+        barrier.wait()
+        return ExchangeRateService.get_rate("EUR", "USD")
+
+    try:
+        with ThreadPoolExecutor(max_workers=CONCURRENT_CALLS) as pool:
+            results = list(pool.map(call, range(CONCURRENT_CALLS)))
+        revalidations = [
+            thread for thread in threading.enumerate()
+            if thread.name == "ecb-rate-revalidate" and thread.ident not in before
+        ]
+        for thread in revalidations:
+            thread.join(5)
+        # The failure is now negatively cached: further stale reads start nothing
+        for _ in range(CONCURRENT_CALLS):
+            ExchangeRateService.get_rate("EUR", "USD")
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+        server.shutdown()
+        server.server_close()
+
+    print(f"{2 * CONCURRENT_CALLS} stale reads during an outage -> {_StubECBHandler.hits} upstream request(s)")
+    assert len(revalidations) <= 1, f"Expected 1 revalidation thread, got {len(revalidations)}"
+    assert _StubECBHandler.hits == 1, f"Expected 1 upstream request, got {_StubECBHandler.hits}"
+    assert all(abs(r - 1.08) < 1e-9 for r in results), "Callers should be served the stale snapshot"
+
+
+def test_async_refresh_waits_for_threaded_flight():
+    """The async refresh awaits a threaded fetch's completion event instead of polling."""
+    flight = exchange_rate_service.SingleFlight()
+    release = threading.Event()
+    assert flight.completion("ecb_daily") is None
+
+    leader = threading.Thread(target=flight.do, args=("ecb_daily", release.wait))
+    leader.start()
+    while flight.completion("ecb_daily") is None:
+        time.sleep(0.01)
+    done = flight.completion("ecb_daily")
+    assert not done.is_set()
+
+    original_flight = exchange_rate_service._ecb_flight
+    original_current = exchange_rate_service._rate_cache.current
+    exchange_rate_service._ecb_flight = flight
+    # A fresh snapshot, so the refresh returns as soon as the flight is over
+    snapshot = exchange_rate_service._make_snapshot({"USD": 1.0, "EUR": 1.1}, datetime.utcnow())
+    exchange_rate_service._rate_cache.current = snapshot
+    try:
+        threading.Timer(0.2, release.set).start()
+        started = time.monotonic()
+        rates = asyncio.run(ExchangeRateService._refresh_ecb_rates_async())
+        waited = time.monotonic() - started
+    finally:
+        exchange_rate_service._ecb_flight = original_flight
+        exchange_rate_service._rate_cache.current = original_current
+        leader.join()
+
+    assert done.is_set() and flight.completion("ecb_daily") is None
+    assert rates == snapshot["rates"]
+    assert 0.15 < waited < 2, f"Expected to wait for the flight, waited {waited:.2f}s"
+
+
+if __name__ == "__main__":
+    test_concurrent_get_rate_single_upstream_request()
+    test_concurrent_get_rate_async_single_upstream_request()
+    test_stale_snapshot_during_outage_single_revalidation()
+    test_async_refresh_waits_for_threaded_flight()
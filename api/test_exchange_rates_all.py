@@ -0,0 +1,63 @@
+"""
+Test for the rebased rate tables behind /exchange-rates/all.
+Checks that tables are rebased correctly, cached per snapshot only for
+supported base currencies, and that unknown bases are rejected instead of
+being answered with the USD table.
+"""
+
+import sys
+import os
+import tempfile
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from exchange_rate_service import ExchangeRateService, FALLBACK_RATES
+
+
+def _rejected(base):
+    try:
+        ExchangeRateService.get_all_rates(base)
+    except ValueError:
+        return True
+    return False
+
+
+def test_all_rates_only_for_supported_bases():
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    # Nothing listens here: a cold cache falls back without reaching ECB
+    ExchangeRateService.ECB_URL = "http://127.0.0.1:9/eurofxref-daily.xml"
+    ExchangeRateService.clear_cache()
+    try:
+        ExchangeRateService._install_rates({"EUR": 1.0, "USD": 1.25, "GBP": 0.8})
+
+        rates, snapshot = ExchangeRateService.get_all_rates("gbp")
+        assert snapshot is not None
+        assert rates == {"EUR": 1.25, "USD": 1.5625, "GBP": 1.0}
+        assert ExchangeRateService.get_all_rates("GBP")[0] is rates, "Rebased table should be reused"
+
+        # Known to the fallback table but not to this snapshot, or not a currency at all
+        for base in ["JPY", "XXX", "DROP TABLE"]:
+            assert _rejected(base), f"{base} should be rejected"
+        assert set(snapshot["rebased"]) == {"GBP"}
+
+        # Static fallback table: validated against FALLBACK_RATES
+        ExchangeRateService.clear_cache()
+        rates, snapshot = ExchangeRateService.get_all_rates("JPY")
+        assert snapshot is None and rates["JPY"] == 1.0
+        assert abs(rates["USD"] - round(1.0 / FALLBACK_RATES["JPY"], 6)) < 1e-9
+        assert _rejected("XXX")
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+
+
+if __name__ == "__main__":
+    test_all_rates_only_for_supported_bases()
+    print("rate tables only for supported bases")
@@ -0,0 +1,63 @@
+"""
+Tests for the Monte Carlo simulator behind /api/report/monte-carlo.
+Checks trade returns, edge cases with a known outcome, and that a seed
+gives the same result in-process and on the process pool.
+"""
+
+import sys
+import os
+import asyncio
+
+import numpy as np
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import monte_carlo
+
+
+def test_trade_returns_follow_equity():
+    pnl = np.array([100.0, -55.0, 0.0])
+    returns = monte_carlo.trade_returns(pnl, np.array([1.0, np.nan, 2.0]), 1000.0)
+    assert np.allclose(returns, [0.1, -0.05, 0.0])
+
+    # Re-sized to 2% risk: the 1% trade doubles, the one without risk_percent keeps its return
+    resized = monte_carlo.trade_returns(pnl, np.array([1.0, np.nan, 2.0]), 1000.0, 2.0)
+    assert np.allclose(resized, [0.2, -0.05, 0.0])
+
+
+def test_known_outcomes():
+    flat = asyncio.run(monte_carlo.simulate_async(np.zeros(5), 1000.0, 500, 20, 1, 50.0))
+    assert flat["probability_of_ruin"] == 0.0
+    assert flat["max_drawdown_percent"]["p95"] == 0.0
+    assert flat["final_capital"]["mean"] == 1000.0
+
+    losing = asyncio.run(monte_carlo.simulate_async(np.array([-0.6]), 1000.0, 500, 3, 1, 50.0))
+    assert losing["probability_of_ruin"] == 1.0
+    assert np.isclose(losing["final_capital"]["p50"], 1000.0 * 0.4 ** 3)
+    monte_carlo.shutdown_pool()
+
+
+def test_seed_is_deterministic_across_workers():
+    returns = np.random.default_rng(0).normal(0.002, 0.02, 300)
+    workers = monte_carlo.MONTE_CARLO_WORKERS
+    cells = monte_carlo.CHUNK_CELLS
+    try:
+        # Small chunks so the simulation really is split across workers
+        monte_carlo.CHUNK_CELLS = 50_000
+        monte_carlo.MONTE_CARLO_WORKERS = 0
+        in_process = asyncio.run(monte_carlo.simulate_async(returns, 1000.0, 2000, 100, 42, 30.0))
+        monte_carlo.MONTE_CARLO_WORKERS = 2
+        pooled = asyncio.run(monte_carlo.simulate_async(returns, 1000.0, 2000, 100, 42, 30.0))
+    finally:
+        monte_carlo.shutdown_pool()
+        monte_carlo.MONTE_CARLO_WORKERS = workers
+        monte_carlo.CHUNK_CELLS = cells
+    assert in_process == pooled
+
+
+if __name__ == "__main__":
+    test_trade_returns_follow_equity()
+    test_known_outcomes()
+    test_seed_is_deterministic_across_workers()
+    print("monte carlo ok")
@@ -0,0 +1,253 @@
+"""
+Test for the persisted ECB rate history.
+Checks that the streaming history parser yields every day and keeps memory
+flat however many days the file holds, incremental and full loads, the
+forward-filled lookups and the history endpoints, and that every report
+converts each trade at the rate of its own date (current rate without one).
+"""
+
+import sys
+import os
+import asyncio
+import io
+import tempfile
+import threading
+import tracemalloc
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from analytics_engine import AnalyticsEngine
+from conftest import memory_sessionmaker, seed_user
+from exchange_rate_service import ExchangeRateService
+from models import ExchangeRateHistory, Trade
+from position_calculator import PositionCalculator
+from rate_history_service import RateHistoryService, history_version, iter_ecb_history
+
+FRIDAY = date(2026, 4, 10)
+MONDAY = date(2026, 4, 13)
+HISTORY = {
+    FRIDAY: {"USD": 1.20, "GBP": 0.80},
+    MONDAY: {"USD": 1.30, "GBP": 0.65},
+}
+
+
+def ecb_xml(days) -> bytes:
+    """An eurofxref-hist.xml style document for {date: {currency: rate}}."""
+    cubes = "".join(
+        f'<Cube time="{day.isoformat()}">'
+        + "".join(f'<Cube currency="{currency}" rate="{rate}"/>' for currency, rate in rates.items())
+        + "</Cube>"
+        for day, rates in days.items()
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<gesmes:Envelope xmlns:gesmes="http://www.gesmes.org/xml/2002-08-01" '
+        'xmlns="http://www.ecb.int/vocabulary/2002-08-01/eurofxref">'
+        "<gesmes:subject>Reference rates</gesmes:subject><Cube>" + cubes + "</Cube></gesmes:Envelope>"
+    ).encode()
+
+
+def _peak_parse_memory(n_days: int) -> int:
+    start = date(2000, 1, 3)
+    document = ecb_xml({start + timedelta(days=i): {"USD": 1.1, "JPY": 130.0, "GBP": 0.85} for i in range(n_days)})
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_ecb_history(io.BytesIO(document)))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        assert count == n_days
+
+
+def test_iter_ecb_history():
+    days = {
+        date(2026, 4, 10): {"USD": 1.09, "JPY": 163.1},
+        date(2026, 4, 13): {"USD": 1.08, "JPY": 162.5, "GBP": 0.85},
+    }
+    assert list(iter_ecb_history(io.BytesIO(ecb_xml(days)))) == list(days.items())
+
+    # Parsed days are dropped from the tree: 10x the days, about the same peak
+    small, large = _peak_parse_memory(2000), _peak_parse_memory(20000)
+    assert large < 2 * small, f"Parser memory grows with the file: {small} -> {large} bytes"
+
+
+def test_load_and_forward_fill(db):
+    assert RateHistoryService.load(db, io.BytesIO(ecb_xml(HISTORY))) == 4
+    assert history_version() == MONDAY.isoformat()
+
+    # Incremental: only days after the latest stored one are added
+    tuesday = MONDAY + timedelta(days=1)
+    more = {**HISTORY, tuesday: {"USD": 1.25, "GBP": 0.70}}
+    assert RateHistoryService.load(db, io.BytesIO(ecb_xml(more))) == 2
+    assert RateHistoryService.load(db, io.BytesIO(ecb_xml(HISTORY)), full=True) == 4
+    assert db.query(ExchangeRateHistory).count() == 4
+
+    def rate(day, from_currency, to_currency="USD"):
+        return RateHistoryService.get_rate_on(db, day, from_currency, to_currency)
+
+    assert abs(rate(FRIDAY, "EUR") - 1.20) < 1e-12
+    assert abs(rate(MONDAY, "GBP") - 2.0) < 1e-12
+    assert abs(rate(MONDAY, "USD", "GBP") - 0.5) < 1e-12
+    # The weekend uses Friday's publication, for up to FORWARD_FILL_DAYS
+    assert abs(rate(FRIDAY + timedelta(days=1), "EUR") - 1.20) < 1e-12
+    assert abs(rate(MONDAY + timedelta(days=7), "EUR") - 1.30) < 1e-12
+    assert rate(MONDAY + timedelta(days=8), "EUR") is None
+    assert rate(FRIDAY - timedelta(days=1), "EUR") is None
+    assert rate(FRIDAY, "CHF") is None
+
+    rates = RateHistoryService.rates_on_dates(
+        db, ["EUR", None, "USD", "EUR", "EUR"], [FRIDAY, FRIDAY, None, None, date(1, 1, 2)], "USD"
+    )
+    assert np.allclose(rates[:3], [1.20, 1.0, 1.0]) and np.isnan(rates[3:]).all()
+
+
+class _HistoryFileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = ecb_xml(HISTORY)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_history_endpoints(session_factory):
+    from fastapi.testclient import TestClient
+
+    try:
+        from api import api  # pytest imports the test modules as the api package
+    except ImportError:
+        import api
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _HistoryFileHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_url = RateHistoryService.ECB_HIST_URL
+    RateHistoryService.ECB_HIST_URL = f"http://127.0.0.1:{server.server_address[1]}/eurofxref-hist.xml"
+    api.app.dependency_overrides[api.get_db] = get_db
+    api.app.dependency_overrides[api.require_admin] = lambda: None
+    try:
+        client = TestClient(api.app)
+        assert client.get("/api/exchange-rates/history?date=2026-04-11").status_code == 404
+
+        assert client.post("/api/exchange-rates/history/load").json() == {"inserted": 4}
+        assert client.post("/api/exchange-rates/history/load").json() == {"inserted": 0}
+        assert client.post("/api/exchange-rates/history/load?full=true").json() == {"inserted": 4}
+
+        response = client.get("/api/exchange-rates/history?date=2026-04-11&from_currency=gbp&to_currency=usd")
+        assert response.json() == {"from": "GBP", "to": "USD", "date": "2026-04-11", "rate": 1.5}
+    finally:
+        api.app.dependency_overrides.clear()
+        RateHistoryService.ECB_HIST_URL = original_url
+        server.shutdown()
+        server.server_close()
+
+
+def test_reports_convert_at_trade_dates(db):
+    original_url = ExchangeRateService.ECB_URL
+    original_snapshot_path = exchange_rate_service.SNAPSHOT_PATH
+    snapshot_dir = tempfile.TemporaryDirectory()
+    exchange_rate_service.SNAPSHOT_PATH = os.path.join(snapshot_dir.name, "ecb_rates_snapshot.json")
+    # Nothing listens here: current rates come from the static fallback table
+    ExchangeRateService.ECB_URL = "http://127.0.0.1:9/eurofxref-daily.xml"
+    ExchangeRateService.clear_cache()
+    try:
+        _check_reports(db)
+    finally:
+        ExchangeRateService.ECB_URL = original_url
+        exchange_rate_service.SNAPSHOT_PATH = original_snapshot_path
+        snapshot_dir.cleanup()
+        ExchangeRateService.clear_cache()
+
+
+def _check_reports(db):
+    user = seed_user(db, account_currency="USD", initial_capital=1000.0)
+    trades = [
+        (FRIDAY, "EUR", 100.0),
+        (FRIDAY + timedelta(days=1), "EUR", -50.0),  # Saturday: Friday's rate
+        (MONDAY, "EUR", 10.0),
+        (FRIDAY, None, 7.0),  # already in USD
+        (None, "EUR", 20.0),  # undated: current rate
+        (MONDAY + timedelta(days=30), "EUR", 5.0),  # after the history: current rate
+    ]
+    db.add_all(
+        Trade(owner_id=user.id, date=day, currency=currency, pair="EUR/USD", profit_or_loss=pnl)
+        for day, currency, pnl in trades
+    )
+    db.commit()
+    current = float(ExchangeRateService.convert_many(np.ones(1), ["EUR"], "USD")[0])
+
+    def totals(date_from=None, date_to=None):
+        # One at a time: the session is not shared between concurrent calls
+        report, dashboard, advanced, breakdown, curve = [
+            asyncio.run(_single(coroutine)) for coroutine in _report_calls(db, user, date_from, date_to)
+        ]
+        return [
+            report["total_pnl"],
+            dashboard["report"]["total_pnl"],
+            dashboard["positions"]["total_pnl"],
+            advanced["total_pnl"],
+            sum(group["total_pnl"] for group in breakdown["groups"]),
+            curve["points"][-1]["capital"] - curve["opening_capital"],
+            # The blocking entry points share the same computation
+            PositionCalculator.calculate_report(db, user, date_from, date_to)["total_pnl"],
+            PositionCalculator.get_position_summary(db, user, date_from, date_to)["total_pnl"],
+        ], report["capital"]
+
+    # No history loaded: everything at the current rate
+    values, _ = totals()
+    expected = 7.0 + 85.0 * current
+    assert np.allclose(values, expected), values
+
+    RateHistoryService.load(db, io.BytesIO(ecb_xml(HISTORY)))
+    values, capital = totals()
+    expected = 100 * 1.20 - 50 * 1.20 + 10 * 1.30 + 7.0 + 25.0 * current
+    assert np.allclose(values, expected), values
+    assert abs(capital - (1000.0 + expected)) < 1e-9
+    assert abs(PositionCalculator.pnl_through(db, user, "USD") - expected) < 1e-9
+
+    # A range only counts its own trades, but capital includes everything up to its end
+    values, capital = totals(FRIDAY + timedelta(days=1), MONDAY)
+    assert np.allclose(values, -50 * 1.20 + 10 * 1.30), values
+    assert abs(capital - (1000.0 + 100 * 1.20 - 50 * 1.20 + 10 * 1.30 + 7.0)) < 1e-9
+
+
+def _report_calls(db, user, date_from, date_to):
+    return [
+        PositionCalculator.calculate_report_async(db, user, date_from, date_to),
+        PositionCalculator.get_dashboard_async(db, user, 10, date_from, date_to),
+        AnalyticsEngine.report_async(db, user, date_from, date_to),
+        AnalyticsEngine.breakdown_async(db, user, ["pair"], "day", date_from, date_to),
+        AnalyticsEngine.equity_curve_async(db, user, 50, date_from, date_to),
+    ]
+
+
+async def _single(coroutine):
+    try:
+        return await coroutine
+    finally:
+        await exchange_rate_service.close_async_client()
+
+
+if __name__ == "__main__":
+    test_iter_ecb_history()
+    test_load_and_forward_fill(memory_sessionmaker()())
+    test_history_endpoints(memory_sessionmaker())
+    test_reports_convert_at_trade_dates(memory_sessionmaker()())
+    print("rate history parsed")
@@ -0,0 +1,96 @@
+"""
+Test for the persisted exchange rate snapshot.
+Checks that snapshots are written atomically (a failed write leaves the
+previous file and no temporary file behind), that tampered or truncated
+files are rejected, and that a fresh process restores the snapshot at
+import time.
+"""
+
+import sys
+import os
+import json
+import subprocess
+import tempfile
+from datetime import datetime
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import exchange_rate_service
+from exchange_rate_service import _make_snapshot, load_snapshot, save_snapshot
+
+RATES = {"EUR": 1.0, "USD": 1.08, "GBP": 0.85}
+FETCHED_AT = datetime(2026, 4, 13, 15, 0)
+
+
+def test_atomic_write_and_checksum():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ecb_rates_snapshot.json")
+        save_snapshot(_make_snapshot(RATES, FETCHED_AT), path)
+        assert os.listdir(directory) == ["ecb_rates_snapshot.json"]
+        restored = load_snapshot(path)
+        assert restored["rates"] == RATES and restored["fetched_at"] == FETCHED_AT
+
+        # A write that fails halfway keeps the previous file and cleans up after itself
+        original_dump = json.dump
+
+        def failing_dump(document, f):
+            f.write('{"rates": ')
+            raise OSError("disk full")
+
+        json.dump = failing_dump
+        try:
+            save_snapshot(_make_snapshot({**RATES, "USD": 2.0}, datetime(2026, 4, 14, 15, 0)), path)
+        except OSError:
+            pass
+        else:
+            raise AssertionError("Expected the failed write to raise")
+        finally:
+            json.dump = original_dump
+        assert os.listdir(directory) == ["ecb_rates_snapshot.json"]
+        assert load_snapshot(path)["rates"] == RATES
+
+        # Tampered rates fail the checksum; truncated files do not parse
+        with open(path) as f:
+            document = json.load(f)
+        document["rates"]["USD"] = 1.5
+        with open(path, "w") as f:
+            json.dump(document, f)
+        assert load_snapshot(path) is None
+
+        save_snapshot(_make_snapshot(RATES, FETCHED_AT), path)
+        with open(path) as f:
+            content = f.read()
+        with open(path, "w") as f:
+            f.write(content[: len(content) // 2])
+        assert load_snapshot(path) is None
+        assert load_snapshot(os.path.join(directory, "missing.json")) is None
+
+
+def test_restore_at_import():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "ecb_rates_snapshot.json")
+        save_snapshot(_make_snapshot(RATES, FETCHED_AT), path)
+
+        script = (
+            "import exchange_rate_service as s; "
+            "snapshot = s._rate_cache.current; "
+            "print(snapshot['fetched_at'].isoformat(), snapshot['rates']['GBP'])"
+        )
+        env = {**os.environ, "EXCHANGE_RATE_SNAPSHOT_PATH": path, "EXCHANGE_RATE_SHARED_CACHE": ""}
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.abspath(exchange_rate_service.__file__)),
+            env=env, capture_output=True, text=True, timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+        fetched_at, rate = result.stdout.split()[-2:]
+        # Restored with its original fetch time, so it is served as stale until refreshed
+        assert fetched_at == FETCHED_AT.isoformat()
+        assert abs(float(rate) - 0.85) < 1e-9
+
+
+if __name__ == "__main__":
+    test_atomic_write_and_checksum()
+    test_restore_at_import()
+    print("exchange rate snapshot persisted atomically and restored at import")
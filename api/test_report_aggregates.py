@@ -0,0 +1,141 @@
+"""
+Consistency test for the materialized report aggregates.
+Applies creates, edits, cancels and deletes through ReportAggregates and
+checks the stored rows against a fresh aggregation of the trades table, and
+that users are materialized once, even when they have no active trades, and
+that a bucket's row goes away with its last trade.
+"""
+
+import sys
+import os
+import random
+
+import numpy as np
+from sqlalchemy import event
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import assert_aggregates_in_sync, memory_sessionmaker, seed_user
+from models import ReportAggregate, Trade
+from report_aggregates import ReportAggregates
+
+
+def test_aggregates_follow_trade_mutations(db):
+    rng = random.Random(7)
+    user = seed_user(db)
+
+    def new_trade():
+        return Trade(
+            owner_id=user.id,
+            pair=rng.choice(["EUR/USD", "GBP/JPY", "XAUUSD", None]),
+            currency=rng.choice([None, "", "USD", "JPY"]),
+            exchange_rate=rng.choice([None, 0.0, 1.1]),
+            profit_or_loss=rng.choice([None, 0.0, rng.uniform(-100, 100)]),
+        )
+
+    # Trades that exist before the first report are picked up by the lazy rebuild
+    db.add_all([new_trade() for _ in range(20)])
+    db.commit()
+    assert_aggregates_in_sync(db, user.id)
+
+    created = [new_trade() for _ in range(40)]
+    db.add_all(created)
+    ReportAggregates.add(db, created)
+    db.commit()
+    assert_aggregates_in_sync(db, user.id)
+
+    for trade in created[:15]:
+        before = ReportAggregates.contribution(trade)
+        trade.profit_or_loss = rng.uniform(-100, 100)
+        trade.currency = rng.choice([None, "GBP"])
+        trade.cancelled = rng.random() < 0.3
+        ReportAggregates.replace(db, user.id, before, ReportAggregates.contribution(trade))
+    db.commit()
+    assert_aggregates_in_sync(db, user.id)
+
+    ReportAggregates.remove(db, [created[15]])
+    db.delete(created[15])
+    ReportAggregates.remove_ids(db, user.id, [trade.id for trade in created[16:30]])
+    db.query(Trade).filter(Trade.id.in_([trade.id for trade in created[16:30]])).delete(
+        synchronize_session=False
+    )
+    db.commit()
+    assert_aggregates_in_sync(db, user.id)
+
+
+def test_materialization_marker(db):
+    empty = seed_user(db, "empty")
+    lazy = seed_user(db, "lazy")
+
+    # Trades written before the first report are skipped, then rebuilt on read
+    trade = Trade(owner_id=lazy.id, pair="EUR/USD", profit_or_loss=12.0)
+    db.add(trade)
+    ReportAggregates.add(db, [trade])
+    db.commit()
+    assert not lazy.aggregates_materialized
+    assert_aggregates_in_sync(db, lazy.id)
+    db.refresh(lazy)
+    assert lazy.aggregates_materialized
+
+    # A user without active trades is materialized once, with no rows
+    keys, sums = ReportAggregates.buckets(db, empty.id)
+    assert keys == [] and sums.shape == (0, 5)
+    db.refresh(empty)
+    assert empty.aggregates_materialized
+
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    keys, _ = ReportAggregates.buckets(db, empty.id)
+    assert keys == []
+    assert not any(sql.lstrip().upper().startswith(("DELETE", "INSERT")) for sql in statements), statements
+
+    # ...and later trades go straight into its aggregates
+    trade = Trade(owner_id=empty.id, currency="USD", profit_or_loss=-4.0)
+    db.add(trade)
+    ReportAggregates.add(db, [trade])
+    db.commit()
+    keys, sums = ReportAggregates.buckets(db, empty.id)
+    assert keys == ["USD"] and np.allclose(sums[0], [0.0, -4.0, 0, 1, 1])
+
+
+def test_empty_bucket_row_is_deleted(db):
+    user = seed_user(db)
+    ReportAggregates.buckets(db, user.id)  # materialize
+
+    trades = [
+        Trade(owner_id=user.id, currency="JPY", profit_or_loss=0.1),
+        Trade(owner_id=user.id, currency="JPY", profit_or_loss=0.2),
+        Trade(owner_id=user.id, currency="GBP", profit_or_loss=-5.0),
+    ]
+    db.add_all(trades)
+    ReportAggregates.add(db, trades)
+    db.commit()
+
+    def stored_buckets():
+        return sorted(row.currency for row in db.query(ReportAggregate).filter_by(user_id=user.id))
+
+    assert stored_buckets() == ["GBP", "JPY"]
+
+    # Cancel the JPY trades one at a time: the row survives the first...
+    for trade, remaining in zip(trades[:2], (["GBP", "JPY"], ["GBP"])):
+        before = ReportAggregates.contribution(trade)
+        trade.cancelled = True
+        ReportAggregates.replace(db, user.id, before, ReportAggregates.contribution(trade))
+        db.commit()
+        assert stored_buckets() == remaining
+        assert_aggregates_in_sync(db, user.id)
+
+    # ...and deleting the last GBP trade removes its row too
+    ReportAggregates.remove_ids(db, user.id, [trades[2].id])
+    db.delete(trades[2])
+    db.commit()
+    assert stored_buckets() == []
+    assert_aggregates_in_sync(db, user.id)
+
+
+if __name__ == "__main__":
+    test_aggregates_follow_trade_mutations(memory_sessionmaker()())
+    test_materialization_marker(memory_sessionmaker()())
+    test_empty_bucket_row_is_deleted(memory_sessionmaker()())
+    print("report aggregates in sync")
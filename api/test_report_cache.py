@@ -0,0 +1,55 @@
+"""
+Test for the report cache.
+Checks that cached_report keys and tags a report on the user's fields as
+they were before computing it, even when the computation commits and the
+session lets go of the user.
+"""
+
+import sys
+import os
+import asyncio
+
+from starlette.requests import Request
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import memory_sessionmaker, seed_user
+from models import User
+from report_cache import report_cache
+
+try:
+    from api import api  # pytest imports the test modules as the api package
+except ImportError:
+    import api
+
+
+def test_cached_report_reads_user_before_compute(db):
+    user = seed_user(db, account_currency="EUR", initial_capital=500.0)
+    user_id = user.id
+    expected = report_cache.etag("report", (user_id, 0, "EUR", 500.0), None)
+    report_cache.clear()
+
+    async def compute():
+        # Like a lazy aggregates rebuild: commits, which expires the user
+        db.commit()
+        db.close()
+        return {"total_pnl": 1.0}
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    try:
+        response = asyncio.run(api.cached_report(request, "report", user, compute, None))
+        assert response.headers["etag"] == expected
+        assert report_cache.get(expected) == {"total_pnl": 1.0}
+
+        # The same inputs, read from a fresh instance, hit the cached payload
+        fresh = db.get(User, user_id)
+        cached = asyncio.run(api.cached_report(request, "report", fresh, compute, None))
+        assert cached.headers["etag"] == expected and cached.body == response.body
+    finally:
+        report_cache.clear()
+
+
+if __name__ == "__main__":
+    test_cached_report_reads_user_before_compute(memory_sessionmaker()())
+    print("report cache keyed on the user's fields read before compute")
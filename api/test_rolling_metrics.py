@@ -0,0 +1,75 @@
+"""
+Test for the rolling-window series behind /api/report/rolling.
+Checks rolling_window_sums (prefix sums) against recomputing every window
+from scratch, and that the span of days is bounded.
+"""
+
+import sys
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from analytics_engine import MAX_ROLLING_DAYS, AnalyticsEngine, rolling_window_sums
+
+
+def _naive(days, pnl, window, start, end):
+    rows = []
+    for day in range(start, end + 1):
+        inside = (days > day - window) & (days <= day)
+        values = pnl[inside]
+        rows.append([values[values > 0].sum(), values[values < 0].sum(), (values > 0).sum(), values.size])
+    return np.array(rows, dtype=float).T
+
+
+def test_rolling_sums_match_full_recompute():
+    rng = np.random.default_rng(3)
+    days = np.sort(rng.integers(738000, 738400, 2000))
+    pnl = rng.normal(2, 50, days.size)
+    pnl[rng.random(days.size) < 0.05] = 0.0
+    windows = (1, 7, 30, 90)
+
+    # Start inside the history, so earlier trades must fill the first windows
+    start, end = 738100, 738450
+    sums = rolling_window_sums(days, pnl, windows, start, end)
+    for window in windows:
+        expected = _naive(days, pnl, window, start, end)
+        assert sums[window].shape == expected.shape
+        assert np.allclose(sums[window], expected), f"window {window} differs"
+
+
+def test_rolling_sums_without_trades():
+    sums = rolling_window_sums(np.array([], dtype=np.int64), np.array([]), (7,), 10, 20)
+    assert sums[7].shape == (4, 11)
+    assert not sums[7].any()
+
+
+def test_rolling_span_is_bounded():
+    days = np.array([date(2026, 1, 5).toordinal()], dtype=np.int64)
+    pnl = np.array([10.0])
+
+    def series(date_from, date_to):
+        return AnalyticsEngine._rolling_series("USD", None, (7,), days, pnl, date_from, date_to)
+
+    first = date.min
+    assert len(series(first, first + timedelta(days=MAX_ROLLING_DAYS - 1))["dates"]) == MAX_ROLLING_DAYS
+    for date_from, date_to in [
+        (first, first + timedelta(days=MAX_ROLLING_DAYS)),
+        (first, None),  # up to the last trade
+        (date(2026, 1, 1), date.max),
+    ]:
+        try:
+            series(date_from, date_to)
+        except ValueError:
+            continue
+        raise AssertionError(f"{date_from}..{date_to} should exceed MAX_ROLLING_DAYS")
+
+
+if __name__ == "__main__":
+    test_rolling_sums_match_full_recompute()
+    test_rolling_sums_without_trades()
+    test_rolling_span_is_bounded()
+    print("rolling sums match")
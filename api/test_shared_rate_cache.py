@@ -0,0 +1,102 @@
+"""
+Test for the cross-worker shared rate store.
+Races several worker processes for the fetch lease and checks that exactly
+one wins, that leases are re-entrant, released and expire on their own,
+that only newer snapshots replace the published one, and that every store
+call closes its SQLite connection.
+"""
+
+import sys
+import os
+import multiprocessing
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from shared_rate_cache import SharedRateStore
+
+WORKERS = 8
+
+
+class _Worker(SharedRateStore):
+    """A store that pretends to be another worker and remembers its connections."""
+
+    def __init__(self, path: str, name: str):
+        self.name = name
+        self.connections = []
+        super().__init__(path)
+
+    @property
+    def owner(self) -> str:
+        return self.name
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = super()._connect()
+        self.connections.append(conn)
+        return conn
+
+
+def _race_for_lease(path: str, start) -> bool:
+    store = SharedRateStore(path)
+    start.wait()
+    return store.acquire_lease(30)
+
+
+def test_one_worker_process_gets_the_lease():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rates.sqlite")
+        SharedRateStore(path)
+        context = multiprocessing.get_context("spawn")
+        start = context.Manager().Event()
+        with context.Pool(WORKERS) as pool:
+            results = pool.starmap_async(_race_for_lease, [(path, start)] * WORKERS)
+            start.set()
+            won = results.get(timeout=60)
+        assert sum(won) == 1, f"Expected one lease holder, got {sum(won)}"
+
+
+def test_lease_and_snapshot():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rates.sqlite")
+        first = _Worker(path, "worker-1")
+        second = _Worker(path, "worker-2")
+
+        assert first.acquire_lease(30)
+        assert not second.acquire_lease(30)
+        assert first.acquire_lease(30), "The holder can renew its own lease"
+        second.release_lease()  # not the holder: no effect
+        assert not second.acquire_lease(30)
+        first.release_lease()
+        assert second.acquire_lease(30)
+
+        # An expired lease is free for the taking
+        second.acquire_lease(-1)
+        assert first.acquire_lease(30)
+
+        assert first.read() is None
+        fetched_at = datetime(2026, 4, 13, 15, 0)
+        snapshot = {"id": "a", "fetched_at": fetched_at, "modified_at": fetched_at, "rates": {"USD": 1.0}}
+        first.publish(snapshot)
+        second.publish({**snapshot, "id": "old", "fetched_at": fetched_at - timedelta(days=1)})
+        assert second.read() == snapshot
+        second.publish({**snapshot, "id": "new", "fetched_at": fetched_at + timedelta(days=1)})
+        assert first.read()["id"] == "new"
+        assert second.get_state()["snapshot_id"] == "new"
+
+        for store in (first, second):
+            assert store.connections
+            for conn in store.connections:
+                try:
+                    conn.execute("SELECT 1")
+                except sqlite3.ProgrammingError:
+                    continue
+                raise AssertionError(f"{store.owner} left a connection open")
+
+
+if __name__ == "__main__":
+    test_one_worker_process_gets_the_lease()
+    test_lease_and_snapshot()
+    print("shared rate store lease held by one worker")
@@ -0,0 +1,131 @@
+"""
+Test for the bulk trade endpoints behind /api/trades/bulk.
+Checks that valid rows are inserted in request order, invalid rows are
+reported by index without blocking the others, that bulk patch and cancel
+only touch the owner's selected trades, and that the materialized report
+aggregates stay in sync with the trades table throughout.
+"""
+
+import sys
+import os
+import random
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import assert_aggregates_in_sync, memory_sessionmaker, seed_user
+from models import Trade
+from report_aggregates import ReportAggregates
+from trade_bulk import TradeBulk
+from trade_listing import TradeListing
+
+
+def test_bulk_create(db):
+    rng = random.Random(3)
+
+    user = seed_user(db, trade_version=0)
+    db.add(Trade(owner_id=user.id, pair="EUR/USD", profit_or_loss=10.0))
+    db.commit()
+    # Materialize the aggregates so the bulk insert has to update them
+    ReportAggregates.rebuild(db, user.id)
+    db.commit()
+
+    rows = [
+        {
+            "date": f"2026-02-{i % 28 + 1:02d}",
+            "pair": rng.choice(["EUR/USD", "GBP/JPY", "XAUUSD"]),
+            "currency": rng.choice([None, "USD"]),
+            "profit_or_loss": rng.uniform(-100, 100),
+            "cancelled": i % 10 == 0,
+            "comments": f"row {i}",
+        }
+        for i in range(120)
+    ]
+    rows[5]["profit_or_loss"] = "not a number"
+    del rows[7]["date"]
+    rows[9] = "not an object"
+
+    result = TradeBulk.create(db, user.id, rows)
+    assert [error["index"] for error in result["errors"]] == [5, 7, 9]
+    assert result["errors"][0]["errors"][0]["loc"] == ("profit_or_loss",)
+    assert result["created"] == len(result["ids"]) == len(result["indexes"]) == 117
+
+    created = {trade.id: trade for trade in db.query(Trade).filter(Trade.id.in_(result["ids"]))}
+    for trade_id, index in zip(result["ids"], result["indexes"]):
+        trade = created[trade_id]
+        assert trade.owner_id == user.id
+        assert trade.comments == f"row {index}"
+        assert trade.cancelled == (index % 10 == 0)
+
+    assert_aggregates_in_sync(db, user.id)
+
+    db.refresh(user)
+    assert user.trade_version == 1
+
+    # Nothing valid: nothing written, no version bump
+    result = TradeBulk.create(db, user.id, [{"pair": "EUR/USD"}])
+    assert result["created"] == 0 and result["errors"][0]["index"] == 0
+    db.refresh(user)
+    assert user.trade_version == 1
+
+
+def test_bulk_patch_and_cancel(db):
+    rng = random.Random(5)
+
+    user = seed_user(db, trade_version=0)
+    other = seed_user(db, "other", trade_version=0)
+    trades = [
+        Trade(
+            owner_id=owner.id,
+            system=rng.choice(["breakout", "trend"]),
+            pair=rng.choice(["EUR/USD", "GBP/JPY"]),
+            exchange_rate=rng.choice([None, 1.1]),
+            profit_or_loss=rng.uniform(-100, 100),
+        )
+        for owner in (user, other)
+        for _ in range(60)
+    ]
+    db.add_all(trades)
+    db.commit()
+    mine = [trade.id for trade in trades if trade.owner_id == user.id]
+    theirs = [trade.id for trade in trades if trade.owner_id == other.id]
+    for owner in (user, other):
+        ReportAggregates.rebuild(db, owner.id)
+    db.commit()
+
+    def systems(owner_id):
+        return sorted(
+            (trade_id, system) for trade_id, system in
+            db.query(Trade.id, Trade.system).filter(Trade.owner_id == owner_id)
+        )
+
+    # Re-tag a system by filter: no aggregate field, only the owner's trades
+    other_before = systems(other.id)
+    breakout = db.query(Trade).filter(Trade.owner_id == user.id, Trade.system == "breakout").count()
+    filters = TradeListing.filters(user.id, system="breakout")
+    assert TradeBulk.patch(db, user.id, filters, {"system": "breakout-v2"}) == breakout
+    assert db.query(Trade).filter(Trade.owner_id == user.id, Trade.system == "breakout-v2").count() == breakout
+    assert systems(other.id) == other_before
+
+    # P&L edit by id (other users' ids in the list are ignored)
+    filters = TradeListing.filters(user.id) + [Trade.id.in_(mine[:10] + theirs[:10])]
+    assert TradeBulk.patch(db, user.id, filters, {"profit_or_loss": 25.0, "currency": "USD"}) == 10
+    assert_aggregates_in_sync(db, user.id)
+    assert_aggregates_in_sync(db, other.id)
+
+    # Cancel: already cancelled and foreign trades are not counted
+    assert TradeBulk.cancel(db, user.id, mine[5:20] + theirs[:5]) == 15
+    assert TradeBulk.cancel(db, user.id, mine[15:25]) == 5
+    assert db.query(Trade).filter(Trade.id.in_(theirs), Trade.cancelled == True).count() == 0
+    assert_aggregates_in_sync(db, user.id)
+    assert_aggregates_in_sync(db, other.id)
+
+    db.refresh(user)
+    db.refresh(other)
+    assert (user.trade_version, other.trade_version) == (4, 0)
+
+
+if __name__ == "__main__":
+    test_bulk_create(memory_sessionmaker()())
+    test_bulk_patch_and_cancel(memory_sessionmaker()())
+    print("bulk trade endpoints consistent")
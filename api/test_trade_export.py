@@ -0,0 +1,94 @@
+"""
+Test for the streaming trade export behind /api/trades/export.
+Checks that CSV, NDJSON and (with pyarrow) Parquet/Arrow exports hold
+exactly the listed trades, in listing order, that the CSV header is
+produced before any row is read and that the columnar files are typed.
+"""
+
+import sys
+import os
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+# Add the api folder to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+import trade_export
+from conftest import memory_sessionmaker, seed_user
+from models import Trade
+from trade_export import EXPORT_COLUMNS, columnar_available, stream_trades
+from trade_listing import TradeListing
+
+
+def test_export_matches_listing(session_factory):
+    db = session_factory()
+
+    user = seed_user(db)
+    db.add_all(
+        Trade(
+            owner_id=user.id,
+            date=date(2026, 1, 1) + timedelta(days=i % 40) if i % 9 else None,
+            pair="EUR/USD" if i % 2 else "GBP/USD",
+            profit_or_loss=i - 50.5,
+            comments='has "quotes", commas\nand newlines' if i == 3 else None,
+        )
+        for i in range(250)
+    )
+    db.commit()
+
+    batch_size = trade_export.EXPORT_BATCH_SIZE
+    columnar_batch_size = trade_export.COLUMNAR_BATCH_SIZE
+    trade_export.EXPORT_BATCH_SIZE = 32
+    trade_export.COLUMNAR_BATCH_SIZE = 32
+    try:
+        for criteria in [{}, {"pair": "EUR/USD", "date_from": date(2026, 1, 10)}]:
+            filters = TradeListing.filters(user.id, **criteria)
+            listed, _ = TradeListing.page(db, filters)
+
+            chunks = stream_trades(session_factory, filters, "csv")
+            assert next(chunks) == ",".join(EXPORT_COLUMNS) + "\r\n"
+            rows = list(csv.DictReader(io.StringIO("".join(chunks), newline=""), fieldnames=EXPORT_COLUMNS))
+            assert [int(row["id"]) for row in rows] == [trade.id for trade in listed]
+
+            lines = "".join(stream_trades(session_factory, filters, "ndjson")).splitlines()
+            records = [json.loads(line) for line in lines]
+            assert [record["id"] for record in records] == [trade.id for trade in listed]
+            by_id = {trade.id: trade for trade in listed}
+            for record, row in zip(records, rows):
+                trade = by_id[record["id"]]
+                assert record["date"] == (trade.date.isoformat() if trade.date else None)
+                assert record["profit_or_loss"] == trade.profit_or_loss
+                assert row["comments"] == (trade.comments or "")
+
+            if columnar_available():
+                _check_columnar(session_factory, filters, listed)
+    finally:
+        trade_export.EXPORT_BATCH_SIZE = batch_size
+        trade_export.COLUMNAR_BATCH_SIZE = columnar_batch_size
+        db.close()
+
+
+def _check_columnar(Session, filters, listed):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet = pq.read_table(io.BytesIO(b"".join(stream_trades(Session, filters, "parquet"))))
+    arrow = pa.ipc.open_stream(b"".join(stream_trades(Session, filters, "arrow"))).read_all()
+    for table in (parquet, arrow):
+        assert table.column_names == EXPORT_COLUMNS
+        assert table.schema.field("id").type == pa.int64()
+        assert table.schema.field("date").type == pa.date32()
+        assert table.schema.field("profit_or_loss").type == pa.float64()
+        assert table.schema.field("cancelled").type == pa.bool_()
+        assert table.schema.field("pair").type == pa.string()
+        assert table.column("id").to_pylist() == [trade.id for trade in listed]
+        assert table.column("date").to_pylist() == [trade.date for trade in listed]
+        assert table.column("profit_or_loss").to_pylist() == [trade.profit_or_loss for trade in listed]
+        assert table.column("comments").to_pylist() == [trade.comments for trade in listed]
+
+
+if __name__ == "__main__":
+    test_export_matches_listing(memory_sessionmaker())
+    print("trade export consistent")
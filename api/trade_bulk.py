@@ -0,0 +1,117 @@
+"""
+Trade Bulk
+Set-based writes behind /api/trades/bulk: many trades per request, one
+statement and one transaction instead of a round trip and commit per trade.
+Every statement is scoped to the owner, so ids of other users' trades are
+simply not matched.
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from models import Trade
+from report_aggregates import CONTRIBUTION_FIELDS, ReportAggregates
+from report_cache import bump_trade_version
+from schemas import TradeCreate
+
+# Rows accepted per bulk request
+MAX_BULK_TRADES = 5000
+
+
+class TradeBulk:
+    """Bulk creation, editing and cancelling of a user's trades."""
+
+    @staticmethod
+    def validate(rows: Sequence[Dict[str, Any]]) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict]]:
+        """
+        Validate every row against TradeCreate.
+
+        Returns (index, values) of the valid rows and, for each invalid row,
+        {"index", "errors"} with the same loc/msg/type entries as a 422.
+        """
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        errors: List[Dict] = []
+        for index, row in enumerate(rows):
+            try:
+                valid.append((index, TradeCreate.model_validate(row).model_dump()))
+            except ValidationError as e:
+                errors.append({
+                    "index": index,
+                    "errors": e.errors(include_url=False, include_context=False, include_input=False),
+                })
+        return valid, errors
+
+    @staticmethod
+    def create(db: Session, user_id: int, rows: Sequence[Dict[str, Any]]) -> Dict:
+        """
+        Insert the valid rows for a user with one executemany INSERT and
+        commit once; invalid rows are reported and skipped.
+
+        Returns {"created", "ids", "errors"}: ids are in request order, one
+        per valid row, with "indexes" giving each id's row in the request.
+        """
+        valid, errors = TradeBulk.validate(rows)
+        ids: List[int] = []
+        if valid:
+            # Every row carries every TradeCreate field, so the executemany
+            # statement (compiled from the first row) fits all of them
+            values = [{**row, "owner_id": user_id} for _, row in valid]
+            ids = db.execute(
+                insert(Trade).returning(Trade.id, sort_by_parameter_order=True),
+                values,
+            ).scalars().all()
+            ReportAggregates.add_ids(db, user_id, ids)
+            bump_trade_version(db, user_id)
+            db.commit()
+
+        return {
+            "created": len(ids),
+            "ids": ids,
+            "indexes": [index for index, _ in valid],
+            "errors": errors,
+        }
+
+    @staticmethod
+    def cancel(db: Session, user_id: int, trade_ids: Sequence[int]) -> int:
+        """
+        Cancel the user's trades among trade_ids with one UPDATE. Returns
+        how many were cancelled (already cancelled ones are not counted).
+        """
+        ReportAggregates.remove_ids(db, user_id, trade_ids)
+        cancelled = db.execute(
+            update(Trade)
+            .where(Trade.owner_id == user_id, Trade.id.in_(trade_ids), Trade.cancelled.isnot(True))
+            .values(cancelled=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if cancelled:
+            bump_trade_version(db, user_id)
+        db.commit()
+        return cancelled
+
+    @staticmethod
+    def patch(db: Session, user_id: int, filters: List, changes: Dict[str, Any]) -> int:
+        """
+        Apply changes to every trade matching filters (which must include the
+        owner clause, as TradeListing.filters does) with one UPDATE. Returns
+        the number of trades updated.
+
+        Edits that can move trades between report buckets (P&L, currency,
+        pair, exchange rate, cancelled) rebuild the user's aggregates with
+        one grouped query afterwards; other edits leave them untouched.
+        """
+        updated = db.execute(
+            update(Trade)
+            .where(*filters)
+            .values(changes)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated:
+            if not CONTRIBUTION_FIELDS.isdisjoint(changes):
+                ReportAggregates.rebuild(db, user_id)
+            bump_trade_version(db, user_id)
+        db.commit()
+        return updated
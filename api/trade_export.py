@@ -0,0 +1,193 @@
+"""
+Trade Export
+Streams a user's trades as CSV, NDJSON, Parquet or Arrow IPC for
+/api/trades/export.
+
+Rows are read as plain column tuples through a server-side cursor
+(yield_per) and written out one batch at a time, so memory stays flat
+whatever the size of the journal and the first bytes leave immediately.
+The columnar formats need pyarrow (requirements-export.txt), which is
+imported only when used.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import Boolean, Date, Float, Integer, select
+from sqlalchemy.orm import Session
+
+from models import Trade
+from schemas import TradeCreate
+
+# Rows fetched from the database cursor per batch (and per chunk written)
+EXPORT_BATCH_SIZE = 1000
+
+# Rows per Arrow record batch / Parquet row group
+COLUMNAR_BATCH_SIZE = 10_000
+
+# id, then the TradeCreate fields in schema order
+EXPORT_COLUMNS = ["id"] + list(TradeCreate.model_fields)
+
+# format: (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+
+def iter_trade_batches(db: Session, filters: List, batch_size: Optional[int] = None) -> Iterator[List[tuple]]:
+    """
+    Matching trades as batches of tuples in EXPORT_COLUMNS order, sorted by
+    (date, id) with undated trades last, like the /api/trades/ listing.
+    """
+    columns = [getattr(Trade, name) for name in EXPORT_COLUMNS]
+    segments = [
+        (Trade.date.isnot(None), (Trade.date, Trade.id)),
+        (Trade.date.is_(None), (Trade.id,)),
+    ]
+    for segment, order in segments:
+        result = db.execute(
+            select(*columns)
+            .where(*filters, segment)
+            .order_by(*order)
+            .execution_options(yield_per=batch_size or EXPORT_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            yield batch
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def csv_chunks(batches: Iterator[List[tuple]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    # Header goes out before the first row is fetched
+    writer.writerow(EXPORT_COLUMNS)
+    yield flush()
+    for batch in batches:
+        writer.writerows([_plain(value) for value in row] for row in batch)
+        yield flush()
+
+
+def ndjson_chunks(batches: Iterator[List[tuple]]) -> Iterator[str]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_plain, row)))) + "\n" for row in batch
+        )
+
+
+def columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def arrow_schema():
+    """Arrow schema of the export, typed from the Trade columns."""
+    import pyarrow as pa
+
+    types = {Integer: pa.int64(), Float: pa.float64(), Boolean: pa.bool_(), Date: pa.date32()}
+    fields = []
+    for name in EXPORT_COLUMNS:
+        column_type = Trade.__table__.columns[name].type
+        arrow_type = next((t for base, t in types.items() if isinstance(column_type, base)), pa.string())
+        fields.append(pa.field(name, arrow_type, nullable=name != "id"))
+    return pa.schema(fields)
+
+
+class _StreamSink:
+    """Write-only file object that hands out the bytes written since the last drain()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def columnar_chunks(batches: Iterator[List[tuple]], export_format: str) -> Iterator[bytes]:
+    """
+    Parquet (one row group per batch) or Arrow IPC stream bytes.
+
+    Both writers only append, so each batch's bytes are sent as soon as
+    they are encoded; Parquet's footer follows the last row group.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    sink = _StreamSink()
+    output = pa.PythonFile(sink, mode="w")
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(output, schema)
+    else:
+        writer = pa.ipc.new_stream(output, schema)
+
+    # The IPC schema message goes out before any row is fetched
+    header = sink.drain()
+    if header:
+        yield header
+    for batch in batches:
+        columns = list(zip(*batch))
+        writer.write_batch(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def stream_trades(session_factory: Callable[[], Session], filters: List, export_format: str) -> Iterator:
+    """
+    Export body for StreamingResponse.
+
+    Opens its own session: the request's session is closed before a
+    streamed body finishes.
+    """
+    db = session_factory()
+    try:
+        if export_format in COLUMNAR_FORMATS:
+            yield from columnar_chunks(iter_trade_batches(db, filters, COLUMNAR_BATCH_SIZE), export_format)
+        elif export_format == "csv":
+            yield from csv_chunks(iter_trade_batches(db, filters))
+        else:
+            yield from ndjson_chunks(iter_trade_batches(db, filters))
+    finally:
+        db.close()
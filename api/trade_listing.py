@@ -0,0 +1,110 @@
+"""
+Trade Listing
+Filtered, keyset-paginated reads of a user's trades for /api/trades/.
+
+Pages are ordered by (date, id) and continue from an opaque cursor holding
+the last row's (date, id), so every page is an index range scan on
+ix_trades_owner_date_id (or the pair/system variants) however deep it is.
+Undated trades follow the dated ones, ordered by id.
+"""
+
+import base64
+import json
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Session
+
+from models import Trade
+
+# Page size when a cursor is given without a limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+Cursor = Tuple[Optional[date], int]
+
+
+def encode_cursor(trade: Trade) -> str:
+    payload = json.dumps([trade.date.isoformat() if trade.date else None, trade.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """(date, id) of the last trade of the previous page. Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        day, trade_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (date.fromisoformat(day) if day is not None else None), int(trade_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+class TradeListing:
+    """Builds the filters and pages behind GET /api/trades/."""
+
+    @staticmethod
+    def filters(
+        user_id: int,
+        pair: Optional[str] = None,
+        system: Optional[str] = None,
+        action: Optional[str] = None,
+        cancelled: Optional[bool] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> List:
+        """WHERE clauses for a user's trades; None means no filter on that field."""
+        filters = [Trade.owner_id == user_id]
+        for column, value in ((Trade.pair, pair), (Trade.system, system), (Trade.action, action)):
+            if value is not None:
+                filters.append(column == value)
+        if cancelled is not None:
+            filters.append(Trade.cancelled == cancelled)
+        if date_from is not None:
+            filters.append(Trade.date >= date_from)
+        if date_to is not None:
+            filters.append(Trade.date <= date_to)
+        return filters
+
+    @staticmethod
+    def count(db: Session, filters: List) -> int:
+        return db.query(func.count(Trade.id)).filter(*filters).scalar()
+
+    @staticmethod
+    def page(
+        db: Session,
+        filters: List,
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = None,
+        descending: bool = False
+    ) -> Tuple[List[Trade], Optional[str]]:
+        """
+        Trades after `cursor` in (date, id) order, at most `limit` of them.
+
+        Returns the trades and the cursor of the next page (None on the last
+        page). Without a limit every remaining trade is returned.
+        """
+        fetch = limit + 1 if limit is not None else None
+        trades: List[Trade] = []
+
+        # Dated trades first: keyset on the (date, id) row value
+        if cursor is None or cursor[0] is not None:
+            query = db.query(Trade).filter(*filters, Trade.date.isnot(None))
+            if cursor is not None:
+                position = tuple_(Trade.date, Trade.id)
+                query = query.filter(position < cursor if descending else position > cursor)
+            order = (Trade.date.desc(), Trade.id.desc()) if descending else (Trade.date, Trade.id)
+            trades = query.order_by(*order).limit(fetch).all()
+
+        # Then undated trades, by id
+        if fetch is None or len(trades) < fetch:
+            query = db.query(Trade).filter(*filters, Trade.date.is_(None))
+            if cursor is not None and cursor[0] is None:
+                query = query.filter(Trade.id < cursor[1] if descending else Trade.id > cursor[1])
+            query = query.order_by(Trade.id.desc() if descending else Trade.id)
+            trades += query.limit(fetch - len(trades) if fetch is not None else None).all()
+
+        if limit is None or len(trades) <= limit:
+            return trades, None
+        trades = trades[:limit]
+        return trades, encode_cursor(trades[-1])